@@ -0,0 +1,117 @@
+import time
+
+from django.contrib.admin.models import LogEntry
+from django.db.models import Q
+
+from exams.models import AttemptAnswer, Exam, ExamAttempt, ExamStatistics, Question, StudentExamResult
+from exams.rollups import rebuild_statistics
+from .models import User, Student, Teacher
+
+# Rows per DELETE; small enough that each statement holds its locks briefly
+DEFAULT_BATCH_SIZE = 5000
+
+
+class CleanupError(ValueError):
+    """Raised when the purge plan does not cover every cascade"""
+
+
+def purge_plan():
+    """
+    The deletions cleanup_users performs, as (label, queryset) pairs with
+    every child before its parent. Each step removes what Django's cascade
+    would have removed for the steps after it, so by the time a parent's
+    batch is deleted its cascades find nothing left to collect.
+    """
+    students = Student.objects.all()
+    teachers = Teacher.objects.all()
+    users = User.objects.filter(is_superuser=False)
+    exams = Exam.objects.filter(created_by__in=teachers)
+    questions = Question.objects.filter(created_by__in=teachers)
+    exam_questions = Exam.questions.through
+    return [
+        ('attempt answers', AttemptAnswer.objects.filter(
+            Q(attempt__student__in=students) | Q(exam__in=exams) | Q(question__in=questions)
+        )),
+        ('exam attempts', ExamAttempt.objects.filter(Q(student__in=students) | Q(exam__in=exams))),
+        ('exam results', StudentExamResult.objects.filter(Q(student__in=students) | Q(exam__in=exams))),
+        ('exam statistics', ExamStatistics.objects.filter(exam__in=exams)),
+        ('exam questions', exam_questions.objects.filter(Q(exam__in=exams) | Q(question__in=questions))),
+        ('exams', exams),
+        ('questions', questions),
+        ('students', students),
+        ('teachers', teachers),
+        ('admin log entries', LogEntry.objects.filter(user__in=users)),
+        ('user groups', User.groups.through.objects.filter(user__in=users)),
+        ('user permissions', User.user_permissions.through.objects.filter(user__in=users)),
+        ('users', users),
+    ]
+
+
+def check_plan(plan):
+    """
+    Make sure every relation that cascades into a planned model is emptied
+    by an earlier step. A model added later with a foreign key to one of
+    these fails here, instead of its rows being collected one batch of
+    parents at a time, or all at once on the first batch.
+    """
+    position = {}
+    for index, (_, queryset) in enumerate(plan):
+        position.setdefault(queryset.model, index)
+    problems = []
+    for model, index in position.items():
+        for relation in model._meta.get_fields(include_hidden=True):
+            if not (relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)):
+                continue
+            child = relation.related_model
+            if position.get(child, index) >= index and child is not model:
+                problems.append(f'{child._meta.label}.{relation.field.name} -> {model._meta.label}')
+    if problems:
+        raise CleanupError(f"Relations not covered by the purge plan: {', '.join(problems)}")
+
+
+def delete_in_batches(queryset, batch_size=DEFAULT_BATCH_SIZE, pause=0, progress=None):
+    """
+    Delete a queryset's rows in primary key order, at most batch_size per
+    delete(). Each batch is the rows up to a primary key bound, committed on
+    its own, so an interrupted run loses nothing and a rerun carries on with
+    whatever is left. Batches go through Django's delete(), so cascades and
+    delete signals still run; models without either are deleted with a
+    single statement per batch. pause sleeps between batches to leave room
+    for other traffic. Returns the number of rows deleted.
+    """
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    label = queryset.model._meta.label
+    deleted = 0
+    while True:
+        bound = list(pks[batch_size - 1:batch_size])
+        batch = queryset.filter(pk__lte=bound[0]) if bound else queryset
+        count = batch.delete()[1].get(label, 0)
+        deleted += count
+        if progress:
+            progress(deleted)
+        if not bound or not count:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def purge_users(batch_size=DEFAULT_BATCH_SIZE, pause=0, dry_run=False, progress=None):
+    """
+    Delete every non-superuser, every profile and everything that cascades
+    from them, a batch at a time. Results go before the exams and students
+    whose deletion would refresh their rollups, so ExamStatistics are
+    rebuilt once at the end. Returns (label, rows) per step, counts only
+    when dry_run is set.
+    """
+    plan = purge_plan()
+    check_plan(plan)
+    report = []
+    for label, queryset in plan:
+        if dry_run:
+            report.append((label, queryset.count()))
+            continue
+        on_batch = (lambda deleted, label=label: progress(label, deleted)) if progress else None
+        report.append((label, delete_in_batches(queryset, batch_size, pause, on_batch)))
+    if not dry_run:
+        rebuild_statistics()
+    return report
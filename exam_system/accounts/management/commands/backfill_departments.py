@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from accounts.models import BACKFILL_BATCH_SIZE, Student, Teacher
+
+class Command(BaseCommand):
+    help = 'Set missing student and teacher departments from the code in their college ID'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help='Profiles per read and bulk update')
+
+    def handle(self, *args, **options):
+        for model in (Student, Teacher):
+            started = time.perf_counter()
+            report = model.update_departments_from_username(batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            for code, count in sorted(report['unknown'].items()):
+                self.stdout.write(self.style.WARNING(f"{count} {model._meta.verbose_name_plural} with unknown department code '{code}'"))
+            self.stdout.write(self.style.SUCCESS(
+                f"Updated {report['updated']} {model._meta.verbose_name_plural} in {elapsed:.2f}s"
+            ))
@@ -1,17 +1,40 @@
-from django.core.management.base import BaseCommand
-from accounts.models import User, Student, Teacher
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.cleanup import DEFAULT_BATCH_SIZE, CleanupError, purge_users
 
 class Command(BaseCommand):
-    help = 'Deletes all users except superusers'
+    help = 'Deletes all users except superusers, in batches that can be interrupted and resumed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per DELETE statement')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be deleted, delete nothing')
 
     def handle(self, *args, **options):
-        # Delete all students and teachers first
-        Student.objects.all().delete()
-        Teacher.objects.all().delete()
-        
-        # Delete all non-superuser users
-        non_superusers = User.objects.filter(is_superuser=False)
-        count = non_superusers.count()
-        non_superusers.delete()
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully deleted {count} non-superuser users')) 
\ No newline at end of file
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        started = time.perf_counter()
+
+        def progress(label, deleted):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{label}: {deleted} deleted')
+
+        try:
+            report = purge_users(
+                batch_size=options['batch_size'],
+                pause=options['sleep'],
+                dry_run=options['dry_run'],
+                progress=progress
+            )
+        except CleanupError as e:
+            raise CommandError(str(e))
+
+        for label, count in report:
+            self.stdout.write(f"{label}: {count}{' would be deleted' if options['dry_run'] else ''}")
+        if options['dry_run']:
+            return
+        count = dict(report)['users']
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully deleted {count} non-superuser users in {time.perf_counter() - started:.2f}s'
+        ))
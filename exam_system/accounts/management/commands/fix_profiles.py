@@ -1,82 +1,80 @@
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import DatabaseError, transaction
 from accounts.models import User, Student, Teacher
-from django.db import transaction
-import logging
+from exams.registry import departments as registry
 
-logger = logging.getLogger(__name__)
+# Users read and profiles inserted per round trip
+DEFAULT_BATCH_SIZE = 2000
 
 class Command(BaseCommand):
     help = 'Fix missing profile connections for users'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Users per read and bulk insert')
+        parser.add_argument('--dry-run', action='store_true', help='Report the users missing profiles, create nothing')
+
+    def missing(self, role):
+        """Users of a role without the matching profile, as a single anti-join"""
+        related = 'student_profile' if role == 'student' else 'teacher_profile'
+        return User.objects.filter(role=role, **{f'{related}__isnull': True}).order_by('id')
+
+    def build(self, role, user_id, username, departments):
+        department = departments.get(username[5:7]) if len(username) > 6 else None
+        if role == 'student':
+            semester = int(username[0]) if username[0] in '12345678' else 1
+            return Student(user_id=user_id, department=department, semester=semester)
+        return Teacher(user_id=user_id, department=department)
+
     def handle(self, *args, **options):
+        batch_size, dry_run = options['batch_size'], options['dry_run']
         self.stdout.write(self.style.NOTICE('Checking for users with missing profiles...'))
-        
-        # Get all users
-        users = User.objects.all()
+        departments = registry.snapshot().by_code
+        started = time.perf_counter()
         fixed_count = 0
         error_count = 0
-        
-        for user in users:
-            role = user.role
-            user_id = user.username
-            
-            # Only process users that have role set but no profile
-            if role == 'student' and not hasattr(user, 'student_profile'):
-                self.stdout.write(f'Found student {user_id} without profile')
-                try:
-                    with transaction.atomic():
-                        # Extract semester from ID if possible
-                        semester = int(user_id[0]) if user_id[0] in '12345678' else 1
-                        
-                        # Get department if possible
-                        try:
-                            from exams.models import Department
-                            dept_code = user_id[5:7] if len(user_id) > 6 else None
-                            department = Department.objects.get(code=dept_code) if dept_code else None
-                        except Exception:
-                            department = None
-                        
-                        Student.objects.create(
-                            user=user,
-                            department=department,
-                            semester=semester
-                        )
-                        fixed_count += 1
-                        self.stdout.write(self.style.SUCCESS(
-                            f'Created student profile for {user_id}'
-                        ))
-                except Exception as e:
-                    error_count += 1
-                    self.stdout.write(self.style.ERROR(
-                        f'Error creating student profile for {user_id}: {str(e)}'
-                    ))
-            
-            elif role == 'teacher' and not hasattr(user, 'teacher_profile'):
-                self.stdout.write(f'Found teacher {user_id} without profile')
+
+        for role, model in (('student', Student), ('teacher', Teacher)):
+            missing = self.missing(role)
+            total = missing.count()
+            self.stdout.write(f'Found {total} {role}s without a profile')
+            if dry_run or not total:
+                continue
+
+            done, last_id = 0, 0
+            while True:
+                rows = list(missing.filter(id__gt=last_id).values_list('id', 'username')[:batch_size])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                profiles = [self.build(role, user_id, username, departments) for user_id, username in rows]
                 try:
                     with transaction.atomic():
-                        # Get department if possible
-                        try:
-                            from exams.models import Department
-                            dept_code = user_id[5:7] if len(user_id) > 6 else None
-                            department = Department.objects.get(code=dept_code) if dept_code else None
-                        except Exception:
-                            department = None
-                        
-                        Teacher.objects.create(
-                            user=user,
-                            department=department
-                        )
-                        fixed_count += 1
-                        self.stdout.write(self.style.SUCCESS(
-                            f'Created teacher profile for {user_id}'
-                        ))
-                except Exception as e:
-                    error_count += 1
+                        # Profiles created since the batch was read, by signup or another run, are left alone
+                        still_missing = set(missing.filter(id__in=[user_id for user_id, _ in rows])
+                                            .values_list('id', flat=True))
+                        profiles = [profile for profile in profiles if profile.user_id in still_missing]
+                        model.objects.bulk_create(profiles, ignore_conflicts=True)
+                    fixed_count += len(profiles)
+                    if options['verbosity'] > 1:
+                        for user_id, username in rows:
+                            if user_id in still_missing:
+                                self.stdout.write(f'Created {role} profile for {username}')
+                except DatabaseError as e:
+                    error_count += len(profiles)
                     self.stdout.write(self.style.ERROR(
-                        f'Error creating teacher profile for {user_id}: {str(e)}'
+                        f'Error creating {role} profiles for {rows[0][1]}..{rows[-1][1]}: {str(e)}'
                     ))
-        
+                done += len(rows)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{role}s: {done}/{total} ({fixed_count / elapsed:.0f} profiles/s)')
+
+        elapsed = time.perf_counter() - started
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Dry run completed in {elapsed:.2f}s, nothing created'))
+            return
         self.stdout.write(self.style.SUCCESS(
-            f'Profile fix completed. Fixed: {fixed_count}, Errors: {error_count}'
-        ))
\ No newline at end of file
+            f'Profile fix completed. Fixed: {fixed_count}, Errors: {error_count} '
+            f'in {elapsed:.2f}s ({fixed_count / elapsed if elapsed else 0:.0f} profiles/s)'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.roster import RosterError, import_roster, read_roster
+
+class Command(BaseCommand):
+    help = 'Create student and teacher accounts in bulk from a CSV of college IDs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='CSV with a username column; email, password, first_name, last_name and semester are optional')
+        parser.add_argument('--default-password', help='Password for rows without one')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: all cores)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, create nothing')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as roster:
+                rows = read_roster(roster)
+        except (OSError, RosterError) as e:
+            raise CommandError(str(e))
+
+        report = import_roster(
+            rows,
+            default_password=options['default_password'],
+            workers=options['workers'],
+            dry_run=options['dry_run']
+        )
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']} ({error['username']}): {error['message']}"))
+        timings = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in report['timings'].items())
+        if report['dryRun']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run: {report['valid']} of {report['rows']} rows would be imported ({timings})"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} users ({report['students']} students, {report['teachers']} teachers) "
+            f"of {report['rows']} rows in {report['seconds']:.2f}s, {report['usersPerSecond']} users/s ({timings})"
+        ))
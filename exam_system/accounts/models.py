@@ -77,6 +77,41 @@ class User(AbstractUser):
         super().save(*args, **kwargs)
         print(f"[INFO] User {self.username} saved with role {self.role}")
 
+# Profiles read and written per round trip by backfill_departments
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_departments(model, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Give Student or Teacher profiles without a department the one encoded at
+    positions 5-7 of their username. Profiles are read as (id, username) pairs
+    in keyset order, resolved against a preloaded code -> department map and
+    written with one UPDATE ... WHERE id IN per department per batch, so the
+    query count grows with the number of batches rather than profiles.
+    Returns {'updated': n, 'unknown': {code: profiles}}.
+    """
+    from exams.registry import departments as registry
+
+    departments = registry.snapshot().by_code
+    updated, unknown, last_id = 0, {}, 0
+    pending = model.objects.filter(department__isnull=True).order_by('id')
+    while True:
+        rows = list(pending.filter(id__gt=last_id).values_list('id', 'user__username')[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        by_department = {}
+        for pk, username in rows:
+            code = (username or '')[5:7]
+            if code in departments:
+                by_department.setdefault(code, []).append(pk)
+            else:
+                unknown[code] = unknown.get(code, 0) + 1
+        for code, ids in by_department.items():
+            updated += model.objects.filter(id__in=ids).update(department=departments[code])
+    return {'updated': updated, 'unknown': unknown}
+
+
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='student_profile', null=True, blank=True)
     # Use string reference to avoid circular imports during migrations
@@ -99,27 +134,12 @@ class Student(models.Model):
         )
     
     @classmethod
-    def update_departments_from_username(cls):
+    def update_departments_from_username(cls, batch_size=None):
         """
-        Update student departments based on username pattern.
-        Called in AppConfig.ready() to update departments for existing students.
+        Set the department of students without one from their username.
+        Existing students were backfilled by exams migration 0006_bootstrap_departments.
         """
-        # Import here to avoid circular imports
-        from exams.models import Department
-        
-        for student in cls.objects.filter(department__isnull=True):
-            # Assuming username format where position 5-7 contains department code
-            if len(student.user.username) >= 7:
-                dept_code = student.user.username[5:7]
-                try:
-                    department = Department.objects.get(code=dept_code)
-                    student.department = department
-                    # Also update semester from username if needed
-                    if student.semester is None and student.user.username[0] in '12345678':
-                        student.semester = int(student.user.username[0])
-                    student.save()
-                except Department.DoesNotExist:
-                    print(f"Department not found for code: {dept_code}")
+        return backfill_departments(cls, batch_size or BACKFILL_BATCH_SIZE)
 
 class Teacher(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='teacher_profile', null=True, blank=True)
@@ -130,23 +150,11 @@ class Teacher(models.Model):
         return f"{self.user.username} - {self.department}"
     
     @classmethod
-    def update_departments_from_username(cls):
+    def update_departments_from_username(cls, batch_size=None):
         """
-        Update teacher departments based on username pattern.
-        Called in AppConfig.ready() to update departments for existing teachers.
+        Set the department of teachers without one from their username.
+        Existing teachers were backfilled by exams migration 0006_bootstrap_departments.
         """
-        # Import here to avoid circular imports
-        from exams.models import Department
-        
-        for teacher in cls.objects.filter(department__isnull=True):
-            # Assuming username format where position 5-7 contains department code
-            if len(teacher.user.username) >= 7:
-                dept_code = teacher.user.username[5:7]
-                try:
-                    department = Department.objects.get(code=dept_code)
-                    teacher.department = department
-                    teacher.save()
-                except Department.DoesNotExist:
-                    print(f"Department not found for code: {dept_code}")
+        return backfill_departments(cls, batch_size or BACKFILL_BATCH_SIZE)
 
 # Signal handlers are in signals.py
\ No newline at end of file
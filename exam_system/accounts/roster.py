@@ -0,0 +1,222 @@
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import User, Student, Teacher
+
+# Rows per INSERT; keeps each statement well under parameter limits
+INSERT_BATCH_SIZE = 1000
+# Existence checks are IN queries of at most this many values
+LOOKUP_CHUNK_SIZE = 1000
+
+SEMESTERS = [str(semester) for semester in range(1, 9)]
+
+# Rows the API imports per request. Passwords are hashed in the request,
+# one after another, so this bounds how long a worker is held; larger
+# rosters go through the import_roster command, which hashes on every core.
+MAX_REQUEST_ROWS = 500
+
+
+class RosterError(ValueError):
+    """Raised when a roster cannot be read at all"""
+
+
+def _username_regex():
+    """The compiled regex of User.username's RegexValidator"""
+    for validator in User._meta.get_field('username').validators:
+        if hasattr(validator, 'regex'):
+            return validator.regex
+    raise RosterError('User.username has no format validator')
+
+
+def _init_hasher():
+    """Process pool initializer; spawned workers must configure Django first"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _hash(password):
+    return make_password(password)
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash passwords with the configured hasher across a pool of processes.
+    PBKDF2 is CPU bound, so threads would serialise on the GIL.
+    """
+    if not passwords:
+        return []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < workers * 4:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_hasher) as pool:
+        return list(pool.map(_hash, passwords, chunksize=chunksize))
+
+
+def read_roster(source):
+    """
+    Read roster rows from a CSV file object or text. The username column
+    (college ID) is required; email, password, first_name, last_name and
+    semester are optional.
+    """
+    if isinstance(source, (str, bytes)):
+        source = io.StringIO(source.decode('utf-8-sig') if isinstance(source, bytes) else source)
+    reader = csv.DictReader(source)
+    if not reader.fieldnames or 'username' not in [name.strip().lower() for name in reader.fieldnames]:
+        raise RosterError('The roster needs a username column')
+    return [
+        {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        for row in reader
+    ]
+
+
+def _existing(field, values):
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        found.update(User.objects.filter(
+            **{f'{field}__in': values[start:start + LOOKUP_CHUNK_SIZE]}
+        ).values_list(field, flat=True))
+    return found
+
+
+def _department_map():
+    """Every department code the username format allows, creating any that are missing"""
+    from exams.models import Department
+    from exams.registry import departments as registry
+    departments = registry.snapshot().by_code
+    missing = [
+        Department(code=code, name=name)
+        for code, name in User.DEPARTMENT_CHOICES if code not in departments
+    ]
+    if missing:
+        Department.objects.bulk_create(missing, ignore_conflicts=True)
+        # bulk_create sends no signals
+        registry.bump()
+        departments = registry.snapshot().by_code
+    return departments
+
+
+def validate_roster(rows, default_password=None):
+    """
+    Check every row against the username format and against each other and
+    the database, with one query per lookup chunk rather than per row.
+    Returns (valid rows, errors) where errors are (line, username, message).
+    """
+    regex = _username_regex()
+    valid, errors = [], []
+    seen_usernames, seen_emails = set(), set()
+    for line, row in enumerate(rows, start=2):  # Line 1 is the header
+        username = row.get('username', '')
+        email = row.get('email', '')
+        if not regex.match(username):
+            errors.append((line, username, 'Invalid ID format'))
+        elif username.startswith('admin'):
+            errors.append((line, username, 'Admin accounts cannot be imported'))
+        elif username in seen_usernames:
+            errors.append((line, username, 'Duplicate ID in roster'))
+        elif email and email in seen_emails:
+            errors.append((line, username, 'Duplicate email in roster'))
+        elif not (row.get('password') or default_password):
+            errors.append((line, username, 'No password and no default password'))
+        elif row.get('semester') and row['semester'] not in SEMESTERS:
+            errors.append((line, username, 'Semester must be 1-8'))
+        else:
+            seen_usernames.add(username)
+            if email:
+                seen_emails.add(email)
+            valid.append((line, row))
+
+    taken_usernames = _existing('username', seen_usernames)
+    taken_emails = _existing('email', seen_emails)
+    accepted = []
+    for line, row in valid:
+        if row['username'] in taken_usernames:
+            errors.append((line, row['username'], 'ID already exists'))
+        elif row.get('email') and row['email'] in taken_emails:
+            errors.append((line, row['username'], 'Email already exists'))
+        else:
+            accepted.append(row)
+    errors.sort()
+    return accepted, errors
+
+
+def import_roster(rows, default_password=None, workers=None, dry_run=False):
+    """
+    Create users and their Student/Teacher profiles for roster rows in bulk.
+    User.save and the post_save signal are bypassed, so profiles are built
+    here with the same rules. Returns a report with counts and timings.
+    """
+    timings = {}
+    started = time.perf_counter()
+    accepted, errors = validate_roster(rows, default_password)
+    timings['validate'] = time.perf_counter() - started
+
+    phase = time.perf_counter()
+    hashes = [] if dry_run else hash_passwords(
+        [row.get('password') or default_password for row in accepted], workers=workers
+    )
+    timings['hash'] = time.perf_counter() - phase
+
+    created = {'student': 0, 'teacher': 0}
+    phase = time.perf_counter()
+    if accepted and not dry_run:
+        departments = _department_map()
+        users = []
+        for row, password in zip(accepted, hashes):
+            user = User(
+                username=row['username'],
+                email=row.get('email', ''),
+                first_name=row.get('first_name', ''),
+                last_name=row.get('last_name', ''),
+                password=password,
+                status='active',
+            )
+            user.role = user.get_role_from_id()
+            users.append(user)
+
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=INSERT_BATCH_SIZE)
+            if any(user.pk is None for user in users):
+                # Backends that cannot return ids from a bulk insert
+                ids = dict(User.objects.filter(
+                    username__in=[user.username for user in users]
+                ).values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+
+            students, teachers = [], []
+            for user, row in zip(users, accepted):
+                department = departments.get(user.username[5:7])
+                if user.role == 'student':
+                    semester = int(row.get('semester') or user.username[0])
+                    students.append(Student(user=user, department=department, semester=semester))
+                else:
+                    teachers.append(Teacher(user=user, department=department))
+            Student.objects.bulk_create(students, batch_size=INSERT_BATCH_SIZE)
+            Teacher.objects.bulk_create(teachers, batch_size=INSERT_BATCH_SIZE)
+        created = {'student': len(students), 'teacher': len(teachers)}
+    timings['insert'] = time.perf_counter() - phase
+
+    elapsed = time.perf_counter() - started
+    total = created['student'] + created['teacher']
+    return {
+        'rows': len(rows),
+        'valid': len(accepted),
+        'created': total,
+        'students': created['student'],
+        'teachers': created['teacher'],
+        'errors': [{'line': line, 'username': username, 'message': message} for line, username, message in errors],
+        'seconds': round(elapsed, 3),
+        'timings': {name: round(value, 3) for name, value in timings.items()},
+        'usersPerSecond': round(total / elapsed, 1) if elapsed and total else 0,
+        'dryRun': dry_run,
+    }
@@ -12,8 +12,9 @@ def create_user_profile(sender, instance, created, **kwargs):
     if not created:
         return
 
-    # Import Department here to avoid circular import issues
+    # Import here to avoid circular import issues
     from exams.models import Department
+    from exams.registry import departments
 
     # Skip if role is not specified or is admin
     if instance.role not in ['student', 'teacher']:
@@ -30,13 +31,14 @@ def create_user_profile(sender, instance, created, **kwargs):
     
     try:
         # Ensure the department exists
-        department, created = Department.objects.get_or_create(
-            code=dept_code, 
-            defaults={'name': f'{dept_code.upper()} Department'}
-        )
-        
-        if created:
-            logger.info(f"Created new department: {department}")
+        department = departments.get(code=dept_code)
+        if department is None:
+            department, created = Department.objects.get_or_create(
+                code=dept_code,
+                defaults={'name': f'{dept_code.upper()} Department'}
+            )
+            if created:
+                logger.info(f"Created new department: {department}")
 
         # Create profile based on role
         if instance.role == 'student':
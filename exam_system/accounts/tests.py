@@ -1,3 +1,270 @@
-from django.test import TestCase
+import logging
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from exams.grading import grade_attempts
+from exams.models import AttemptAnswer, Department, Exam, ExamAttempt, ExamStatistics, StudentExamResult
+from exams.rollups import rebuild_statistics
+from exams.tests import QueryBudgetTestCase, make_exam, make_students, submit
+from .cleanup import purge_users
+from .management.commands.fix_profiles import Command
+from .roster import MAX_REQUEST_ROWS
+from .models import User, Student, Teacher
+
+
+class AuthenticationBudgetTests(QueryBudgetTestCase):
+    """Sign-up, login and logout routes of accounts/urls.py"""
+
+    def test_anonymous_pages(self):
+        self.call(self.anonymous, 'get', '/accounts/', queries=0, status=302)
+        self.call(self.anonymous, 'get', '/accounts/login/', queries=0)
+        self.call(self.anonymous, 'get', '/accounts/signup/', queries=0)
+        self.call(self.anonymous, 'get', '/accounts/get-csrf/', queries=0)
+
+    def test_signup(self):
+        self.call_json(self.anonymous, 'post', '/accounts/signup/', {
+            'username': '1mp23cs900', 'email': '1mp23cs900@example.edu', 'password': 'password', 'semester': 1,
+        }, queries=7)
+        self.assertTrue(Student.objects.filter(user__username='1mp23cs900').exists())
+
+    def test_login(self):
+        for user in (self.student.user, self.teacher.user):
+            response = self.call(Client(), 'post', '/accounts/login/', queries=11, data={
+                'username': user.username, 'password': 'password', 'userType': user.role,
+            }, status=None, HTTP_ACCEPT='application/json')
+            self.assertIn(response.status_code, (200, 302))
+
+    def test_logout(self):
+        self.call(self.as_student, 'get', '/accounts/logout/', queries=4, status=302)
+
+
+class DashboardBudgetTests(QueryBudgetTestCase):
+    """Dashboards and profiles of accounts/urls.py"""
+
+    def test_dashboard_redirects(self):
+        self.call(self.as_student, 'get', '/accounts/dashboard/', queries=3, status=302)
+        self.call(self.as_teacher, 'get', '/accounts/dashboard/', queries=4, status=302)
+
+    def test_student_dashboard(self):
+        self.call(self.as_student, 'get', '/accounts/student/dashboard/', queries=4)
+
+    def test_teacher_dashboard(self):
+        self.call(self.as_teacher, 'get', '/accounts/teacher/dashboard/', queries=3)
+
+    def test_admin_dashboard(self):
+        self.call(self.as_admin, 'get', '/accounts/admin/dashboard/', queries=2)
+
+    def test_profile(self):
+        # profile() returns nothing on GET, so Django raises; only the budget is checked
+        client = self.client_for(self.student.user, raise_request_exception=False)
+        self.call(client, 'get', '/accounts/profile/', queries=2, status=None)
+
+    def test_student_profile(self):
+        self.call(self.as_student, 'get', '/accounts/api/student/profile/', queries=4)
+        self.call_json(self.as_student, 'put', '/accounts/api/student/profile/', {
+            'first_name': 'Renamed', 'department': self.student.department.code, 'semester': 2,
+        }, queries=6)
+
+    def test_teacher_profile(self):
+        self.call(self.as_teacher, 'get', '/accounts/api/teacher/profile/', queries=4)
+        self.call_json(self.as_teacher, 'put', '/accounts/api/teacher/profile/', {
+            'first_name': 'Renamed', 'department': self.teacher.department.code,
+        }, queries=5)
+
+
+class LegacyRouteBudgetTests(QueryBudgetTestCase):
+    """
+    Student and teacher routes of accounts/urls.py that predate the exams
+    API. Several are broken (missing templates, fields the models do not
+    have); for those only the budget is checked, so fixing them is not held
+    up by this suite and breaking the budget still is.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.as_teacher = self.client_for(self.teacher.user, raise_request_exception=False)
+        self.as_student = self.client_for(self.student.user, raise_request_exception=False)
+        # A 500 is logged with the frame locals of its traceback, and rendering
+        # those runs queries of their own that would swamp the request's
+        logger = logging.getLogger('django.request')
+        self.addCleanup(setattr, logger, 'disabled', logger.disabled)
+        logger.disabled = True
+
+    def test_take_exam(self):
+        self.call(self.as_student, 'get', '/accounts/take-exam/', queries=5, status=None)
+
+    def test_view_student_results(self):
+        self.call(self.as_teacher, 'get', f'/accounts/student-results/{self.student.id}/', queries=6, status=None)
+
+    def test_create_exam(self):
+        self.call_json(self.as_teacher, 'post', '/accounts/api/exams/create/', {
+            'title': 'Budget test', 'subject': self.past_exam.subject_id, 'duration': 30,
+            'deadline': '2030-01-01T00:00:00Z', 'totalQuestions': 2,
+        }, queries=2, status=None)
+
+    def test_list_exams(self):
+        self.call(self.as_teacher, 'get', '/accounts/api/exams/', queries=2, status=None)
+
+    def test_student_results(self):
+        self.call(self.as_teacher, 'get', '/accounts/api/student-results/', queries=2, status=None)
+
+    def test_generate_report(self):
+        for report_type in ('performance', 'attendance', 'analysis'):
+            self.call(self.as_teacher, 'get', f'/accounts/api/reports/{report_type}/', queries=2, status=None)
+
+
+class RosterImportBudgetTests(QueryBudgetTestCase):
+    def test_import_roster(self):
+        usernames = [f'2mp23ds{n:03d}' for n in range(500, 700)]
+        roster = 'username,email\n' + ''.join(f'{name},{name}@example.edu\n' for name in usernames)
+        # Query count does not grow with the size of the roster, and passwords
+        # are hashed in the request's own process
+        with mock.patch('accounts.roster.ProcessPoolExecutor') as pool:
+            self.call(self.as_admin, 'post', '/accounts/api/admin/roster/import/?default_password=password',
+                      queries=11, data=roster, content_type='text/csv')
+        pool.assert_not_called()
+        self.assertEqual(User.objects.filter(username__in=usernames).count(), len(usernames))
+        self.assertEqual(Student.objects.filter(user__username__in=usernames).count(), len(usernames))
+
+    def test_large_roster_is_refused(self):
+        usernames = [f'8mp19ds{n:03d}' for n in range(MAX_REQUEST_ROWS + 1)]
+        roster = 'username\n' + ''.join(f'{name}\n' for name in usernames)
+        path = '/accounts/api/admin/roster/import/?default_password=password'
+        self.call(self.as_admin, 'post', path, queries=2, data=roster, content_type='text/csv', status=400)
+        self.assertFalse(User.objects.filter(username__in=usernames).exists())
+        # Validating it creates nothing and hashes nothing, so a dry run is allowed
+        response = self.call(self.as_admin, 'post', f'{path}&dry_run=1', queries=3, data=roster,
+                             content_type='text/csv')
+        self.assertEqual(response.json()['data']['valid'], len(usernames))
+
+
+class CleanupTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin001', email='admin001@example.edu', password='password')
+        teacher = User.objects.create_user(username='0mp23cs900').teacher_profile
+        self.exams = [make_exam([(['A', 'B'], 'a', 1), (['A', 'B', 'C'], 'c', 2)], created_by=teacher)
+                      for _ in range(2)]
+        self.students = make_students(7)
+        for exam in self.exams:
+            grade_attempts(exam, [
+                submit(exam, student, {f'question_{question.id}': 'a' for question in exam.questions.all()})
+                for student in self.students
+            ])
+
+    def test_purge_removes_everything_that_cascades(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report = dict(purge_users(batch_size=3))
+        self.assertEqual(report['exam results'], 14)
+        self.assertEqual(report['students'], 7)
+        self.assertEqual(report['users'], 8)
+        for model in (AttemptAnswer, ExamAttempt, StudentExamResult, Exam, Student, Teacher):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertEqual(list(User.objects.all()), [self.admin])
+        self.assertFalse(ExamStatistics.objects.filter(submissions__gt=0).exists())
+        self.assertEqual(rebuild_statistics(check=True), [])
+
+    def test_deleting_students_refreshes_rollups_once(self):
+        queries = []
+        # Both deletions leave results of the same exams behind
+        for students in (self.students[:1], self.students[1:4]):
+            with CaptureQueriesContext(connection) as captured, self.captureOnCommitCallbacks(execute=True):
+                Student.objects.filter(id__in=[student.id for student in students]).delete()
+            queries.append(len(captured))
+            self.assertEqual(rebuild_statistics(check=True), [])
+        # One student or three, the rollups are looked up and recomputed once
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(StudentExamResult.objects.count(), 6)
+
+
+class FixProfilesTests(TestCase):
+    def setUp(self):
+        make_students(2)
+        User.objects.create_user(username='0mp23cs900')
+        # Bulk inserted users get no profile from the post_save signal
+        users = [User(username=username) for username in ('3mp23is010', '4mp23ds011', '5mp23cg012', '0mp23ml013')]
+        for user in users:
+            user.role = user.get_role_from_id()
+        User.objects.bulk_create(users)
+
+    def fix_profiles(self):
+        out = StringIO()
+        call_command('fix_profiles', stdout=out)
+        return out.getvalue()
+
+    def assertOneProfileEach(self):
+        for user in User.objects.all():
+            profiles = Student.objects.filter(user=user).count() + Teacher.objects.filter(user=user).count()
+            self.assertEqual(profiles, 1, user.username)
+
+    def test_creates_missing_profiles(self):
+        self.assertIn('Fixed: 4, Errors: 0', self.fix_profiles())
+        self.assertOneProfileEach()
+        student = Student.objects.get(user__username='4mp23ds011')
+        self.assertEqual((student.department.code, student.semester), ('ds', 4))
+        self.assertEqual(Teacher.objects.get(user__username='0mp23ml013').department.code, 'ml')
+        # A second run finds nothing to do
+        self.assertIn('Fixed: 0, Errors: 0', self.fix_profiles())
+        self.assertOneProfileEach()
+
+    def test_profile_created_during_the_run(self):
+        raced = User.objects.get(username='5mp23cg012')
+        build = Command.build
+
+        def build_after_signup(command, role, user_id, username, departments):
+            # The user's profile appears after the batch was read, as from a concurrent signup
+            if user_id == raced.id:
+                Student.objects.create(user=raced, department=departments['cg'], semester=5)
+            return build(command, role, user_id, username, departments)
+
+        with mock.patch.object(Command, 'build', build_after_signup):
+            self.assertIn('Fixed: 3, Errors: 0', self.fix_profiles())
+        self.assertOneProfileEach()
+
+
+class BackfillDepartmentsTests(TestCase):
+    def setUp(self):
+        # Legacy profiles: bulk inserted users, so no profile signal, and no department
+        users = User.objects.bulk_create([User(username=username) for username in (
+            '1mp23cs001', '2mp23DS002', '3mp23xx003', '4mp23Ml004', 'staff', '6mp23is006', '0mp23is007', '0MP23CG008',
+        )])
+        self.students = {user.username: Student.objects.create(user=user, semester=1) for user in users[:6]}
+        self.teachers = {user.username: Teacher.objects.create(user=user) for user in users[6:]}
+        # A profile that already has a department keeps it, whatever its username says
+        self.students['6mp23is006'].department = Department.objects.get(code='ml')
+        self.students['6mp23is006'].save()
+
+    def backfill(self):
+        out = StringIO()
+        call_command('backfill_departments', '--batch-size', '2', stdout=out)
+        return out.getvalue()
+
+    def departments(self):
+        return {
+            profile.user.username: profile.department.code if profile.department else None
+            for model in (Student, Teacher) for profile in model.objects.select_related('user', 'department')
+        }
+
+    def test_backfill(self):
+        output = self.backfill()
+        self.assertEqual(self.departments(), {
+            '1mp23cs001': 'cs', '2mp23DS002': None, '3mp23xx003': None, '4mp23Ml004': None, 'staff': None,
+            '6mp23is006': 'ml', '0mp23is007': 'is', '0MP23CG008': None,
+        })
+        # Codes are matched exactly, so mixed-case IDs are reported rather than guessed at
+        for line in ("1 students with unknown department code 'DS'", "1 students with unknown department code 'Ml'",
+                     "1 students with unknown department code 'xx'", "1 students with unknown department code ''",
+                     "1 teachers with unknown department code 'CG'", 'Updated 1 students', 'Updated 1 teachers'):
+            self.assertIn(line, output)
+
+    def test_second_run_changes_nothing(self):
+        self.backfill()
+        departments = self.departments()
+        output = self.backfill()
+        self.assertIn('Updated 0 students', output)
+        self.assertIn('Updated 0 teachers', output)
+        self.assertEqual(self.departments(), departments)
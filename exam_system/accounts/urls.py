@@ -31,4 +31,5 @@ urlpatterns = [
     path('api/exams/', views.list_exams, name='list_exams'),
     path('api/student-results/', views.student_results, name='student_results'),
     path('api/reports/<str:report_type>/', views.generate_report, name='generate_report'),
+    path('api/admin/roster/import/', views.import_roster_api, name='import_roster'),
 ]
\ No newline at end of file
@@ -3,6 +3,7 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import User, Student, Teacher
+from .roster import MAX_REQUEST_ROWS, RosterError, import_roster, read_roster
 from exams.models import Exam, StudentExamResult
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import PermissionDenied
@@ -84,13 +85,11 @@ def signup(request):
 
                 # Manually create the profile to ensure it gets created
                 try:
-                    from exams.models import Department
+                    from exams.registry import departments
                     dept_code = user_id[5:7] if not is_admin else None
                     if dept_code:
-                        try:
-                            department_obj = Department.objects.get(code=dept_code)
-                        except Department.DoesNotExist:
-                            department_obj = None
+                        department_obj = departments.get(code=dept_code)
+                        if department_obj is None:
                             print(f"Department not found for code: {dept_code}")
                     else:
                         department_obj = None
@@ -242,12 +241,8 @@ def login_view(request):
                 if not hasattr(user, 'student_profile'):
                     print(f"[WARNING] Student profile missing for {user.username}. Creating it now.")
                     try:
-                        from exams.models import Department
-                        dept_code = user.username[5:7]
-                        try:
-                            department = Department.objects.get(code=dept_code)
-                        except Department.DoesNotExist:
-                            department = None
+                        from exams.registry import departments
+                        department = departments.get(code=user.username[5:7])
 
                         semester = int(user.username[0]) if user.username[0] in '12345678' else 1
                         Student.objects.create(user=user, department=department, semester=semester)
@@ -261,12 +256,8 @@ def login_view(request):
                 if not hasattr(user, 'teacher_profile'):
                     print(f"[WARNING] Teacher profile missing for {user.username}. Creating it now.")
                     try:
-                        from exams.models import Department
-                        dept_code = user.username[5:7]
-                        try:
-                            department = Department.objects.get(code=dept_code)
-                        except Department.DoesNotExist:
-                            department = None
+                        from exams.registry import departments
+                        department = departments.get(code=user.username[5:7])
 
                         Teacher.objects.create(user=user, department=department)
                         print(f"[RECOVERY] Created missing teacher profile for {user.username}")
@@ -307,9 +298,9 @@ def student_dashboard(request):
         semester=student.semester,
         start_time__lte=timezone.now(),
         end_time__gte=timezone.now()
-    )
+    ).with_listing_data()
 
-    results = StudentExamResult.objects.filter(student=student)
+    results = StudentExamResult.objects.filter(student=student).select_related('exam__subject')
     return render(request, 'accounts/student_dashboard.html', {
         'student': student,
         'available_exams': available_exams,
@@ -322,8 +313,8 @@ def teacher_dashboard(request):
         messages.error(request, 'You do not have permission to access the teacher dashboard')
         return redirect('accounts:dashboard')
     teacher = request.user.teacher_profile
-    created_exams = Exam.objects.filter(created_by=teacher)
-    results = StudentExamResult.objects.filter(exam__in=created_exams)
+    created_exams = Exam.objects.filter(created_by=teacher).with_listing_data()
+    results = StudentExamResult.objects.filter(exam__created_by=teacher).select_related('student__user', 'exam')
     return render(request, 'accounts/teacher_dashboard.html', {
         'teacher': teacher,
         'exams': created_exams,
@@ -387,6 +378,43 @@ def system_logs(request):
         raise PermissionDenied
     return render(request, 'accounts/system_logs.html')
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_roster_api(request):
+    """
+    Bulk-create accounts from an uploaded roster CSV (form field 'roster', or a
+    text/csv body). Optional fields: default_password, dry_run.
+    """
+    if not request.user.username.startswith('admin'):
+        return Response({'success': False, 'message': 'Admins only'}, status=403)
+
+    try:
+        # A raw CSV body takes its options as query parameters; an upload form carries them
+        if request.content_type.startswith('text/csv'):
+            source, options = request.body, request.GET
+        else:
+            upload = request.FILES.get('roster')
+            if upload is None:
+                return Response({'success': False, 'message': 'Upload the roster as the roster field'}, status=400)
+            source, options = upload.read(), request.data
+        rows = read_roster(source)
+        dry_run = str(options.get('dry_run', '')).lower() in ('1', 'true')
+        if len(rows) > MAX_REQUEST_ROWS and not dry_run:
+            return Response({
+                'success': False,
+                'message': f'Import at most {MAX_REQUEST_ROWS} rows at a time, or use the import_roster command'
+            }, status=400)
+        # A process pool has no place in a web worker; hash in this process
+        report = import_roster(rows, default_password=options.get('default_password'), workers=1, dry_run=dry_run)
+        return Response({
+            'success': True,
+            'data': report
+        })
+    except (RosterError, UnicodeDecodeError) as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        return Response({'success': False, 'message': str(e)}, status=500)
+
 # Student Views
 @login_required
 def take_exam(request):
@@ -615,14 +643,14 @@ def student_profile(request):
 
             # Update StudentProfile model fields
             if 'department' in data:
-                from exams.models import Department
+                from exams.registry import departments
                 dept_val = data['department']
                 dept_obj = None
                 if isinstance(dept_val, int):
-                    dept_obj = Department.objects.filter(id=dept_val).first()
+                    dept_obj = departments.get(id=dept_val)
                 elif isinstance(dept_val, str):
                     # Try by code, then by name
-                    dept_obj = Department.objects.filter(code=dept_val).first() or Department.objects.filter(name=dept_val).first()
+                    dept_obj = departments.get(code=dept_val) or departments.get(name=dept_val)
                 if dept_obj:
                     student.department = dept_obj
                 else:
@@ -692,12 +720,12 @@ def teacher_profile(request):
             # Update teacher profile fields - department is read-only since it's determined by ID
             # teacher.department should be set based on the teacher's ID
             dept_code = user.username[5:7]
-            try:
-                from exams.models import Department
-                department = Department.objects.get(code=dept_code)
+            from exams.registry import departments
+            department = departments.get(code=dept_code)
+            if department is not None:
                 teacher.department = department
                 teacher.save()
-            except Department.DoesNotExist:
+            else:
                 print(f"Department not found for code: {dept_code}")
 
             return Response({
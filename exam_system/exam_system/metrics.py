@@ -0,0 +1,182 @@
+import hmac
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+DEFAULT_SAMPLE_RATE = 1.0
+
+# Upper bounds of the histogram buckets; +Inf is implicit
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Sampled requests by view, method and status', None),
+    'http_request_duration_seconds': ('histogram', 'Wall time of sampled requests', DURATION_BUCKETS),
+    'http_request_queries': ('histogram', 'SQL queries per sampled request', QUERY_BUCKETS),
+    'http_request_sql_duration_seconds': ('histogram', 'Time spent in SQL per sampled request', DURATION_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Body size of sampled, non-streaming responses', SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsStore:
+    """
+    Counters and histograms of this process, keyed by metric and labels.
+    Values are cumulative since the process started, as Prometheus expects;
+    windows and quantiles come from rate() and histogram_quantile() on the
+    server. Each worker process keeps its own store.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def record(self, labels, status, duration, queries, sql_duration, size):
+        with self._lock:
+            key = ('http_requests_total', labels + (('status', str(status)),))
+            self._series[key] = self._series.get(key, 0) + 1
+            for name, value in (
+                ('http_request_duration_seconds', duration),
+                ('http_request_queries', queries),
+                ('http_request_sql_duration_seconds', sql_duration),
+                ('http_response_size_bytes', size),
+            ):
+                if value is None:
+                    continue
+                histogram = self._series.get((name, labels))
+                if histogram is None:
+                    histogram = self._series[(name, labels)] = Histogram(METRICS[name][2])
+                histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def exposition(self):
+        """The store in the Prometheus text exposition format, version 0.0.4"""
+        with self._lock:
+            series = sorted(
+                (name, labels, value if not isinstance(value, Histogram) else
+                 (list(value.counts), value.sum))
+                for (name, labels), value in self._series.items()
+            )
+        lines = [
+            '# HELP metrics_sample_rate Share of requests that are measured',
+            '# TYPE metrics_sample_rate gauge',
+            f'metrics_sample_rate {_sample_rate()}',
+        ]
+        current = None
+        for name, labels, value in series:
+            if name != current:
+                kind, help_text, _ = METRICS[name]
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                current = name
+            if not isinstance(value, tuple):
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(METRICS[name][2] + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _sample_rate():
+    return getattr(settings, 'METRICS_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+
+store = MetricsStore()
+
+
+class _QueryTimer:
+    """connection.execute_wrapper hook that counts queries and their time"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, SQL query count, SQL time and response size per
+    resolved URL name for a METRICS_SAMPLE_RATE share of requests. Requests
+    that are not sampled cost one random() call.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = _sample_rate()
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        store.record(
+            (('view', view), ('method', request.method)),
+            response.status_code, duration, timer.queries, timer.seconds, size
+        )
+        return response
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode()):
+        return True
+    user = request.user
+    return user.is_authenticated and (user.is_superuser or getattr(user, 'role', None) == 'admin')
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs the METRICS_TOKEN bearer token or an admin session"""
+    if not _authorized(request):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(store.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,179 @@
+import logging
+import os
+import re
+import sys
+import sysconfig
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# A query shape repeated this many times from one line is reported
+DEFAULT_THRESHOLD = 5
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+# Query hooks of our own that sit between the caller and the cursor
+_SKIPPED_FILES = {
+    __file__,
+    os.path.join(os.path.dirname(__file__), 'metrics.py'),
+}
+
+
+def fingerprint(sql):
+    """The shape of a statement: literals and IN lists of any length collapse to placeholders"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _project_root():
+    return str(settings.BASE_DIR) + os.sep
+
+
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()['stdlib'], sysconfig.get_paths()['purelib']})
+
+
+def _is_library(filename):
+    return 'site-packages' in filename or filename.startswith(_LIBRARY_DIRS) or filename.startswith('<')
+
+
+def call_site(root=None):
+    """
+    file:line of the innermost project frame that led to the current query,
+    else of the innermost frame outside the standard library and packages
+    """
+    root = root or _project_root()
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename not in _SKIPPED_FILES and not _is_library(filename):
+            if filename.startswith(root):
+                return f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+            if fallback is None:
+                fallback = f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+class QueryShapeRecorder:
+    """execute_wrapper hook counting queries by (call site, fingerprint)"""
+
+    def __init__(self):
+        self.shapes = Counter()
+        self.total = 0
+        self._root = _project_root()
+
+    def __call__(self, execute, sql, params, many, context):
+        key = (call_site(self._root), fingerprint(sql))
+        self.shapes[key] += 1
+        self.total += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=DEFAULT_THRESHOLD):
+        """(count, call site, fingerprint) of every shape seen at least threshold times, worst first"""
+        return sorted(
+            ((count, site, shape) for (site, shape), count in self.shapes.items() if count >= threshold),
+            reverse=True
+        )
+
+    def report(self, threshold=DEFAULT_THRESHOLD):
+        lines = [
+            f'{count} x {site}\n    {shape[:300]}'
+            for count, site, shape in self.repeated(threshold)
+        ]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries():
+    """Record the shape and call site of every query run inside the block"""
+    recorder = QueryShapeRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+class NPlusOneError(AssertionError):
+    """Raised by assert_no_n_plus_one; an AssertionError so test runners report it as a failure"""
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=DEFAULT_THRESHOLD):
+    """
+    Fail when a query shape runs threshold or more times from one line
+    inside the block, the signature of a relation loaded per row:
+
+        with assert_no_n_plus_one(threshold=3):
+            self.client.get('/api/exams/list/')
+    """
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.repeated(threshold):
+        raise NPlusOneError(
+            f'Repeated queries (threshold {threshold}, {recorder.total} queries in total):\n'
+            + recorder.report(threshold)
+        )
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by assert_query_budget"""
+
+
+@contextmanager
+def assert_query_budget(queries, seconds=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Fail when the block runs more than queries queries, takes longer than
+    seconds, or repeats a query shape from one line (see assert_no_n_plus_one):
+
+        with assert_query_budget(queries=4, seconds=0.5):
+            self.client.get('/api/exams/list/')
+    """
+    started = time.perf_counter()
+    with assert_no_n_plus_one(threshold) as recorder:
+        yield recorder
+    elapsed = time.perf_counter() - started
+    if recorder.total > queries:
+        raise QueryBudgetExceeded(
+            f'{recorder.total} queries, budget {queries}:\n' + recorder.report(threshold=1)
+        )
+    if seconds is not None and elapsed > seconds:
+        raise QueryBudgetExceeded(f'{elapsed * 1000:.0f} ms, budget {seconds * 1000:.0f} ms')
+
+
+class NPlusOneMiddleware:
+    """
+    Development only: logs a warning naming the call site whenever a request
+    repeats a query shape N_PLUS_ONE_THRESHOLD times from one line, and adds
+    an X-N-Plus-One header with the number of such lines. Disabled unless
+    DEBUG is on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', DEFAULT_THRESHOLD)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        repeated = recorder.repeated(threshold)
+        if repeated:
+            logger.warning(
+                f'N+1 queries in {request.method} {request.path} '
+                f'({recorder.total} queries):\n{recorder.report(threshold)}'
+            )
+            response['X-N-Plus-One'] = str(len(repeated))
+        return response
@@ -29,6 +29,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'exam_system.metrics.RequestMetricsMiddleware',
+    # Logs repeated query shapes; only active with DEBUG on
+    'exam_system.querycheck.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,6 +73,30 @@ DATABASES = {
     }
 }
 
+# Cache. Every worker process must share it when there is more than one:
+# cached papers are computed once for all of them and autosave buffers
+# answers there. Without REDIS_URL each process keeps a cache of its own,
+# which is only suitable for a single process such as runserver.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds autosave holds changed answers in the cache between database
+# writes; see exams.autosave. Answers in a per-process cache would be lost
+# to a submit served by another worker, so without Redis every change is written.
+AUTOSAVE_FLUSH_INTERVAL = 10 if REDIS_URL else 0
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -106,4 +133,9 @@ AUTH_USER_MODEL = 'accounts.User'
 # Login URLs
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'accounts:dashboard'
-LOGOUT_REDIRECT_URL = 'accounts:login'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'accounts:login'
+
+# Request metrics: the share of requests measured (0 turns it off) and the
+# bearer token Prometheus scrapes /metrics with
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
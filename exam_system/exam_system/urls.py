@@ -5,6 +5,7 @@ from django.conf.urls.static import static
 from accounts.views import root_view
 from exams.views import api_student_exams, api_student_results
 from exams.urls import view_patterns
+from exam_system.metrics import metrics_view
 
 urlpatterns = [
     path('', root_view, name='root'),
@@ -22,6 +23,9 @@ urlpatterns = [
     # Additional API endpoints
     path('api/student/exams', api_student_exams, name='api_student_exams'),
     path('api/student/results', api_student_results, name='api_student_results'),
+
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve static files in development
@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Question, Exam, StudentExamResult
+from .models import Question, Exam, StudentExamResult, ExamStatistics, Subject
+from .rollups import delete_results
 
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ('text', 'marks')
     search_fields = ('text',)
 
+class SubjectAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name')
+    search_fields = ('name',)
+
 class ExamAdmin(admin.ModelAdmin):
     list_display = ('title', 'subject', 'department', 'semester', 'duration', 'passing_score')
     list_filter = ('department', 'semester')
@@ -15,6 +20,19 @@ class StudentExamResultAdmin(admin.ModelAdmin):
     list_filter = ('status', 'submitted_at')
     search_fields = ('student__user__username', 'exam__title')
 
+    def delete_model(self, request, obj):
+        delete_results(StudentExamResult.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_results(queryset)
+
+class ExamStatisticsAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'submissions', 'passed', 'late_submissions', 'min_mark', 'max_mark', 'updated_at')
+    search_fields = ('scope',)
+    readonly_fields = [field.name for field in ExamStatistics._meta.fields]
+
 admin.site.register(Question, QuestionAdmin)
+admin.site.register(Subject, SubjectAdmin)
 admin.site.register(Exam, ExamAdmin)
-admin.site.register(StudentExamResult, StudentExamResultAdmin)
\ No newline at end of file
+admin.site.register(StudentExamResult, StudentExamResultAdmin)
+admin.site.register(ExamStatistics, ExamStatisticsAdmin)
\ No newline at end of file
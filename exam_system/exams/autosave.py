@@ -0,0 +1,141 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ExamAttempt
+
+# Changed answers are written to ExamAttempt.answers on the first change and
+# then at most once per interval per attempt (plus once on submit), however
+# often the student changes answers. Changes in between wait in the cache, so
+# settings only enable this with a cache every worker shares; 0 writes every change.
+DEFAULT_FLUSH_INTERVAL = 10
+
+# Keep buffers well past the longest exam so unflushed answers survive until submit
+BUFFER_TIMEOUT = 24 * 60 * 60
+
+# Seconds a request may hold an attempt's buffer, and wait for another request to release it
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 3
+
+_counters = {'patches': 0, 'answers_changed': 0, 'flushes': 0}
+_counters_lock = threading.Lock()
+
+
+class AutosaveError(Exception):
+    """Raised when answers cannot be autosaved for an attempt"""
+
+
+def flush_interval():
+    return getattr(settings, 'AUTOSAVE_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+
+def _buffer_key(exam_id, student_id):
+    return f'autosave:{exam_id}:{student_id}'
+
+
+def _count(**increments):
+    with _counters_lock:
+        for name, amount in increments.items():
+            _counters[name] += amount
+
+
+def autosave_stats():
+    """
+    Counters for this process. write_amplification is database writes per
+    autosave request; it stays at or below 1 and falls as the flush interval grows.
+    """
+    with _counters_lock:
+        stats = dict(_counters)
+    stats['write_amplification'] = round(stats['flushes'] / stats['patches'], 4) if stats['patches'] else 0
+    return stats
+
+
+@contextmanager
+def locked(exam_id, student_id):
+    """
+    Hold an attempt's buffer for a read-modify-write. The lock is a cache
+    entry taken with add(), so it is shared by every worker that shares the cache.
+    """
+    key = f'{_buffer_key(exam_id, student_id)}:lock'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(key, token, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            raise AutosaveError('Answers are being saved by another request; try again')
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def _apply(answers, changes):
+    """answers with changes applied; a None value clears an answer"""
+    answers = dict(answers or {})
+    for question_id, value in changes.items():
+        if value is None:
+            answers.pop(question_id, None)
+        else:
+            answers[question_id] = value
+    return answers
+
+
+def _write(exam_id, student_id, changes):
+    """
+    Apply changes to the stored answers under a row lock, so writes from
+    other workers are merged rather than overwritten
+    """
+    with transaction.atomic():
+        attempt = ExamAttempt.objects.select_for_update().filter(
+            exam_id=exam_id, student_id=student_id
+        ).only('id', 'status', 'answers').first()
+        if attempt is None:
+            raise AutosaveError('Exam attempt has not been started')
+        if attempt.status == 'submitted':
+            raise AutosaveError('This exam has already been submitted')
+        attempt.answers = _apply(attempt.answers, changes)
+        attempt.status = 'in_progress'
+        attempt.save(update_fields=['answers', 'status'])
+    _count(flushes=1)
+
+
+def save_answers(exam_id, student_id, changes):
+    """
+    Merge changed answers into the attempt's buffer. A None value clears an answer.
+    The first change is written through to the database at once, later ones
+    when the flush interval has elapsed. Returns (answers changed, flushed).
+    """
+    changes = {str(question_id): value for question_id, value in changes.items()}
+    _count(patches=1, answers_changed=len(changes))
+    with locked(exam_id, student_id):
+        buffer = cache.get(_buffer_key(exam_id, student_id)) or {'pending': {}, 'flushed_at': None}
+        buffer['pending'].update(changes)
+
+        flushed = False
+        if buffer['flushed_at'] is None or time.time() - buffer['flushed_at'] >= flush_interval():
+            try:
+                _write(exam_id, student_id, buffer['pending'])
+            except AutosaveError:
+                cache.delete(_buffer_key(exam_id, student_id))
+                raise
+            buffer = {'pending': {}, 'flushed_at': time.time()}
+            flushed = True
+        cache.set(_buffer_key(exam_id, student_id), buffer, timeout=BUFFER_TIMEOUT)
+    return len(changes), flushed
+
+
+def saved_answers(exam_id, student_id, stored):
+    """The attempt's stored answers with the changes not yet written applied"""
+    buffer = cache.get(_buffer_key(exam_id, student_id))
+    return _apply(stored, buffer['pending']) if buffer else dict(stored or {})
+
+
+def discard(exam_id, student_id):
+    """Drop the buffer once its answers are part of a submission"""
+    cache.delete(_buffer_key(exam_id, student_id))
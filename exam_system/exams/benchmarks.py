@@ -0,0 +1,284 @@
+import json
+import os
+import platform
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Student
+
+from .dataset import generate_dataset
+from .export import export_lines
+from .grading import AnswerKey, grade_attempts, option_value
+from .item_analysis import item_statistics
+from .models import Exam, ExamAttempt, StudentExamResult
+from .paper_cache import build_paper
+from .reports import performance_by, performance_summary, question_analysis
+from .results import MAX_PAGE_SIZE, format_result, results_page
+
+# Dataset sizes; per-exam work grows with students / 40 (five departments, eight semesters)
+SIZES = {
+    'small': {'students': 2000, 'exams': 40, 'questions_per_exam': 10},
+    'medium': {'students': 10000, 'exams': 40, 'questions_per_exam': 20},
+    'large': {'students': 50000, 'exams': 40, 'questions_per_exam': 20},
+}
+DEFAULT_SIZES = ('small', 'medium')
+
+DEFAULT_REPEAT = 5
+
+# Calls are batched until one timing takes at least this long, as timeit's autorange does
+MIN_SAMPLE_SECONDS = 0.05
+
+# A change within this share of the baseline is reported as unchanged
+DEFAULT_THRESHOLD = 0.10
+
+# name -> (prepare, writes); prepare(context) does the untimed setup and returns the callable to time
+BENCHMARKS = {}
+
+
+class BenchmarkError(ValueError):
+    pass
+
+
+def benchmark(name, writes=False):
+    """
+    Register prepare(context) as a benchmark. Benchmarks that write run
+    once per timing, each inside a savepoint that is rolled back.
+    """
+    def register(prepare):
+        BENCHMARKS[name] = (prepare, writes)
+        return prepare
+    return register
+
+
+class Context:
+    """The dataset of one size as the benchmarks see it"""
+
+    def __init__(self, size, report):
+        self.size = size
+        self.report = report
+        # The past exam with most results, as a teacher would analyse it
+        self.exam = Exam.objects.annotate(results=Count('studentexamresult')).order_by('-results', 'id').first()
+        self.teacher = self.exam.created_by
+        now = timezone.now()
+        self.open_exam = Exam.objects.filter(start_time__lte=now, end_time__gte=now).order_by('id').first()
+
+
+@benchmark('paper.build')
+def _paper(context):
+    """The encoded paper take_exam serves, built on a cache miss"""
+    return lambda: build_paper(context.exam)
+
+
+@benchmark('grading.score')
+def _score(context):
+    """Scoring every submission of an exam against its compiled answer key, as grading does"""
+    key = AnswerKey.compile(context.exam)
+    submissions = list(ExamAttempt.objects.filter(exam=context.exam).values_list('answers', flat=True))
+    return lambda: key.score_many(submissions)
+
+
+@benchmark('grading.grade_attempts', writes=True)
+def _grade(context):
+    """
+    Grading a submit storm: every student of the open exam has submitted and
+    grade_attempts writes their results, answers and rollups
+    """
+    exam = context.open_exam
+    key = AnswerKey.compile(exam)
+    students = Student.objects.filter(department=exam.department, semester=exam.semester).order_by('id')
+    columns = list(zip(key.question_ids.tolist(), key.option_counts.tolist()))
+    attempts = ExamAttempt.objects.bulk_create([
+        ExamAttempt(
+            student=student, exam=exam, status='submitted', end_time=exam.start_time,
+            answers={
+                f'question_{question_id}': option_value((student.id + question_id) % count, count)
+                for question_id, count in columns
+            },
+        )
+        for student in students
+    ])
+    return lambda: grade_attempts(exam, attempts, key=key)
+
+
+@benchmark('reports.performance_summary')
+def _performance_summary(context):
+    """get_performance_report without grouping, read from the rollups"""
+    return performance_summary
+
+
+@benchmark('reports.performance_by_rollups')
+def _performance_by_rollups(context):
+    """Grouping that the rollups answer"""
+    return lambda: performance_by(['department', 'semester'])
+
+
+@benchmark('reports.performance_by_results')
+def _performance_by_results(context):
+    """Grouping over a filtered results queryset, aggregated from StudentExamResult"""
+    results = StudentExamResult.objects.filter(status='pass')
+    return lambda: performance_by(['exam', 'department'], results=results)
+
+
+@benchmark('reports.question_analysis')
+def _question_analysis(context):
+    """get_question_analysis: per-question counts plus item statistics"""
+    def run():
+        data = question_analysis(context.exam)
+        items = item_statistics(context.exam)
+        for question in data['questionAnalysis']:
+            question['itemStatistics'] = items.get(question['questionId'])
+        return data
+    return run
+
+
+@benchmark('results.list_page')
+def _results_page(context):
+    """A full page of list_results: query, format and render"""
+    results = StudentExamResult.objects.filter(exam__created_by=context.teacher)
+    renderer = JSONRenderer()
+
+    def run():
+        rows, next_cursor = results_page(results, {'limit': str(MAX_PAGE_SIZE)})
+        return renderer.render({'success': True, 'data': [format_result(row) for row in rows], 'nextCursor': next_cursor})
+    return run
+
+
+@benchmark('results.export_csv')
+def _export(context):
+    """Every result of the teacher's exams as CSV, as export_results streams it"""
+    results = StudentExamResult.objects.filter(exam__created_by=context.teacher)
+    return lambda: sum(len(line) for line in export_lines(results, 'csv'))
+
+
+def _time(run, writes):
+    """Seconds per call of one timing"""
+    if writes:
+        with transaction.atomic():
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed, 1
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_SAMPLE_SECONDS or number >= 1000:
+            return elapsed / number, number
+        number *= max(2, min(10, int(MIN_SAMPLE_SECONDS / max(elapsed, 1e-9)) + 1))
+
+
+def select(names=None):
+    """Benchmark names matching any of the given prefixes, in registration order"""
+    if not names:
+        return list(BENCHMARKS)
+    selected = [name for name in BENCHMARKS if any(name.startswith(prefix) for prefix in names)]
+    if not selected:
+        raise BenchmarkError(f"No benchmark matches {', '.join(names)}. Known: {', '.join(BENCHMARKS)}")
+    return selected
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, repeat=DEFAULT_REPEAT, seed=0, progress=None):
+    """
+    For each size, generate the dataset inside a transaction, time each
+    selected benchmark repeat times after a warm-up call and roll the dataset
+    back. Run it against a test database. Returns
+    {size: {name: {'median': s, 'min': s, 'number': calls per timing, 'repeat': n}}}.
+    """
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        raise BenchmarkError(f"Unknown size {', '.join(unknown)}. Use {', '.join(SIZES)}")
+    names = select(names)
+    progress = progress or (lambda size, name, result: None)
+    results = {}
+    for size in sizes:
+        results[size] = {}
+        with transaction.atomic():
+            cache.clear()
+            context = Context(size, generate_dataset(seed=seed, **SIZES[size]))
+            progress(size, None, context.report)
+            for name in names:
+                prepare, writes = BENCHMARKS[name]
+                with transaction.atomic():
+                    run = prepare(context)
+                    _time(run, writes)
+                    timings = [_time(run, writes) for _ in range(repeat)]
+                    transaction.set_rollback(True)
+                seconds = [elapsed for elapsed, _ in timings]
+                results[size][name] = {
+                    'median': statistics.median(seconds),
+                    'min': min(seconds),
+                    'number': timings[0][1],
+                    'repeat': repeat,
+                }
+                progress(size, name, results[size][name])
+            transaction.set_rollback(True)
+    return results
+
+
+def environment():
+    """What the timings depend on besides the code, stored with a baseline"""
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'database': connection.vendor,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    (size, name, baseline median, current median, ratio, verdict) for every
+    current timing; verdict is faster, slower, unchanged or new
+    """
+    rows = []
+    for size, timings in current.items():
+        for name, timing in timings.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                rows.append((size, name, None, timing['median'], None, 'new'))
+                continue
+            ratio = timing['median'] / previous['median'] if previous['median'] else None
+            # Rounded so that a change of exactly the threshold is not lost to float error
+            if ratio is None or round(abs(ratio - 1), 9) <= threshold:
+                verdict = 'unchanged'
+            else:
+                verdict = 'slower' if ratio > 1 else 'faster'
+            rows.append((size, name, previous['median'], timing['median'], ratio, verdict))
+    return rows
+
+
+def load_baseline(path):
+    """The stored {'environment': ..., 'results': ...} or None when there is no baseline yet"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, previous=None):
+    """
+    Store results as the baseline, keeping timings of sizes and benchmarks
+    that were not run this time
+    """
+    merged = {size: dict(timings) for size, timings in ((previous or {}).get('results') or {}).items()}
+    for size, timings in results.items():
+        merged.setdefault(size, {}).update(timings)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'environment': environment(),
+            'saved_at': timezone.now().isoformat(),
+            'results': merged,
+        }, f, indent=2, sort_keys=True)
@@ -0,0 +1,234 @@
+import math
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User, Student, Teacher
+from .grading import grade_attempts, option_index, option_value
+from .models import Department, Exam, ExamAttempt, Question, Subject
+from .registry import departments as department_registry, subjects as subject_registry
+
+INSERT_BATCH_SIZE = 1000
+
+SUBJECTS = (
+    'Mathematics 1', 'Physics', 'Python', 'Operating System', 'Data Structure and Algorithms',
+    'Database Management System', 'Java', 'Computer Graphics', 'Machine Learning', 'Cyber Security',
+)
+
+SEMESTERS = tuple(range(1, 9))
+
+# Share of eligible students who sit each past exam
+SITTING_SHARE = 0.9
+
+# Share of submissions that arrive in the late window
+LATE_SHARE = 0.05
+
+# Options per generated question, mostly four; two options make a True/False question
+OPTION_COUNTS = (2, 3, 4, 4, 4, 4, 5)
+
+# Exams each generated teacher sets
+EXAMS_PER_TEACHER = 4
+
+# College IDs end in a three digit serial, so a (semester, year, department) holds this many
+IDS_PER_YEAR = 1000
+
+
+class DatasetError(ValueError):
+    pass
+
+
+def college_ids(prefix, code, year, count):
+    """
+    count college IDs for one department, like 1mp23cs001; past IDS_PER_YEAR
+    the serials continue in the previous admission year
+    """
+    if count > IDS_PER_YEAR * 100:
+        raise DatasetError(f'Cannot make {count} IDs with prefix {prefix} in one department')
+    return [
+        f'{prefix}mp{(year - n // IDS_PER_YEAR) % 100:02d}{code}{n % IDS_PER_YEAR:03d}'
+        for n in range(count)
+    ]
+
+
+def _bulk(model, objects):
+    model.objects.bulk_create(objects, batch_size=INSERT_BATCH_SIZE)
+    if any(obj.pk is None for obj in objects):
+        raise RuntimeError(f'The database did not return ids for {model.__name__} rows')
+    return objects
+
+
+def _users(usernames, password_hash):
+    users = [
+        User(username=username, password=password_hash, email=f'{username}@example.edu',
+             first_name=username[:5], last_name=username[5:], status='active')
+        for username in usernames
+    ]
+    for user in users:
+        user.role = user.get_role_from_id()
+    return _bulk(User, users)
+
+
+def _reference_data():
+    Department.ensure_departments()
+    department_registry.bump()
+    existing = set(Subject.objects.filter(name__in=SUBJECTS).values_list('name', flat=True))
+    Subject.objects.bulk_create([Subject(name=name) for name in SUBJECTS if name not in existing])
+    subject_registry.bump()
+    subjects = list(Subject.objects.filter(name__in=SUBJECTS).order_by('id'))
+    departments = list(Department.objects.filter(
+        code__in=[code for code, _ in User.DEPARTMENT_CHOICES]
+    ).order_by('id'))
+    return departments, subjects
+
+
+def _teachers(department, count, year, password_hash):
+    users = _users(college_ids('0', department.code, year, count), password_hash)
+    return _bulk(Teacher, [Teacher(user=user, department=department) for user in users])
+
+
+def _students(department, semester, count, year, password_hash):
+    users = _users(college_ids(str(semester), department.code, year, count), password_hash)
+    return _bulk(Student, [Student(user=user, department=department, semester=semester) for user in users])
+
+
+def _exam(rng, teacher, semester, subjects, start, title, questions_per_exam):
+    return Exam(
+        title=title, subject=rng.choice(subjects), department=teacher.department, semester=semester,
+        duration=rng.choice((30, 45, 60, 90)), passing_score=rng.choice((40, 50, 60)),
+        start_time=start, end_time=start + timedelta(days=1), late_submission_end=start + timedelta(days=3),
+        created_by=teacher, status='active', total_questions=questions_per_exam,
+    )
+
+
+def _papers(rng, exams, questions_per_exam, option_counts):
+    """Unsaved questions for each exam, whose total_marks is set to match"""
+    papers = []
+    for exam in exams:
+        paper = []
+        for n in range(questions_per_exam):
+            count = rng.choice(option_counts)
+            options = ['True', 'False'] if count == 2 else [f'Option {chr(ord("A") + i)}' for i in range(count)]
+            paper.append(Question(
+                text=f'{exam.title}, question {n + 1}', options=options,
+                correct_answer=chr(ord('a') + rng.randrange(count)), marks=rng.choice((1, 1, 2)),
+                created_by=exam.created_by,
+            ))
+        exam.total_marks = sum(question.marks for question in paper)
+        papers.append(paper)
+    return papers
+
+
+def _save_papers(exams, papers):
+    """Insert the exams, then their questions and the links between them"""
+    _bulk(Exam, exams)
+    _bulk(Question, [question for paper in papers for question in paper])
+    Exam.questions.through.objects.bulk_create([
+        Exam.questions.through(exam_id=exam.id, question_id=question.id)
+        for exam, paper in zip(exams, papers) for question in paper
+    ], batch_size=INSERT_BATCH_SIZE)
+
+
+def _sit(rng, exam, paper, students, sitting_share, now):
+    """Submit and grade attempts at a past exam for a sitting_share of the given students"""
+    attempts = []
+    for student in students:
+        if rng.random() >= sitting_share:
+            continue
+        # Stronger students answer correctly more often, so item statistics are meaningful
+        ability = rng.uniform(0.3, 0.95)
+        answers = {}
+        for question in paper:
+            if rng.random() < 0.05:
+                continue
+            count = len(question.options)
+            correct = option_index(question.correct_answer, count)
+            chosen = correct if rng.random() < ability else rng.randrange(count)
+            answers[f'question_{question.id}'] = option_value(chosen, count)
+        late = rng.random() < LATE_SHARE
+        window = exam.late_submission_end - exam.end_time if late else exam.end_time - exam.start_time
+        submitted = (exam.end_time if late else exam.start_time) + window * rng.uniform(0.05, 0.95)
+        attempts.append(ExamAttempt(
+            student=student, exam=exam, answers=answers, status='submitted', end_time=submitted,
+            is_late_submission=late, graded_at=now, claimed_by='dataset', claimed_at=now,
+        ))
+    _bulk(ExamAttempt, attempts)
+    grade_attempts(exam, attempts)
+    return len(attempts)
+
+
+def generate_dataset(students, exams, seed=0, questions_per_exam=10, year=None, password='password',
+                     sitting_share=SITTING_SHARE, progress=None):
+    """
+    Seed a dataset of a given size for load and scale testing. Students are
+    spread evenly over the five departments and eight semesters, with valid
+    college IDs that continue into earlier admission years once a year's
+    serials run out. Exams rotate over departments and semesters; one in ten
+    is open today, one in twenty starts next week and the rest ran in the
+    last six months and have graded submissions. Questions have two to five
+    options. The same arguments give the same rows, apart from the dates,
+    which are relative to today. progress(stage, count) is called as each
+    stage completes. Returns a dict of what was made.
+    """
+    if students < 0 or exams < 0 or questions_per_exam < 1:
+        raise DatasetError('Counts must not be negative and exams need at least one question')
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    year = (now.year if year is None else year) % 100
+    password_hash = make_password(password)
+    progress = progress or (lambda stage, count: None)
+
+    with transaction.atomic():
+        departments, subjects = _reference_data()
+        groups = [(department, semester) for department in departments for semester in SEMESTERS]
+
+        per_department = max(1, math.ceil(exams / len(departments) / EXAMS_PER_TEACHER))
+        teachers = {
+            department.id: _teachers(department, per_department, year, password_hash)
+            for department in departments
+        }
+        progress('teachers', per_department * len(departments))
+
+        by_group = {}
+        for index, (department, semester) in enumerate(groups):
+            count = len(range(index, students, len(groups)))
+            by_group[(department.id, semester)] = _students(department, semester, count, year, password_hash)
+        progress('students', students)
+
+        schedule = []
+        for n in range(exams):
+            department = departments[n % len(departments)]
+            semester = SEMESTERS[(n // len(departments)) % len(SEMESTERS)]
+            teacher = teachers[department.id][(n // len(departments)) % per_department]
+            if n % 10 == 9:
+                start = today
+            elif n % 20 == 18:
+                start = today + timedelta(days=7)
+            else:
+                start = today - timedelta(days=rng.randrange(3, 180), hours=rng.randrange(8, 17))
+            schedule.append(_exam(
+                rng, teacher, semester, subjects, start,
+                f'{department.code.upper()} semester {semester} test {n + 1}', questions_per_exam
+            ))
+        papers = _papers(rng, schedule, questions_per_exam, OPTION_COUNTS)
+        _save_papers(schedule, papers)
+        progress('exams', exams)
+
+        past = [(exam, paper) for exam, paper in zip(schedule, papers) if exam.late_submission_end < now]
+        attempts = 0
+        for exam, paper in past:
+            attempts += _sit(rng, exam, paper, by_group[(exam.department_id, exam.semester)], sitting_share, now)
+            progress('results', attempts)
+
+    return {
+        'departments': len(departments),
+        'subjects': len(subjects),
+        'teachers': per_department * len(departments),
+        'students': students,
+        'exams': exams,
+        'questions': exams * questions_per_exam,
+        'results': attempts,
+    }
@@ -0,0 +1,66 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (column name, field relative to StudentExamResult)
+EXPORT_COLUMNS = (
+    ('result_id', 'id'),
+    ('student_id', 'student__user__username'),
+    ('first_name', 'student__user__first_name'),
+    ('last_name', 'student__user__last_name'),
+    ('exam_id', 'exam_id'),
+    ('exam', 'exam__title'),
+    ('subject', 'exam__subject__name'),
+    ('department', 'exam__department__name'),
+    ('semester', 'exam__semester'),
+    ('obtained_marks', 'obtained_marks'),
+    ('total_marks', 'exam__total_marks'),
+    ('status', 'status'),
+    ('submitted_at', 'submitted_at'),
+)
+
+
+class _Echo:
+    """File-like object whose write returns the line instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(results, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream result rows as tuples in EXPORT_COLUMNS order. iterator() reads
+    through a server-side cursor where the database has one, so memory stays
+    flat whatever the number of rows.
+    """
+    return results.order_by('id').values_list(
+        *(field for _, field in EXPORT_COLUMNS)
+    ).iterator(chunk_size=chunk_size)
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(value.isoformat() if hasattr(value, 'isoformat') else value for value in row)
+
+
+def jsonl_lines(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+# format -> (content type, file extension, line generator)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', csv_lines),
+    'jsonl': ('application/x-ndjson', 'jsonl', jsonl_lines),
+}
+
+
+def export_lines(results, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lazily render results in one of EXPORT_FORMATS"""
+    return EXPORT_FORMATS[export_format][2](export_rows(results, chunk_size=chunk_size))
@@ -0,0 +1,328 @@
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import AttemptAnswer, Exam, ExamAttempt, StudentExamResult
+from .rollups import add_results
+from .single_flight import answer_key_flight
+
+UNANSWERED = -1
+
+# claimed_by prefix of attempts whose exam could not be graded; they leave the
+# queue until requeue_failed_attempts() puts them back
+FAILED_PREFIX = 'failed:'
+
+logger = logging.getLogger(__name__)
+
+# Values the take exam page posts for True/False questions
+_TRUE_FALSE = {'t': 0, 'true': 0, 'f': 1, 'false': 1}
+
+
+def option_index(value, option_count):
+    """
+    Convert a submitted or stored answer to a 0-based option index.
+    Accepts letters ('a', 'B'), True/False values and integer indices.
+    Returns UNANSWERED for anything that does not name a valid option.
+    """
+    if value is None or isinstance(value, bool):
+        return UNANSWERED
+    if isinstance(value, int):
+        index = value
+    else:
+        value = str(value).strip().lower()
+        if option_count == 2 and value in _TRUE_FALSE:
+            index = _TRUE_FALSE[value]
+        elif value.isdigit():
+            index = int(value)
+        elif len(value) == 1 and 'a' <= value <= 'z':
+            index = ord(value) - ord('a')
+        else:
+            return UNANSWERED
+    return index if 0 <= index < option_count else UNANSWERED
+
+
+def option_value(index, option_count):
+    """Inverse of option_index: the letter (or t/f) the take exam page uses for an option"""
+    if index is None or index < 0:
+        return None
+    if option_count == 2:
+        return 'tf'[index]
+    return chr(ord('a') + index)
+
+
+def _question_id(key):
+    """Answer keys may be '12', 12 or 'question_12' (the take exam form field name)"""
+    key = str(key)
+    if key.startswith('question_'):
+        key = key[len('question_'):]
+    return int(key) if key.isdigit() else None
+
+
+class AnswerKey:
+    """
+    An exam's answer key compiled into flat arrays, one column per question.
+    Submissions are encoded into rows of option indices and scored together.
+    """
+
+    def __init__(self, exam_id, question_ids, correct, marks, option_counts, passing_score):
+        self.exam_id = exam_id
+        self.question_ids = np.asarray(question_ids, dtype=np.int64)
+        self.correct = np.asarray(correct, dtype=np.int8)
+        self.marks = np.asarray(marks, dtype=np.int32)
+        self.option_counts = np.asarray(option_counts, dtype=np.int16)
+        self.passing_score = passing_score
+        self.total_marks = int(self.marks.sum())
+        self.columns = {qid: i for i, qid in enumerate(question_ids)}
+        self._option_counts = self.option_counts.tolist()
+
+    @classmethod
+    def compile(cls, exam):
+        rows = list(exam.questions.order_by('id').values_list('id', 'options', 'correct_answer', 'marks'))
+        question_ids, correct, marks, option_counts = [], [], [], []
+        for qid, options, correct_answer, mark in rows:
+            count = len(options or [])
+            question_ids.append(qid)
+            correct.append(option_index(correct_answer, count))
+            marks.append(mark)
+            option_counts.append(count)
+        return cls(exam.id, question_ids, correct, marks, option_counts, exam.passing_score)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def _cells(self, answers):
+        """Yield (column, option index) for each answer that matches a question"""
+        columns, option_counts = self.columns, self._option_counts
+        for key, value in (answers or {}).items():
+            column = columns.get(_question_id(key))
+            if column is not None:
+                yield column, option_index(value, option_counts[column])
+
+    def encode(self, answers):
+        """Encode one answers dict into a row of option indices"""
+        return self.encode_many([answers])[0]
+
+    def encode_many(self, submissions):
+        """Encode a sequence of answers dicts into a students x questions matrix"""
+        rows, columns, values = [], [], []
+        for i, answers in enumerate(submissions):
+            for column, index in self._cells(answers):
+                rows.append(i)
+                columns.append(column)
+                values.append(index)
+        matrix = np.full((len(submissions), len(self)), UNANSWERED, dtype=np.int8)
+        matrix[rows, columns] = values
+        return matrix
+
+    def score_matrix(self, responses):
+        """
+        Score an encoded response matrix.
+        Returns (obtained marks, passed, per-question correctness) arrays.
+        passing_score is a percentage of the exam's total marks.
+        """
+        is_correct = (responses == self.correct) & (self.correct != UNANSWERED)
+        obtained = is_correct.astype(np.int32) @ self.marks
+        if self.total_marks:
+            passed = obtained * 100 >= self.passing_score * self.total_marks
+        else:
+            passed = np.zeros(len(responses), dtype=bool)
+        return obtained, passed, is_correct
+
+    def score_many(self, submissions):
+        return self.score_matrix(self.encode_many(submissions))
+
+    def score(self, answers):
+        """Score a single submission"""
+        obtained, passed, is_correct = self.score_matrix(self.encode(answers)[np.newaxis, :])
+        return {
+            'obtained_marks': int(obtained[0]),
+            'total_marks': self.total_marks,
+            'status': 'pass' if passed[0] else 'fail',
+            'correct': {str(qid): bool(ok) for qid, ok in zip(self.question_ids.tolist(), is_correct[0])}
+        }
+
+
+def get_answer_key(exam):
+    """Return the compiled answer key for an exam, compiling it once per paper version"""
+    return answer_key_flight.get(
+        f'{exam.id}:v{exam.paper_version}',
+        lambda: AnswerKey.compile(exam)
+    )
+
+
+def grade_attempts(exam, attempts, key=None):
+    """
+    Grade submitted attempts of one exam and write their StudentExamResult rows
+    with a single bulk_create, dated when each attempt was submitted, then add
+    them to the exam's statistics rollups. Attempts that already have a result
+    are skipped. Returns the results created.
+    """
+    if not attempts:
+        return []
+    with transaction.atomic():
+        # Lock the attempts before looking for results: a concurrent grader of the
+        # same attempts waits here and then skips them, so no result, answer row or
+        # rollup increment is written twice. Without row locks (SQLite) the second
+        # grader's insert fails on the unique constraint instead.
+        list(ExamAttempt.objects.select_for_update().filter(
+            id__in=[attempt.id for attempt in attempts]
+        ).values_list('id', flat=True))
+        graded = set(StudentExamResult.objects.filter(
+            exam_id=exam.id, student_id__in=[attempt.student_id for attempt in attempts]
+        ).values_list('student_id', flat=True))
+        attempts = [attempt for attempt in attempts if attempt.student_id not in graded]
+        if not attempts:
+            return []
+        if key is None:
+            key = get_answer_key(exam)
+        responses = key.encode_many([attempt.answers for attempt in attempts])
+        obtained, passed, is_correct = key.score_matrix(responses)
+        now = timezone.now()
+        results = [
+            StudentExamResult(
+                student_id=attempt.student_id,
+                exam_id=exam.id,
+                obtained_marks=int(marks),
+                status='pass' if ok else 'fail',
+                submitted_at=attempt.end_time or now
+            )
+            for attempt, marks, ok in zip(attempts, obtained.tolist(), passed.tolist())
+        ]
+        StudentExamResult.objects.bulk_create(results)
+        record_answers(exam, attempts, key, responses, is_correct)
+        # bulk_create sends no post_save, so the rollups are updated here in one go
+        add_results(exam, results)
+    return results
+
+
+def record_answers(exam, attempts, key, responses=None, is_correct=None):
+    """
+    Write one AttemptAnswer row per answered question of the given attempts
+    with a single bulk_create. responses and is_correct are the encoded and
+    scored matrices when the caller already has them.
+    """
+    if responses is None:
+        responses = key.encode_many([attempt.answers for attempt in attempts])
+        _, _, is_correct = key.score_matrix(responses)
+    rows, columns = np.nonzero(responses != UNANSWERED)
+    question_ids = key.question_ids.tolist()
+    answers = [
+        AttemptAnswer(
+            attempt_id=attempts[row].id,
+            exam_id=exam.id,
+            question_id=question_ids[column],
+            chosen_option=option,
+            is_correct=correct
+        )
+        for row, column, option, correct in zip(
+            rows.tolist(), columns.tolist(),
+            responses[rows, columns].tolist(), is_correct[rows, columns].tolist()
+        )
+    ]
+    AttemptAnswer.objects.bulk_create(answers, batch_size=2000, ignore_conflicts=True)
+    return len(answers)
+
+
+def backfill_answers(batch_size=500):
+    """
+    Write AttemptAnswer rows for graded attempts that have none, such as those
+    graded before answers were recorded. Returns the number of attempts processed.
+    """
+    attempts = ExamAttempt.objects.filter(
+        Exists(StudentExamResult.objects.filter(exam_id=OuterRef('exam_id'), student_id=OuterRef('student_id'))),
+        ~Exists(AttemptAnswer.objects.filter(attempt_id=OuterRef('pk'))),
+    ).only('id', 'exam_id', 'answers').order_by('id')
+    processed, last_id = 0, 0
+    while True:
+        batch = list(attempts.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return processed
+        by_exam = defaultdict(list)
+        for attempt in batch:
+            by_exam[attempt.exam_id].append(attempt)
+        exams = Exam.objects.in_bulk(list(by_exam))
+        with transaction.atomic():
+            for exam_id, group in by_exam.items():
+                record_answers(exams[exam_id], group, get_answer_key(exams[exam_id]))
+        processed += len(batch)
+        last_id = batch[-1].id
+
+
+def pending_attempts():
+    """Submitted attempts that have not been graded yet and have not failed grading"""
+    return ExamAttempt.objects.filter(status='submitted', graded_at__isnull=True).exclude(
+        claimed_by__startswith=FAILED_PREFIX
+    )
+
+
+def requeue_failed_attempts():
+    """Put attempts that failed grading back in the queue. Returns how many there were."""
+    return ExamAttempt.objects.filter(
+        status='submitted', graded_at__isnull=True, claimed_by__startswith=FAILED_PREFIX
+    ).update(claimed_by=None, claimed_at=None)
+
+
+def _grade_claimed(attempts, worker_id):
+    """
+    Grade claimed attempts exam by exam and mark them graded. Each exam is
+    graded in a savepoint; if one fails, its attempts are marked failed and
+    the other exams are still graded.
+    """
+    by_exam = defaultdict(list)
+    for attempt in attempts:
+        by_exam[attempt.exam_id].append(attempt)
+    exams = Exam.objects.in_bulk(list(by_exam))
+    graded, failed = [], []
+    for exam_id, group in by_exam.items():
+        try:
+            with transaction.atomic():
+                grade_attempts(exams[exam_id], group)
+        except Exception:
+            logger.exception('Could not grade %d attempts of exam %s', len(group), exam_id)
+            failed += group
+        else:
+            graded += group
+    now = timezone.now()
+    ExamAttempt.objects.filter(id__in=[attempt.id for attempt in graded]).update(
+        graded_at=now, claimed_by=worker_id, claimed_at=now
+    )
+    if failed:
+        ExamAttempt.objects.filter(id__in=[attempt.id for attempt in failed]).update(
+            claimed_by=f'{FAILED_PREFIX}{worker_id}', claimed_at=now
+        )
+
+
+def grade_pending_attempts(batch_size=500, worker_id=None):
+    """
+    Claim up to batch_size pending attempts, grade them and write their results
+    in one transaction. Safe to run from several worker processes at once.
+    Returns the number of attempts claimed, including any that failed grading.
+
+    On databases with SKIP LOCKED the claim is a row lock, so workers never
+    wait on each other's batches. SQLite has no row locks; there the rows are
+    claimed with a conditional UPDATE, which takes the database write lock.
+    """
+    worker_id = (worker_id or f'{socket.gethostname()}:{os.getpid()}')[:40]
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            attempts = list(
+                pending_attempts().select_for_update(skip_locked=True).order_by('id')[:batch_size]
+            )
+        else:
+            candidate_ids = list(pending_attempts().order_by('id').values_list('id', flat=True)[:batch_size])
+            if not candidate_ids:
+                return 0
+            token = f'{worker_id}:{uuid.uuid4().hex[:16]}'
+            # Only rows still ungraded when the UPDATE runs are ours
+            pending_attempts().filter(id__in=candidate_ids).update(claimed_by=token)
+            attempts = list(pending_attempts().filter(claimed_by=token))
+        if attempts:
+            _grade_claimed(attempts, worker_id)
+    return len(attempts)
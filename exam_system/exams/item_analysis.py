@@ -0,0 +1,146 @@
+from itertools import chain
+
+import numpy as np
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from .grading import UNANSWERED, get_answer_key, option_value
+from .models import AttemptAnswer, ExamAttempt, StudentExamResult
+
+# Share of examinees in each of the upper and lower scoring groups (Kelley's 27%)
+GROUP_FRACTION = 0.27
+# A distractor is functional when at least this share of examinees choose it
+FUNCTIONAL_DISTRACTOR_SHARE = 0.05
+
+
+def _fetch(queryset):
+    """Run a values_list queryset on the raw cursor; far cheaper than model iteration for large matrices"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def load_responses(exam, key):
+    """
+    Load the graded responses of an exam as a dense students x questions
+    matrix of option indices (UNANSWERED where no option was chosen),
+    with the columns in answer key order.
+    """
+    attempts = ExamAttempt.objects.filter(
+        Exists(StudentExamResult.objects.filter(exam_id=OuterRef('exam_id'), student_id=OuterRef('student_id'))),
+        exam_id=exam.id,
+    ).order_by('id').values_list('id', flat=True)
+    attempt_ids = np.array([row[0] for row in _fetch(attempts)], dtype=np.int64)
+    responses = np.full((len(attempt_ids), len(key)), UNANSWERED, dtype=np.int8)
+    if not len(attempt_ids) or not len(key):
+        return responses
+
+    rows = _fetch(AttemptAnswer.objects.filter(exam_id=exam.id).values_list(
+        'attempt_id', 'question_id', 'chosen_option'
+    ))
+    if not rows:
+        return responses
+    cells = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 3).reshape(-1, 3)
+    row = np.searchsorted(attempt_ids, cells[:, 0])
+    column = np.searchsorted(key.question_ids, cells[:, 1])
+    # Drop answers of attempts without a result and questions no longer on the exam
+    known = (
+        (row < len(attempt_ids)) & (attempt_ids[np.minimum(row, len(attempt_ids) - 1)] == cells[:, 0])
+        & (column < len(key)) & (key.question_ids[np.minimum(column, len(key) - 1)] == cells[:, 1])
+    )
+    responses[row[known], column[known]] = cells[known, 2]
+    return responses
+
+
+def _correlate(x, y):
+    """Column-wise Pearson correlation of two equally shaped matrices; NaN where a column is constant"""
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (x * y).sum(axis=0) / np.sqrt((x * x).sum(axis=0) * (y * y).sum(axis=0))
+
+
+def analyse(responses, key):
+    """
+    Classical item statistics for every question, computed on whole arrays.
+
+    difficulty             share of examinees answering correctly (p)
+    point_biserial         correlation of the item with the rest score
+                           (total marks minus the item's own marks)
+    discrimination         p in the top 27% by total marks minus p in the bottom 27%
+    distractor_efficiency  share of distractors chosen by at least 5% of examinees
+    option_share           share choosing each option, questions x options
+    option_upper/lower     the same within the upper and lower groups
+    """
+    n, questions = responses.shape
+    width = int(key.option_counts.max()) if questions else 0
+    correct = ((responses == key.correct) & (key.correct != UNANSWERED)).astype(np.float64)
+    item_marks = correct * key.marks
+    total = item_marks.sum(axis=1)
+
+    difficulty = correct.mean(axis=0)
+    point_biserial = _correlate(correct, total[:, np.newaxis] - item_marks)
+
+    group = max(1, int(round(n * GROUP_FRACTION)))
+    ranked = np.argsort(total, kind='stable')
+    lower, upper = ranked[:group], ranked[-group:]
+    discrimination = correct[upper].mean(axis=0) - correct[lower].mean(axis=0)
+
+    chosen = responses[:, :, np.newaxis] == np.arange(width, dtype=np.int8)
+    option_share = chosen.mean(axis=0)
+    option_upper = chosen[upper].mean(axis=0)
+    option_lower = chosen[lower].mean(axis=0)
+
+    options = np.arange(width)
+    is_distractor = (options < key.option_counts[:, np.newaxis]) & (options != key.correct[:, np.newaxis])
+    functional = (is_distractor & (option_share >= FUNCTIONAL_DISTRACTOR_SHARE)).sum(axis=1)
+    distractors = is_distractor.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distractor_efficiency = functional / distractors
+
+    return {
+        'examinees': n,
+        'difficulty': difficulty,
+        'point_biserial': point_biserial,
+        'discrimination': discrimination,
+        'distractor_efficiency': distractor_efficiency,
+        'functional_distractors': functional,
+        'option_share': option_share,
+        'option_upper': option_upper,
+        'option_lower': option_lower,
+    }
+
+
+def _number(value, digits=4):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def item_statistics(exam):
+    """Item statistics for an exam's questions, keyed by question id"""
+    key = get_answer_key(exam)
+    responses = load_responses(exam, key)
+    if not len(responses):
+        return {}
+    stats = analyse(responses, key)
+    items = {}
+    for column, question_id in enumerate(key.question_ids.tolist()):
+        option_count = int(key.option_counts[column])
+        items[question_id] = {
+            'difficulty': _number(stats['difficulty'][column]),
+            'pointBiserial': _number(stats['point_biserial'][column]),
+            'discrimination': _number(stats['discrimination'][column]),
+            'distractorEfficiency': _number(stats['distractor_efficiency'][column] * 100, 2),
+            'functionalDistractors': int(stats['functional_distractors'][column]),
+            'options': [
+                {
+                    'answer': option_value(i, option_count),
+                    'isCorrect': i == int(key.correct[column]),
+                    'share': _number(stats['option_share'][column, i]),
+                    'upperShare': _number(stats['option_upper'][column, i]),
+                    'lowerShare': _number(stats['option_lower'][column, i]),
+                }
+                for i in range(option_count)
+            ],
+        }
+    return items
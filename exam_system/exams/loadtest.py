@@ -0,0 +1,320 @@
+import json
+import math
+import random
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from accounts.models import Student
+from .grading import option_value
+from .models import Exam, ExamAttempt
+
+# The steps of one exam session, in order; a failed step ends its session
+STEPS = ('login', 'student_exams', 'start', 'questions', 'autosave', 'submit')
+
+PERCENTILES = (50, 95, 99)
+
+DEFAULT_TIMEOUT = 30
+
+
+class LoadTestError(ValueError):
+    pass
+
+
+class StepFailed(Exception):
+    pass
+
+
+def pick_accounts(count, exam_id=None):
+    """
+    An exam that is open now and count of its students who have not
+    attempted it. Without exam_id, the open exam with the most such students
+    is used. Reads the database this process is configured with, so the
+    server under test must use the same one. Returns (exam, usernames).
+    """
+    now = timezone.now()
+    open_exams = list(Exam.objects.filter(status='active', start_time__lte=now, end_time__gte=now).order_by('id'))
+    if exam_id is not None:
+        open_exams = [exam for exam in open_exams if exam.id == exam_id]
+        if not open_exams:
+            raise LoadTestError(f'Exam {exam_id} does not exist or is not open')
+    if not open_exams:
+        raise LoadTestError('No exam is open now; run generate_dataset or pass --exam')
+
+    groups = {
+        (row['department_id'], row['semester']): row['students']
+        for row in Student.objects.values('department_id', 'semester').annotate(students=Count('id'))
+    }
+    attempted = dict(
+        ExamAttempt.objects.filter(exam__in=open_exams).values('exam_id')
+        .annotate(attempts=Count('id')).values_list('exam_id', 'attempts')
+    )
+    exam = max(open_exams, key=lambda exam: (
+        groups.get((exam.department_id, exam.semester), 0) - attempted.get(exam.id, 0), -exam.id
+    ))
+    usernames = list(
+        Student.objects.filter(department_id=exam.department_id, semester=exam.semester)
+        .exclude(Exists(ExamAttempt.objects.filter(exam_id=exam.id, student_id=OuterRef('pk'))))
+        .order_by('id').values_list('user__username', flat=True)[:count]
+    )
+    if len(usernames) < count:
+        raise LoadTestError(
+            f'Exam {exam.id} has {len(usernames)} students left who have not attempted it, {count} needed'
+        )
+    return exam, usernames
+
+
+class Recorder:
+    """Thread-safe log of (step, started, seconds, status) for every step taken"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+        self.aborted = {}
+
+    def record(self, step, started, seconds, status):
+        with self._lock:
+            self.samples.append((step, started, seconds, status))
+
+    def abort(self, step):
+        with self._lock:
+            self.aborted[step] = self.aborted.get(step, 0) + 1
+
+
+class SubmitGate:
+    """
+    Holds sessions before they submit until every session has either arrived
+    or dropped out, then releases them together
+    """
+
+    def __init__(self, parties):
+        self._condition = threading.Condition()
+        self._waiting = parties
+
+    def _count_down(self):
+        self._waiting -= 1
+        if self._waiting <= 0:
+            self._condition.notify_all()
+
+    def wait(self):
+        with self._condition:
+            self._count_down()
+            self._condition.wait_for(lambda: self._waiting <= 0)
+
+    def leave(self):
+        with self._condition:
+            self._count_down()
+
+
+class Session:
+    """
+    One student's browser: a cookie jar, the CSRF token Django hands out, and
+    the requests the take exam page makes, from login to submit
+    """
+
+    def __init__(self, base_url, username, password, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, method, path, data=None, form=None):
+        """Returns (status, decoded JSON body or None); status 0 means no response"""
+        headers = {'Accept': 'application/json', 'Referer': self.base_url + '/'}
+        body = None
+        if form is not None:
+            body = urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        if method not in ('GET', 'HEAD'):
+            headers['X-CSRFToken'] = self._csrf_token()
+        request = Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except HTTPError as e:
+            status, content = e.code, e.read()
+        except (URLError, OSError):
+            return 0, None
+        try:
+            return status, json.loads(content)
+        except ValueError:
+            return status, None
+
+    def step(self, recorder, name, *requests):
+        """Make requests (method, path, kwargs) in turn as one timed step; returns the last body"""
+        started = time.time()
+        clock = time.perf_counter()
+        for method, path, kwargs in requests:
+            status, body = self.request(method, path, **kwargs)
+            if not 200 <= status < 400:
+                break
+        recorder.record(name, started, time.perf_counter() - clock, status)
+        if not 200 <= status < 400:
+            raise StepFailed(name)
+        return body
+
+    def run(self, recorder, exam_id, rng, autosaves=3, think=0.0, submit_gate=None):
+        """Sit the exam; a failed step is recorded and ends the session"""
+        try:
+            self.step(recorder, 'login',
+                      ('GET', '/accounts/get-csrf/', {}),
+                      ('POST', '/accounts/login/', {'form': {
+                          'username': self.username, 'password': self.password, 'userType': 'student'
+                      }}))
+            self._pause(think, rng)
+            self.step(recorder, 'student_exams', ('GET', '/api/student/exams', {}))
+            self._pause(think, rng)
+            self.step(recorder, 'start', ('POST', f'/exams/api/start_attempt/{exam_id}/', {}))
+            # The take exam page loads its questions from here once the attempt has started
+            paper = self.step(recorder, 'questions', ('GET', f'/api/exams/{exam_id}/questions/', {}))
+            questions = (paper or {}).get('questions', [])
+            answers = {
+                f'question_{question["id"]}': option_value(rng.randrange(len(question['options'])),
+                                                           len(question['options']))
+                for question in questions if question.get('options')
+            }
+            keys = list(answers)
+            for n in range(autosaves):
+                self._pause(think, rng)
+                changed = {key: answers[key] for key in keys[n::autosaves]}
+                if changed:
+                    self.step(recorder, 'autosave',
+                              ('PATCH', f'/api/exams/{exam_id}/autosave/', {'data': {'answers': changed}}))
+            if submit_gate is not None:
+                gate, submit_gate = submit_gate, None
+                gate.wait()
+            else:
+                self._pause(think, rng)
+            self.step(recorder, 'submit', ('POST', f'/api/exams/{exam_id}/submit/', {'data': {'answers': answers}}))
+        except StepFailed as e:
+            recorder.abort(str(e))
+        finally:
+            if submit_gate is not None:
+                # Sessions waiting to submit together must not wait for this one
+                submit_gate.leave()
+
+    @staticmethod
+    def _pause(think, rng):
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+
+
+def run_load_test(base_url, exam_id, usernames, password, autosaves=3, ramp=0.0, think=0.0,
+                  sync_submit=False, timeout=DEFAULT_TIMEOUT, seed=0):
+    """
+    Run one session per username against the server at base_url, each in its
+    own thread. Sessions start evenly over ramp seconds; ramp=0 opens the exam
+    for everyone at once. think is the mean pause between steps. sync_submit
+    holds every session before submitting and releases them together, the
+    storm at the deadline. Returns (Recorder, wall seconds).
+    """
+    recorder = Recorder()
+    gate = SubmitGate(len(usernames)) if sync_submit else None
+    threads = []
+    started = time.perf_counter()
+    for index, username in enumerate(usernames):
+        session = Session(base_url, username, password, timeout=timeout)
+        thread = threading.Thread(
+            target=session.run, name=f'session-{username}',
+            args=(recorder, exam_id, random.Random(f'{seed}:{index}')),
+            kwargs={'autosaves': autosaves, 'think': think, 'submit_gate': gate},
+            daemon=True
+        )
+        delay = started + ramp * index / len(usernames) - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list: the smallest value with q% of the list at or below it"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered), max(1, math.ceil(q * len(ordered) / 100))) - 1]
+
+
+def summarize(recorder, wall):
+    """
+    One row per step: requests, errors, error rate, throughput over the time
+    the step was being taken, latency percentiles and the error statuses
+    """
+    rows = []
+    for step in STEPS:
+        samples = [sample for sample in recorder.samples if sample[0] == step]
+        if not samples and not recorder.aborted.get(step):
+            continue
+        latencies = sorted(seconds for _, _, seconds, _ in samples)
+        errors = {}
+        for _, _, _, status in samples:
+            if not 200 <= status < 400:
+                errors[status] = errors.get(status, 0) + 1
+        span = (max(started + seconds for _, started, seconds, _ in samples)
+                - min(started for _, started, _, _ in samples)) if samples else 0
+        row = {
+            'step': step,
+            'count': len(samples),
+            'errors': sum(errors.values()),
+            'error_rate': sum(errors.values()) / len(samples) if samples else 0.0,
+            'throughput': len(samples) / span if span > 0 else None,
+            'error_statuses': {str(status): count for status, count in sorted(errors.items())},
+            'aborted': recorder.aborted.get(step, 0),
+        }
+        for q in PERCENTILES:
+            row[f'p{q}'] = percentile(latencies, q)
+        row['max'] = latencies[-1] if latencies else None
+        rows.append(row)
+    total = len(recorder.samples)
+    completed = sum(1 for step, _, _, status in recorder.samples if step == 'submit' and 200 <= status < 400)
+    return {
+        'wall_seconds': wall,
+        'steps': rows,
+        'count': total,
+        'throughput': total / wall if wall > 0 else None,
+        'completed_sessions': completed,
+    }
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadedWSGIServer):
+    # socketserver listens with a backlog of 5, which resets connections in a storm
+    request_queue_size = 1024
+
+
+def serve(port=0):
+    """
+    Serve the project from background threads of this process, like
+    runserver without the reloader or static files. Client and server then
+    share one interpreter, so latencies are only comparable between runs made
+    the same way. Returns the server and its base URL.
+    """
+    server = _Server(('127.0.0.1', port), _QuietHandler)
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}'
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from exams.grading import backfill_answers
+
+class Command(BaseCommand):
+    help = 'Record per-question answers for graded attempts that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Attempts processed per transaction')
+
+    def handle(self, *args, **options):
+        processed = backfill_answers(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recorded answers for {processed} attempts'))
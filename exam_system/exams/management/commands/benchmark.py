@@ -0,0 +1,97 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+from exams.benchmarks import BENCHMARKS, DEFAULT_REPEAT, DEFAULT_SIZES, DEFAULT_THRESHOLD, SIZES, BenchmarkError, \
+    compare, load_baseline, run_benchmarks, save_baseline
+
+# Timings depend on the machine, so the baseline is kept locally and ignored by git
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, '.benchmarks', 'baseline.json')
+
+# The benchmarks time code, not a shared cache server
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the hot functions behind taking, grading and reporting on exams in isolation, across dataset '
+        'sizes, in a throwaway test database, and compares the timings with the stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                            help=f"Comma-separated dataset sizes out of {', '.join(SIZES)}")
+        parser.add_argument('--only', help='Comma-separated benchmark name prefixes, e.g. grading,reports.question')
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timings per benchmark')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the generated datasets')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare with')
+        parser.add_argument('--save', action='store_true', help='Store these timings as the new baseline')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Relative change below which a timing counts as unchanged')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when a benchmark is slower than its baseline')
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, (prepare, _) in BENCHMARKS.items():
+                self.stdout.write(f"{name:<32}{' '.join((prepare.__doc__ or '').split())}")
+            return
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        names = [name.strip() for name in options['only'].split(',') if name.strip()] if options['only'] else None
+        baseline = load_baseline(options['baseline'])
+
+        def progress(size, name, result):
+            if name is None:
+                self.stdout.write(f"{size}: {result['students']} students, {result['exams']} exams, "
+                                  f"{result['results']} results")
+            else:
+                self.stdout.write(f"  {name:<32}{_ms(result['median']):>12} ms")
+
+        # A test database keeps the generated rows away from real data
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = run_benchmarks(sizes, names, repeat=options['repeat'], seed=options['seed'],
+                                         progress=progress)
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(''.join([f'{"size":<8}', f'{"benchmark":<32}'] + [
+            f'{column:>12}' for column in ('baseline ms', 'median ms', 'min ms', 'speedup')
+        ]))
+        rows = compare(results, (baseline or {}).get('results') or {}, threshold=options['threshold'])
+        styles = {'faster': self.style.SUCCESS, 'slower': self.style.ERROR}
+        for size, name, previous, current, ratio, verdict in rows:
+            change = verdict if ratio is None else f'{previous / current:.2f}x {verdict}'
+            line = ''.join([f'{size:<8}', f'{name:<32}'] + [
+                f'{cell:>12}' for cell in (_ms(previous), _ms(current), _ms(results[size][name]['min']))
+            ]) + f'  {change}'
+            self.stdout.write(styles.get(verdict, str)(line))
+
+        if baseline is None:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save to store one")
+        elif baseline.get('environment'):
+            environment = baseline['environment']
+            self.stdout.write(f"Baseline from {baseline.get('saved_at', 'an unknown time')} on Python "
+                              f"{environment.get('python')}, {environment.get('database')}, "
+                              f"{environment.get('cpus')} CPUs")
+        if options['save']:
+            save_baseline(options['baseline'], results, previous=baseline)
+            self.stdout.write(self.style.SUCCESS(f"Saved the baseline to {options['baseline']}"))
+
+        slower = [f'{size} {name}' for size, name, _, _, _, verdict in rows if verdict == 'slower']
+        if slower and options['fail_on_regression']:
+            raise CommandError(f"Slower than the baseline: {', '.join(slower)}")
+
+
+def _ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.2f}'
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from exams.export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, export_lines
+from exams.models import StudentExamResult
+from exams.results import ResultsQueryError, filter_results
+
+class Command(BaseCommand):
+    help = 'Stream exam results as CSV or JSON lines, e.g. a whole semester for the registrar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', help='Output format')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--exam', help='Exam id, or comma separated ids')
+        parser.add_argument('--semester', help='Only exams of this semester')
+        parser.add_argument('--status', choices=['pass', 'fail'], help='Only passed or failed results')
+        parser.add_argument('--from', dest='from', help='Submitted on or after (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--to', help='Submitted on or before (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--teacher', help='Only exams created by this teacher (username)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per round trip')
+
+    def handle(self, *args, **options):
+        results = StudentExamResult.objects.all()
+        if options['teacher']:
+            results = results.filter(exam__created_by__user__username=options['teacher'])
+        try:
+            results = filter_results(results, options)
+        except ResultsQueryError as e:
+            raise CommandError(str(e))
+
+        lines = export_lines(results, options['format'], chunk_size=options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        rows = -1 if options['format'] == 'csv' else 0  # The CSV header is not a row
+        with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+            for line in lines:
+                out.write(line)
+                rows += 1
+        self.stdout.write(self.style.SUCCESS(f"Exported {rows} results to {options['output']}"))
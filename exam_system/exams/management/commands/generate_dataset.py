@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from exams.dataset import SITTING_SHARE, DatasetError, generate_dataset
+
+class Command(BaseCommand):
+    help = 'Generates a reproducible synthetic dataset of students, exams, questions and graded results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000, help='Students, spread over departments and semesters')
+        parser.add_argument('--exams', type=int, default=200, help='Exams; most have already run and have results')
+        parser.add_argument('--seed', type=int, default=0, help='The same seed and sizes give the same rows')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per exam')
+        parser.add_argument('--year', type=int, help='Admission year in the college IDs (default: this year)')
+        parser.add_argument('--password', default='password', help='Password of every generated account')
+        parser.add_argument('--sitting-share', type=float, default=SITTING_SHARE,
+                            help='Share of eligible students who sat each past exam')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(stage, count):
+            if options['verbosity'] > 1 or stage != 'results':
+                self.stdout.write(f'{stage}: {count} ({time.perf_counter() - started:.1f}s)')
+
+        try:
+            report = generate_dataset(
+                students=options['students'],
+                exams=options['exams'],
+                seed=options['seed'],
+                questions_per_exam=options['questions'],
+                year=options['year'],
+                password=options['password'],
+                sitting_share=options['sitting_share'],
+                progress=progress
+            )
+        except DatasetError as e:
+            raise CommandError(str(e))
+        except IntegrityError as e:
+            # IDs are derived from the sizes, so a second run collides with the first
+            raise CommandError(
+                f'Generated IDs already exist ({e}). Run cleanup_users first or pass another --year'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            'Generated ' + ', '.join(f'{count} {name}' for name, count in report.items())
+            + f' in {time.perf_counter() - started:.1f}s'
+        ))
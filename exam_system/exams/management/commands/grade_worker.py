@@ -0,0 +1,60 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+from exams.grading import grade_pending_attempts, requeue_failed_attempts
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Grade submitted exam attempts in batches (run several for more throughput)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Attempts claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Requeue attempts that failed grading before starting')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        graded_total = 0
+        started = time.monotonic()
+        self.stdout.write(self.style.NOTICE(f'Grading worker started (batch size {batch_size})'))
+        if options['retry_failed']:
+            self.stdout.write(f'Requeued {requeue_failed_attempts()} attempts that failed grading')
+
+        try:
+            while True:
+                batch_started = time.monotonic()
+                try:
+                    graded = grade_pending_attempts(batch_size=batch_size)
+                except OperationalError as e:
+                    # Lock contention with other workers; the batch was rolled back
+                    self.stdout.write(self.style.WARNING(f'Batch failed, retrying: {e}'))
+                    time.sleep(options['poll_interval'])
+                    continue
+                except Exception:
+                    # The batch was rolled back and is claimed again on the next pass
+                    logger.exception('Grading batch failed')
+                    if options['once']:
+                        raise
+                    time.sleep(options['poll_interval'])
+                    continue
+                if graded:
+                    graded_total += graded
+                    elapsed = time.monotonic() - batch_started
+                    self.stdout.write(f'Graded {graded} attempts in {elapsed:.2f}s')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted, stopping'))
+
+        elapsed = time.monotonic() - started
+        rate = graded_total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Graded {graded_total} attempts in {elapsed:.2f}s ({rate:.1f} attempts/s)'
+        ))
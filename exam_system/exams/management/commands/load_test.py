@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from exams.loadtest import DEFAULT_TIMEOUT, PERCENTILES, LoadTestError, pick_accounts, run_load_test, serve, summarize
+
+class Command(BaseCommand):
+    help = (
+        'Simulates students sitting an open exam at the same time: each session logs in, lists its exams, '
+        'starts the attempt, loads the questions, autosaves and submits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument('--serve', action='store_true',
+                            help='Serve the project from this process instead of using --url')
+        parser.add_argument('--sessions', type=int, default=50, help='Concurrent student sessions')
+        parser.add_argument('--exam', type=int, help='Open exam to sit (default: the one with most students left)')
+        parser.add_argument('--password', default='password', help='Password of the student accounts')
+        parser.add_argument('--autosaves', type=int, default=3, help='Autosave calls per session')
+        parser.add_argument('--ramp', type=float, default=0, help='Seconds over which sessions start; 0 starts all at once')
+        parser.add_argument('--think', type=float, default=0, help='Mean pause between steps, in seconds')
+        parser.add_argument('--sync-submit', action='store_true',
+                            help='Hold every session before submitting and submit together')
+        parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Seconds to wait for a response')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the answers and pauses')
+        parser.add_argument('--json', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        if options['sessions'] < 1:
+            raise CommandError('--sessions must be at least 1')
+        try:
+            exam, usernames = pick_accounts(options['sessions'], options['exam'])
+        except LoadTestError as e:
+            raise CommandError(str(e))
+
+        server, url = serve() if options['serve'] else (None, options['url'])
+        self.stdout.write(f'{len(usernames)} sessions sitting exam {exam.id} ({exam.title}) at {url}')
+        try:
+            recorder, wall = run_load_test(
+                url, exam.id, usernames, options['password'],
+                autosaves=options['autosaves'],
+                ramp=options['ramp'],
+                think=options['think'],
+                sync_submit=options['sync_submit'],
+                timeout=options['timeout'],
+                seed=options['seed']
+            )
+        finally:
+            if server is not None:
+                server.shutdown()
+        report = summarize(recorder, wall)
+        report['exam_id'] = exam.id
+        report['sessions'] = len(usernames)
+
+        columns = ['step', 'count', 'errors', 'req/s'] + [f'p{q} ms' for q in PERCENTILES] + ['max ms']
+        self.stdout.write(''.join(f'{column:>14}' for column in columns))
+        for row in report['steps']:
+            cells = [row['step'], row['count'], f"{row['errors']} ({row['error_rate']:.0%})", _number(row['throughput'])]
+            cells += [_ms(row[f'p{q}']) for q in PERCENTILES] + [_ms(row['max'])]
+            self.stdout.write(''.join(f'{cell:>14}' for cell in cells))
+            if row['error_statuses']:
+                statuses = ', '.join(f"{'no response' if status == '0' else status}: {count}"
+                                     for status, count in row['error_statuses'].items())
+                self.stdout.write(self.style.WARNING(f"{'':>14}errors by status: {statuses}"))
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        summary = (
+            f"{report['completed_sessions']}/{len(usernames)} sessions submitted; {report['count']} steps "
+            f"in {wall:.1f}s ({_number(report['throughput'])} steps/s)"
+        )
+        if report['completed_sessions'] == len(usernames):
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.ERROR(summary))
+
+
+def _ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.1f}'
+
+
+def _number(value):
+    return '-' if value is None else f'{value:.1f}'
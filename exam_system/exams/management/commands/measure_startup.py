@@ -0,0 +1,56 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: time django.setup() (app loading and every
+# AppConfig.ready()) and count the queries it issues.
+_PROBE = '''
+import json, time
+start = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+from django.db import connections
+queries = []
+def record(execute, sql, params, many, context):
+    queries.append(sql)
+    return execute(sql, params, many, context)
+for alias in connections:
+    connections[alias].execute_wrappers.append(record)
+import django
+django.setup()
+print(json.dumps({'seconds': time.perf_counter() - start, 'queries': queries}))
+'''
+
+class Command(BaseCommand):
+    help = 'Measure process startup (django.setup) time and the queries it runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+        parser.add_argument('--show-queries', action='store_true', help='Print the SQL issued during startup')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        samples = []
+        for _ in range(options['runs']):
+            probe = subprocess.run(
+                [sys.executable, '-c', _PROBE], env=env, cwd=os.getcwd(),
+                capture_output=True, text=True
+            )
+            if probe.returncode:
+                raise CommandError(f'Startup failed:\n{probe.stderr}')
+            samples.append(json.loads(probe.stdout.strip().splitlines()[-1]))
+
+        times = [sample['seconds'] * 1000 for sample in samples]
+        queries = samples[-1]['queries']
+        if options['show_queries']:
+            for sql in queries:
+                self.stdout.write(sql)
+        self.stdout.write(self.style.SUCCESS(
+            f"django.setup(): median {statistics.median(times):.1f} ms, "
+            f"min {min(times):.1f} ms over {len(times)} runs, {len(queries)} queries"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from exams.rollups import rebuild_statistics
+
+class Command(BaseCommand):
+    help = 'Recompute the ExamStatistics rollups from exam results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report rollups that have drifted')
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_statistics(check=options['check'])
+        for scope, stored, computed in mismatches:
+            self.stdout.write(self.style.WARNING(f'{scope}: stored {stored}, computed {computed}'))
+
+        if options['check']:
+            if mismatches:
+                self.stdout.write(self.style.ERROR(f'{len(mismatches)} rollups differ from the results'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All rollups match the results'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt exam statistics ({len(mismatches)} rollups corrected)'))
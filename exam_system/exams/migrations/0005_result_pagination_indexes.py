@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_attemptanswer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentexamresult',
+            index=models.Index(fields=['submitted_at', 'id'], name='exams_result_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentexamresult',
+            index=models.Index(fields=['obtained_marks', 'id'], name='exams_result_marks_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentexamresult',
+            index=models.Index(fields=['exam', 'submitted_at', 'id'], name='exams_result_exam_date_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Frozen copy of the default departments; migrations must not depend on
+# constants that may change later
+DEPARTMENTS = (
+    ('cg', 'Computer Science Design'),
+    ('cs', 'Computer Science Engineering'),
+    ('is', 'Information Science Engineering'),
+    ('ml', 'Artificial Intelligence & Machine Learning'),
+    ('ds', 'Artificial Intelligence & Data Science'),
+)
+
+
+def bootstrap_departments(apps, schema_editor):
+    """
+    Create the default departments and give department-less students and
+    teachers the one encoded at positions 5-7 of their college ID, with one
+    UPDATE per department. This used to run in ExamsConfig.ready() on every
+    process start; as a migration it runs once per database.
+    """
+    Department = apps.get_model('exams', 'Department')
+    Student = apps.get_model('accounts', 'Student')
+    Teacher = apps.get_model('accounts', 'Teacher')
+
+    for code, name in DEPARTMENTS:
+        department, _ = Department.objects.get_or_create(code=code, defaults={'name': name})
+        for profile in (Student, Teacher):
+            profile.objects.filter(
+                department__isnull=True, user__username__regex=rf'^.{{5}}{code}'
+            ).update(department=department)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_result_pagination_indexes'),
+        ('accounts', '0003_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.RunPython(bootstrap_departments, migrations.RunPython.noop),
+    ]
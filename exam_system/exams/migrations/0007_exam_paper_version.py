@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_bootstrap_departments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='paper_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:04
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copy of the registry names in exams.registry
+REGISTRIES = ('department', 'subject')
+
+
+def create_versions(apps, schema_editor):
+    """
+    Start every registry at version 0. Its tables may have been edited at any
+    time before this migration, so that is the earliest safe Last-Modified.
+    """
+    ReferenceDataVersion = apps.get_model('exams', 'ReferenceDataVersion')
+    now = timezone.now()
+    for name in REGISTRIES:
+        ReferenceDataVersion.objects.get_or_create(name=name, defaults={'modified_at': now})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0007_exam_paper_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modified_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
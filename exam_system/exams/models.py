@@ -27,8 +27,9 @@ class Department(models.Model):
     @classmethod
     def ensure_departments(cls):
         """
-        Ensure that all default departments exist
-        Called in AppConfig.ready() to ensure departments exist
+        Ensure that all default departments exist.
+        Migration 0006_bootstrap_departments does this on deploy; call it
+        only to restore departments deleted afterwards.
         """
         dept_mapping = {
             'cg': 'Computer Science Design',
@@ -51,6 +52,31 @@ class Subject(models.Model):
         return self.name
 
 
+class ReferenceDataVersion(models.Model):
+    """
+    Edit counter of a reference table such as Department or Subject, shared
+    by every worker process. exams.registry bumps it on each edit and reloads
+    its in-process copy when it moves.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ExamQuerySet(models.QuerySet):
+    def with_listing_data(self):
+        """
+        Exams with everything the listing endpoints show, in one query:
+        subject and department joined, question_count annotated
+        """
+        return self.select_related('subject', 'department').annotate(
+            question_count=models.Count('questions', distinct=True)
+        )
+
+
 class Exam(models.Model):
     title = models.CharField(max_length=200)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
@@ -76,6 +102,11 @@ class Exam(models.Model):
         ],
         default='draft'
     )
+    # Bumped by exams.paper_cache.invalidate_paper on every edit of the paper;
+    # cached papers are keyed by it, so every worker sees an edit at once
+    paper_version = models.PositiveIntegerField(default=0)
+
+    objects = ExamQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
@@ -83,6 +114,13 @@ class Exam(models.Model):
     def __str__(self):
         return f"{self.title} - {self.subject} - Semester {self.semester}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so saves that leave the rollups alone can skip them
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     # @property
     # def total_questions(self):
     #     return self.questions.count()
@@ -110,14 +148,67 @@ class StudentExamResult(models.Model):
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
     obtained_marks = models.IntegerField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # When the attempt was submitted, not when it was graded; see exams.grading
+    submitted_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('student', 'exam')  # Prevent multiple attempts
+        # Keyset pagination of the teacher results API, see exams.results
+        indexes = [
+            models.Index(fields=['submitted_at', 'id'], name='exams_result_submitted_idx'),
+            models.Index(fields=['obtained_marks', 'id'], name='exams_result_marks_idx'),
+            models.Index(fields=['exam', 'submitted_at', 'id'], name='exams_result_exam_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} - {self.exam.title} - {self.obtained_marks}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so edits can be applied to ExamStatistics as deltas
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+class ExamStatistics(models.Model):
+    """
+    Running totals of StudentExamResult rows for one scope: the whole system,
+    one exam, one department, one semester or one department and semester.
+    Maintained incrementally by exams.rollups; rebuild with rebuild_exam_stats.
+    """
+    # Grade bands on obtained marks: (grade, lower bound inclusive, upper bound exclusive)
+    GRADE_BANDS = (
+        ('A', 85, None),
+        ('B', 70, 85),
+        ('C', 55, 70),
+        ('D', 35, 55),
+        ('F', None, 35),
+    )
+
+    scope = models.CharField(max_length=50, unique=True)
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, null=True, blank=True)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True)
+    semester = models.IntegerField(null=True, blank=True)
+    submissions = models.PositiveIntegerField(default=0)
+    passed = models.PositiveIntegerField(default=0)
+    late_submissions = models.PositiveIntegerField(default=0)
+    marks_sum = models.BigIntegerField(default=0)
+    marks_sq_sum = models.BigIntegerField(default=0)
+    min_mark = models.IntegerField(null=True, blank=True)
+    max_mark = models.IntegerField(null=True, blank=True)
+    grade_a = models.PositiveIntegerField(default=0)
+    grade_b = models.PositiveIntegerField(default=0)
+    grade_c = models.PositiveIntegerField(default=0)
+    grade_d = models.PositiveIntegerField(default=0)
+    grade_f = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'exam statistics'
+
+    def __str__(self):
+        return f"{self.scope} - {self.submissions} submissions"
+
 class ExamAttempt(models.Model):
     STATUS_CHOICES = (
         ('started', 'Started'),
@@ -135,10 +226,17 @@ class ExamAttempt(models.Model):
     is_late_submission = models.BooleanField(default=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     browser_info = models.CharField(max_length=255, null=True, blank=True)
+    # Grading queue bookkeeping, see exams.grading.grade_pending_attempts
+    graded_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=64, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('student', 'exam')  # One attempt per exam per student
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['status', 'graded_at'], name='exams_attempt_grading_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.username} - {self.exam.title} - {self.status}"
@@ -167,6 +265,27 @@ class ExamAttempt(models.Model):
         self.status = 'abandoned'
         self.save()
 
+class AttemptAnswer(models.Model):
+    """
+    One answered question of a graded attempt, written in bulk by exams.grading.
+    chosen_option is the 0-based option index; unanswered questions have no row.
+    exam duplicates attempt.exam so per-exam analysis needs no join.
+    """
+    attempt = models.ForeignKey(ExamAttempt, on_delete=models.CASCADE, related_name='answer_rows')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    chosen_option = models.SmallIntegerField()
+    is_correct = models.BooleanField()
+
+    class Meta:
+        unique_together = ('attempt', 'question')
+        indexes = [
+            models.Index(fields=['exam', 'question', 'chosen_option'], name='exams_answer_analysis_idx'),
+        ]
+
+    def __str__(self):
+        return f"Attempt {self.attempt_id} - Q{self.question_id} - {self.chosen_option}"
+
 # dont know yet if to add this or not
 # class ExamQuestion(models.Model):
 #     exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
@@ -178,4 +297,4 @@ class ExamAttempt(models.Model):
 #         unique_together = ('exam', 'question')
 
 #     def __str__(self):
-#         return f"{self.exam.title} - Q{self.order}"
\ No newline at end of file
+#         return f"{self.exam.title} - Q{self.order}"
@@ -0,0 +1,102 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import HttpResponse
+
+from .models import Exam
+from .single_flight import paper_flight
+
+# Papers only change when a teacher edits the exam, and every edit bumps the
+# version, so entries can live for as long as the exam is likely to be running.
+PAPER_CACHE_TIMEOUT = 6 * 60 * 60
+
+PAPER_TAKE_EXAM = 'take_exam'
+PAPER_EXAM_QUESTIONS = 'exam_questions'
+
+
+def _versioned_key(exam):
+    return f'{exam.id}:v{exam.paper_version}'
+
+
+def _encode(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def invalidate_paper(exam):
+    """
+    Bump the exam's paper version so the next request rebuilds its paper.
+    The version lives on the exam row, so workers that cached the old paper
+    in a cache of their own stop serving it as soon as they read the row.
+    """
+    Exam.objects.filter(id=exam.id).update(paper_version=F('paper_version') + 1)
+    exam.refresh_from_db(fields=['paper_version'])
+
+
+def build_paper(exam):
+    """
+    Build the student-safe paper for an exam.
+    Returns the response bodies for take_exam and get_exam_questions, already
+    JSON encoded. correct_answer is never included.
+    """
+    questions = [
+        {
+            'id': q['id'],
+            'text': q['text'],
+            'options': q['options'],
+            'marks': q['marks']
+        }
+        for q in exam.questions.order_by('id').values('id', 'text', 'options', 'marks')
+    ]
+
+    take_exam_payload = {
+        'success': True,
+        'data': {
+            'id': exam.id,
+            'title': exam.title,
+            'duration': exam.duration,
+            'deadline': exam.end_time,  # Using end_time as deadline
+            'total_marks': exam.total_marks,
+            'questions': questions
+        }
+    }
+    exam_questions_payload = {
+        'success': True,
+        'exam': {
+            'id': exam.id,
+            'title': exam.title,
+            'duration': exam.duration,
+            'subject': exam.subject.name,
+            'total_questions': exam.total_questions,
+            'total_marks': exam.total_marks,
+            'passing_score': exam.passing_score
+        },
+        'questions': questions
+    }
+    return {
+        PAPER_TAKE_EXAM: _encode(take_exam_payload),
+        PAPER_EXAM_QUESTIONS: _encode(exam_questions_payload),
+    }
+
+
+def load_exam(exam_id):
+    """
+    Return the exam row used by the student exam-start endpoints. It is read
+    on every request: it carries the eligibility rules and the paper version,
+    which must not lag behind an edit. Raises Exam.DoesNotExist like get().
+    """
+    return Exam.objects.select_related('subject').get(id=exam_id)
+
+
+def get_paper(exam):
+    """Return the encoded paper for an exam, building it once on a miss"""
+    return paper_flight.get(
+        _versioned_key(exam),
+        lambda: build_paper(exam),
+        timeout=PAPER_CACHE_TIMEOUT
+    )
+
+
+def paper_response(exam, kind):
+    """Serve one of the cached paper bodies as a JSON response"""
+    return HttpResponse(get_paper(exam)[kind], content_type='application/json')
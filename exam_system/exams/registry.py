@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Department, ReferenceDataVersion, Subject
+
+# How long a process trusts its snapshot before reading the version row again
+DEFAULT_CHECK_INTERVAL = 1.0
+
+# derived holds values computed from this snapshot, such as encoded responses
+Snapshot = namedtuple('Snapshot', 'version modified_at items by_id by_code by_name derived')
+
+_EMPTY = MappingProxyType({})
+
+
+def _check_interval():
+    return getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+
+
+class Registry:
+    """
+    In-process copy of a small, rarely edited table, as read-only maps by
+    id, code and name. The table's version is a ReferenceDataVersion row that
+    every edit increments; each process compares it with its snapshot at most
+    once per check interval and reloads when it moved. Instances are shared
+    between callers and must not be modified.
+    """
+
+    def __init__(self, name, model, keys):
+        self.name = name
+        self.model = model
+        self.keys = keys
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def version(self):
+        """The shared (version, modified_at) of the table"""
+        row = ReferenceDataVersion.objects.filter(name=self.name).values_list('version', 'modified_at').first()
+        return row or (0, None)
+
+    def bump(self):
+        """Record an edit; every process reloads within a check interval, this one on its next read"""
+        now = timezone.now()
+        if not ReferenceDataVersion.objects.filter(name=self.name).update(version=F('version') + 1, modified_at=now):
+            ReferenceDataVersion.objects.get_or_create(name=self.name, defaults={'version': 1, 'modified_at': now})
+        self._stale = True
+        # A read between the edit and its commit may have reloaded the old rows
+        transaction.on_commit(self.invalidate)
+
+    def invalidate(self):
+        self._stale = True
+
+    def _load(self, version, modified_at):
+        items = tuple(self.model.objects.order_by('id'))
+        maps = {}
+        for key in self.keys:
+            mapping = {}
+            for item in items:
+                # Names are not unique; the lowest id wins, like .filter(...).first()
+                mapping.setdefault(getattr(item, key), item)
+            maps[key] = MappingProxyType(mapping)
+        return Snapshot(
+            version, modified_at, items,
+            maps.get('id', _EMPTY), maps.get('code', _EMPTY), maps.get('name', _EMPTY), {}
+        )
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and time.monotonic() - self._checked_at < _check_interval():
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            # Read before the rows, so an edit in between is caught at the next check
+            version, modified_at = self.version()
+            if snapshot is None or self._stale or snapshot.version != version:
+                self._stale = False
+                snapshot = self._snapshot = self._load(version, modified_at)
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def get(self, **lookup):
+        """The instance for one of id=, code= or name=, or None"""
+        (key, value), = lookup.items()
+        if key not in self.keys:
+            raise TypeError(f'{self.name} registry has no {key} lookup')
+        if key == 'id':
+            # Ids often arrive as strings from request data
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return None
+        return getattr(self.snapshot(), f'by_{key}').get(value)
+
+    def all(self):
+        return self.snapshot().items
+
+    def derived(self, name, build):
+        """build(snapshot), computed once per version and shared until the next edit"""
+        snapshot = self.snapshot()
+        if name not in snapshot.derived:
+            snapshot.derived[name] = build(snapshot)
+        return snapshot.derived[name]
+
+    def modified_at(self):
+        """When the table was last edited, the same in every process; None before the first version"""
+        return self.snapshot().modified_at
+
+
+departments = Registry('department', Department, ('id', 'code', 'name'))
+subjects = Registry('subject', Subject, ('id', 'name'))
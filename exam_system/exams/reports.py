@@ -0,0 +1,275 @@
+import math
+
+from django.db.models import Avg, Count, F, Func, IntegerField, Max, Min, OuterRef, Q, StdDev, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import Student
+from .models import Exam, ExamStatistics, StudentExamResult
+from .grading import get_answer_key, option_value
+from .rollups import GLOBAL_SCOPE, band_filter
+
+GRADE_BANDS = ExamStatistics.GRADE_BANDS
+
+# group_by name -> (queryset field, response key) pairs, relative to StudentExamResult
+RESULT_GROUPS = {
+    'exam': (('exam_id', 'examId'), ('exam__title', 'examTitle')),
+    'department': (('exam__department_id', 'departmentId'), ('exam__department__name', 'department')),
+    'semester': (('exam__semester', 'semester'),),
+}
+
+# Same groups, relative to Exam
+EXAM_GROUPS = {
+    'exam': (('id', 'examId'), ('title', 'examTitle')),
+    'department': (('department_id', 'departmentId'), ('department__name', 'department')),
+    'semester': (('semester', 'semester'),),
+}
+
+
+class ReportError(ValueError):
+    """Raised for an invalid report request"""
+
+
+def parse_group_by(value):
+    """Parse a group_by query parameter such as 'department,semester'"""
+    if not value:
+        return []
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in RESULT_GROUPS]
+    if unknown:
+        raise ReportError(f"Invalid group_by: {', '.join(unknown)}. Use exam, department or semester")
+    return list(dict.fromkeys(names))
+
+
+def _performance_aggregates():
+    """Every performance statistic as one set of (conditional) aggregates"""
+    aggregates = {
+        'submissions': Count('id'),
+        'passed': Count('id', filter=Q(status='pass')),
+        'avg_mark': Avg('obtained_marks'),
+        'max_mark': Max('obtained_marks'),
+        'min_mark': Min('obtained_marks'),
+        'stddev': StdDev('obtained_marks'),
+    }
+    for grade, low, high in GRADE_BANDS:
+        aggregates[f'grade_{grade}'] = Count('id', filter=band_filter('obtained_marks', low, high))
+    return aggregates
+
+
+def _format_performance(row):
+    submissions = row['submissions']
+    return {
+        'submissions': submissions,
+        'passRate': round(row['passed'] / submissions * 100, 2) if submissions else 0,
+        'averageMark': round(row['avg_mark'], 2) if submissions else 0,
+        'highestMark': row['max_mark'] if submissions else 0,
+        'lowestMark': row['min_mark'] if submissions else 0,
+        'standardDeviation': round(row['stddev'], 2) if submissions else 0,
+        'gradeDistribution': {grade: row[f'grade_{grade}'] for grade, _, _ in GRADE_BANDS},
+    }
+
+
+# Rollup rows for each group_by combination, relative to ExamStatistics
+ROLLUP_GROUPS = {
+    ('exam',): {'exam__isnull': False},
+    ('department',): {'exam__isnull': True, 'department__isnull': False, 'semester__isnull': True},
+    ('semester',): {'exam__isnull': True, 'department__isnull': True, 'semester__isnull': False},
+    ('department', 'semester'): {'exam__isnull': True, 'department__isnull': False, 'semester__isnull': False},
+}
+
+# Same groups as RESULT_GROUPS, relative to ExamStatistics
+STATISTICS_GROUPS = {
+    'exam': (('exam_id', 'examId'), ('exam__title', 'examTitle')),
+    'department': (('department_id', 'departmentId'), ('department__name', 'department')),
+    'semester': (('semester', 'semester'),),
+}
+
+
+# ExamStatistics columns the performance reports read
+_ROLLUP_FIELDS = (
+    'submissions', 'passed', 'marks_sum', 'marks_sq_sum', 'min_mark', 'max_mark',
+    'grade_a', 'grade_b', 'grade_c', 'grade_d', 'grade_f',
+)
+
+
+def _rollup_row(stats):
+    """Turn an ExamStatistics row into the shape _format_performance expects"""
+    n = stats['submissions']
+    mean = stats['marks_sum'] / n if n else None
+    row = {
+        'submissions': n,
+        'passed': stats['passed'],
+        'avg_mark': mean,
+        'max_mark': stats['max_mark'],
+        'min_mark': stats['min_mark'],
+        # Population standard deviation from the running sums
+        'stddev': math.sqrt(max(stats['marks_sq_sum'] / n - mean * mean, 0)) if n else None,
+    }
+    for grade, _, _ in GRADE_BANDS:
+        row[f'grade_{grade}'] = stats[f'grade_{grade.lower()}']
+    return row
+
+
+def performance_summary():
+    """
+    Overall performance report from the system-wide ExamStatistics row,
+    with the student count as a subquery of the same query.
+    """
+    stats = ExamStatistics.objects.filter(scope=GLOBAL_SCOPE).annotate(
+        total_students=_count(Student.objects.all())
+    ).values('total_students', *_ROLLUP_FIELDS).first()
+    if stats is None:
+        # No result has been recorded yet
+        stats = dict.fromkeys(_ROLLUP_FIELDS, 0)
+        stats['total_students'] = Student.objects.count()
+    report = {'totalStudents': stats['total_students']}
+    report.update(_format_performance(_rollup_row(stats)))
+    del report['submissions']
+    return report
+
+
+def performance_by(group_by, results=None):
+    """
+    Performance report per group. Exam, department, semester and department
+    plus semester groups are read from ExamStatistics; other combinations, or
+    a filtered results queryset, fall back to one grouped aggregate query.
+    """
+    rollup_filter = ROLLUP_GROUPS.get(tuple(name for name in RESULT_GROUPS if name in group_by))
+    if results is None and rollup_filter is not None:
+        fields = [pair for name in group_by for pair in STATISTICS_GROUPS[name]]
+        rows = ExamStatistics.objects.filter(submissions__gt=0, **rollup_filter).values(
+            *(field for field, _ in fields), *_ROLLUP_FIELDS
+        ).order_by(*(field for field, _ in fields))
+        groups = []
+        for stats in rows:
+            group = {key: stats[field] for field, key in fields}
+            group.update(_format_performance(_rollup_row(stats)))
+            groups.append(group)
+        return groups
+
+    results = StudentExamResult.objects.all() if results is None else results
+    fields = [pair for name in group_by for pair in RESULT_GROUPS[name]]
+    rows = results.order_by().values(*(field for field, _ in fields)).annotate(
+        **_performance_aggregates()
+    ).order_by(*(field for field, _ in fields))
+    groups = []
+    for row in rows:
+        group = {key: row[field] for field, key in fields}
+        group.update(_format_performance(row))
+        groups.append(group)
+    return groups
+
+
+def _count(queryset):
+    """COUNT of a correlated queryset as a scalar subquery"""
+    return Coalesce(
+        Subquery(queryset.order_by().values(n=Func(F('pk'), function='COUNT')), output_field=IntegerField()),
+        0
+    )
+
+
+def _exam_attendance(exams):
+    """Annotate exams with registered, present and late counts"""
+    stats = ExamStatistics.objects.filter(exam=OuterRef('pk'))
+    return exams.annotate(
+        total_registered=_count(Student.objects.filter(
+            department=OuterRef('department'), semester=OuterRef('semester')
+        )),
+        present=Coalesce(Subquery(stats.values('submissions')), 0),
+        late=Coalesce(Subquery(stats.values('late_submissions')), 0),
+    )
+
+
+def _format_attendance(registered, present, late):
+    return {
+        'totalRegistered': registered,
+        'present': present,
+        'absent': registered - present,
+        'attendanceRate': round(present / registered * 100, 2) if registered > 0 else 0,
+        'lateSubmissions': late,
+    }
+
+
+def attendance_for_exam(exam_id):
+    """Attendance report for one exam in a single query, or None if it does not exist"""
+    row = _exam_attendance(Exam.objects.filter(pk=exam_id)).values(
+        'total_registered', 'present', 'late'
+    ).first()
+    if row is None:
+        return None
+    return _format_attendance(row['total_registered'], row['present'], row['late'])
+
+
+def attendance_by(group_by, exams=None):
+    """
+    Attendance per group. Per-exam counts come from one query and are rolled
+    up in Python, which is linear in the number of exams.
+    """
+    exams = Exam.objects.all() if exams is None else exams
+    fields = [pair for name in group_by for pair in EXAM_GROUPS[name]]
+    rows = _exam_attendance(exams).order_by().values(
+        *(field for field, _ in fields), 'total_registered', 'present', 'late'
+    )
+    totals = {}
+    for row in rows:
+        key = tuple(row[field] for field, _ in fields)
+        counts = totals.setdefault(key, [0, 0, 0])
+        counts[0] += row['total_registered']
+        counts[1] += row['present']
+        counts[2] += row['late']
+    groups = []
+    for key in sorted(totals, key=lambda k: tuple((v is None, v) for v in k)):
+        group = {out: value for (_, out), value in zip(fields, key)}
+        group.update(_format_attendance(*totals[key]))
+        groups.append(group)
+    return groups
+
+
+def question_analysis(exam, top_wrong=3):
+    """
+    Per-question accuracy, option distribution and most common wrong answers
+    for an exam, from AttemptAnswer in a single grouped query. Accuracy is
+    relative to every graded submission, so unanswered questions count as wrong.
+    """
+    key = get_answer_key(exam)
+    width = int(key.option_counts.max()) if len(key) else 0
+    answers = Q(attemptanswer__exam_id=exam.id)
+    option_fields = [f'option_{i}' for i in range(width)]
+    rows = exam.questions.order_by('id').annotate(
+        answered=Count('attemptanswer', filter=answers),
+        correct=Count('attemptanswer', filter=answers & Q(attemptanswer__is_correct=True)),
+        graded=Coalesce(Subquery(ExamStatistics.objects.filter(exam_id=exam.id).values('submissions')), 0),
+        **{field: Count('attemptanswer', filter=answers & Q(attemptanswer__chosen_option=i))
+           for i, field in enumerate(option_fields)}
+    ).values('id', 'text', 'options', 'correct_answer', 'answered', 'correct', 'graded', *option_fields)
+
+    analysis = []
+    submissions = 0
+    for row in rows:
+        submissions = row['graded']
+        column = key.columns.get(row['id'])
+        option_count = int(key.option_counts[column]) if column is not None else 0
+        correct_index = int(key.correct[column]) if column is not None else -1
+        counts = [row[f'option_{i}'] for i in range(option_count)]
+        wrong = sorted(
+            (i for i in range(option_count) if i != correct_index and counts[i]),
+            key=lambda i: counts[i], reverse=True
+        )[:top_wrong]
+        analysis.append({
+            'questionId': row['id'],
+            'questionText': row['text'],
+            'totalAnswers': row['answered'],
+            'unanswered': max(submissions - row['answered'], 0),
+            'correctAnswers': row['correct'],
+            'accuracy': round(row['correct'] / submissions * 100, 2) if submissions else 0,
+            'optionDistribution': {option_value(i, option_count): counts[i] for i in range(option_count)},
+            'commonWrongAnswers': [
+                {'answer': option_value(i, option_count), 'text': row['options'][i], 'count': counts[i]}
+                for i in wrong
+            ],
+            'correctAnswer': row['correct_answer']
+        })
+    return {
+        'totalQuestions': len(analysis),
+        'totalSubmissions': submissions,
+        'questionAnalysis': analysis
+    }
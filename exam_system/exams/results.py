@@ -0,0 +1,157 @@
+from datetime import datetime, time, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import StudentExamResult
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sortable columns; each is indexed together with id, which breaks ties
+SORT_FIELDS = ('submitted_at', 'obtained_marks', 'id')
+DEFAULT_SORT = '-submitted_at'
+
+# Cursors are signed, so a client cannot hand back a position it was never given
+CURSOR_SALT = 'exams.results.cursor'
+
+_ROW_FIELDS = (
+    'id', 'student_id', 'student__user__username', 'exam_id', 'exam__title',
+    'exam__subject__name', 'obtained_marks', 'status', 'submitted_at',
+)
+
+
+class ResultsQueryError(ValueError):
+    """Raised for an invalid results query"""
+
+
+def _parse_sort(value):
+    value = value or DEFAULT_SORT
+    field = value.lstrip('-')
+    if field not in SORT_FIELDS:
+        raise ResultsQueryError(f"Invalid sort: {value}. Use {', '.join(SORT_FIELDS)}, optionally prefixed with '-'")
+    return field, value.startswith('-')
+
+
+def _parse_moment(value, name, end_of_day=False):
+    """Accept a date or a datetime; a bare 'to' date covers that whole day"""
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    elif moment is None:
+        raise ResultsQueryError(f'Invalid {name}: {value}. Use YYYY-MM-DD or an ISO datetime')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_page_size(value):
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ResultsQueryError(f'Invalid limit: {value}')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort, row):
+    field = sort.lstrip('-')
+    value = row[field]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return signing.dumps([sort, value, row['id']], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor, sort):
+    """Return the (sort value, id) position a cursor points after"""
+    try:
+        cursor_sort, value, last_id = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise ResultsQueryError('Invalid cursor')
+    if cursor_sort != sort:
+        raise ResultsQueryError('The cursor belongs to a different sort order')
+    if sort.lstrip('-') == 'submitted_at':
+        value = parse_datetime(value) if isinstance(value, str) else None
+    elif not isinstance(value, int):
+        value = None
+    if value is None or not isinstance(last_id, int):
+        raise ResultsQueryError('Invalid cursor')
+    return value, last_id
+
+
+def filter_results(results, params):
+    """
+    Apply the server-side filters: exam (id or comma separated ids), semester,
+    status, from and to (submission date range) and student (username prefix)
+    """
+    exam = params.get('exam')
+    if exam:
+        try:
+            exam_ids = [int(exam_id) for exam_id in exam.split(',') if exam_id.strip()]
+        except ValueError:
+            raise ResultsQueryError(f'Invalid exam: {exam}')
+        results = results.filter(exam_id__in=exam_ids)
+    semester = params.get('semester')
+    if semester:
+        if not str(semester).isdigit():
+            raise ResultsQueryError(f'Invalid semester: {semester}')
+        results = results.filter(exam__semester=int(semester))
+    result_status = params.get('status')
+    if result_status:
+        if result_status not in dict(StudentExamResult.STATUS_CHOICES):
+            raise ResultsQueryError(f'Invalid status: {result_status}. Use pass or fail')
+        results = results.filter(status=result_status)
+    if params.get('from'):
+        results = results.filter(submitted_at__gte=_parse_moment(params['from'], 'from'))
+    if params.get('to'):
+        results = results.filter(submitted_at__lt=_parse_moment(params['to'], 'to', end_of_day=True))
+    if params.get('student'):
+        results = results.filter(student__user__username__startswith=params['student'].strip())
+    return results
+
+
+def results_page(results, params):
+    """
+    Fetch one keyset-paginated page of results in a single query.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    field, descending = _parse_sort(params.get('sort'))
+    sort = f"{'-' if descending else ''}{field}"
+    page_size = _parse_page_size(params.get('limit'))
+    results = filter_results(results, params)
+
+    if params.get('cursor'):
+        value, last_id = decode_cursor(params['cursor'], sort)
+        if field == 'id':
+            after = Q(id__lt=last_id) if descending else Q(id__gt=last_id)
+        elif descending:
+            after = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': last_id})
+        else:
+            after = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': last_id})
+        results = results.filter(after)
+
+    ordering = [sort] if field == 'id' else [sort, '-id' if descending else 'id']
+    rows = list(results.order_by(*ordering).values(*_ROW_FIELDS)[:page_size + 1])
+    next_cursor = encode_cursor(sort, rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def format_result(row):
+    return {
+        'id': row['id'],
+        'student': row['student__user__username'],
+        'student_id': row['student_id'],
+        'exam': row['exam__title'],
+        'exam_id': row['exam_id'],
+        'subject': row['exam__subject__name'],
+        'score': row['obtained_marks'],
+        'status': row['status'],
+        'date': row['submitted_at'].isoformat()
+    }
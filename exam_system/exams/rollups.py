@@ -0,0 +1,300 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import Exam, ExamStatistics, StudentExamResult
+
+GLOBAL_SCOPE = 'all'
+
+# Counter columns, in the order the rebuild compares them
+COUNTER_FIELDS = (
+    'submissions', 'passed', 'late_submissions', 'marks_sum', 'marks_sq_sum',
+    'grade_a', 'grade_b', 'grade_c', 'grade_d', 'grade_f',
+)
+
+# Scope dimensions on ExamStatistics -> the same dimension relative to StudentExamResult
+_RESULT_DIMENSIONS = {
+    'exam_id': 'exam_id',
+    'department_id': 'exam__department_id',
+    'semester': 'exam__semester',
+}
+
+# Exam fields the rollups depend on
+EXAM_FIELDS = ('id', 'department_id', 'semester', 'end_time', 'late_submission_end')
+
+# Rollup kinds as (scope key, dimensions) pairs
+_SCOPE_KINDS = (
+    (lambda exam_id, department_id, semester: GLOBAL_SCOPE, ()),
+    # Exam rows also record the exam's department and semester, to notice when they change
+    (lambda exam_id, department_id, semester: f'exam:{exam_id}', ('exam_id', 'department_id', 'semester')),
+    (lambda exam_id, department_id, semester: f'dept:{department_id}', ('department_id',)),
+    (lambda exam_id, department_id, semester: f'sem:{semester}', ('semester',)),
+    (lambda exam_id, department_id, semester: f'dept:{department_id}:sem:{semester}', ('department_id', 'semester')),
+)
+
+
+def grade_for(marks):
+    for grade, low, high in ExamStatistics.GRADE_BANDS:
+        if (low is None or marks >= low) and (high is None or marks < high):
+            return grade
+
+
+def band_filter(field, low, high):
+    """Q matching marks in a grade band"""
+    q = Q()
+    if low is not None:
+        q &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        q &= Q(**{f'{field}__lt': high})
+    return q
+
+
+def is_late(exam, submitted_at):
+    """Same window as Exam.is_late_submission, tolerating exams without one"""
+    if submitted_at is None or exam.end_time is None or exam.late_submission_end is None:
+        return False
+    return exam.end_time < submitted_at <= exam.late_submission_end
+
+
+def scopes_for(exam):
+    """Every rollup a result of this exam counts towards, as scope -> dimension values"""
+    values = {'exam_id': exam.id, 'department_id': exam.department_id, 'semester': exam.semester}
+    return {
+        scope(exam.id, exam.department_id, exam.semester): {name: values[name] for name in dimensions}
+        for scope, dimensions in _SCOPE_KINDS
+    }
+
+
+def _delta(exam, results):
+    """Counter increments for a set of results of one exam"""
+    delta = dict.fromkeys(COUNTER_FIELDS, 0)
+    for result in results:
+        marks = result.obtained_marks
+        delta['submissions'] += 1
+        delta['passed'] += result.status == 'pass'
+        delta['late_submissions'] += is_late(exam, result.submitted_at)
+        delta['marks_sum'] += marks
+        delta['marks_sq_sum'] += marks * marks
+        delta[f'grade_{grade_for(marks).lower()}'] += 1
+    return delta
+
+
+def _ensure_rows(scopes):
+    existing = set(ExamStatistics.objects.filter(scope__in=scopes).values_list('scope', flat=True))
+    missing = [ExamStatistics(scope=scope, **fields) for scope, fields in scopes.items() if scope not in existing]
+    if missing:
+        ExamStatistics.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def add_results(exam, results):
+    """Count new results of one exam in all of its rollups with a single UPDATE"""
+    results = list(results)
+    if not results:
+        return
+    scopes = scopes_for(exam)
+    delta = _delta(exam, results)
+    marks = [result.obtained_marks for result in results]
+    low, high = Value(min(marks)), Value(max(marks))
+    _ensure_rows(scopes)
+    ExamStatistics.objects.filter(scope__in=scopes).update(
+        min_mark=Least(Coalesce('min_mark', low), low),
+        max_mark=Greatest(Coalesce('max_mark', high), high),
+        updated_at=timezone.now(),
+        **{field: F(field) + value for field, value in delta.items() if value}
+    )
+
+
+def remove_results(exam, results):
+    """
+    Take results of one exam back out of its rollups. Sums are adjusted in
+    place; min and max cannot be, so rollups whose min or max was a removed
+    mark get new ones. The exam's row is recomputed from the exam's results
+    and the wider rollups from the exam rows, so no query reads other exams'
+    results.
+    """
+    results = list(results)
+    if not results:
+        return
+    scopes = scopes_for(exam)
+    delta = _delta(exam, results)
+    ExamStatistics.objects.filter(scope__in=scopes).update(
+        updated_at=timezone.now(),
+        **{field: F(field) - value for field, value in delta.items() if value}
+    )
+    marks = [result.obtained_marks for result in results]
+    stale = set(ExamStatistics.objects.filter(scope__in=scopes).filter(
+        Q(min_mark=min(marks)) | Q(max_mark=max(marks))
+    ).values_list('scope', flat=True))
+    # The exam's row first, as the wider rollups are taken from the exam rows
+    for scope, fields in sorted(scopes.items(), key=lambda item: 'exam_id' not in item[1]):
+        if scope not in stale:
+            continue
+        if 'exam_id' in fields:
+            extremes = StudentExamResult.objects.filter(exam_id=exam.id).aggregate(
+                min_mark=Min('obtained_marks'), max_mark=Max('obtained_marks')
+            )
+        else:
+            extremes = ExamStatistics.objects.filter(exam_id__isnull=False, submissions__gt=0, **fields).aggregate(
+                min_mark=Min('min_mark'), max_mark=Max('max_mark')
+            )
+        ExamStatistics.objects.filter(scope=scope).update(**extremes)
+
+
+def _recompute(scopes):
+    """
+    Recompute the given rollups from StudentExamResult, one aggregate query
+    each. A rollup left without results is deleted.
+    """
+    for scope, fields in scopes.items():
+        row = StudentExamResult.objects.filter(
+            **{_RESULT_DIMENSIONS[name]: value for name, value in fields.items()}
+        ).aggregate(**_aggregates())
+        if not row['submissions']:
+            ExamStatistics.objects.filter(scope=scope).delete()
+            continue
+        values = {field: row[field] or 0 for field in COUNTER_FIELDS}
+        values.update(min_mark=row['min_mark'], max_mark=row['max_mark'], **fields)
+        ExamStatistics.objects.update_or_create(scope=scope, defaults=values)
+
+
+def refresh_exam(exam):
+    """
+    Recompute an edited exam's rollups. A new department or semester changes
+    which rows its results count towards and a new late window changes the
+    late counts, so both the old and the new scopes are rebuilt. Exams without
+    results have nothing to move.
+    """
+    stats = ExamStatistics.objects.filter(exam_id=exam.id).first()
+    if stats is None:
+        return
+    scopes = scopes_for(exam)
+    if (stats.department_id, stats.semester) != (exam.department_id, exam.semester):
+        old = Exam(id=exam.id, department_id=stats.department_id, semester=stats.semester)
+        # The exam's own row keeps its key, so the new dimensions must win
+        scopes = {**scopes_for(old), **scopes}
+    scopes.pop(GLOBAL_SCOPE)
+    with transaction.atomic():
+        _recompute(scopes)
+        # Only the late count of an exam's results can change, so the system-wide
+        # row takes the difference instead of a full recomputation
+        late = (ExamStatistics.objects.filter(exam_id=exam.id).values_list('late_submissions', flat=True).first()
+                or 0) - stats.late_submissions
+        if late:
+            ExamStatistics.objects.filter(scope=GLOBAL_SCOPE).update(
+                late_submissions=F('late_submissions') + late, updated_at=timezone.now()
+            )
+
+
+def _aggregates():
+    marks = 'obtained_marks'
+    aggregates = {
+        'submissions': Count('id'),
+        'passed': Count('id', filter=Q(status='pass')),
+        'late_submissions': Count('id', filter=Q(
+            submitted_at__gt=F('exam__end_time'), submitted_at__lte=F('exam__late_submission_end')
+        )),
+        'marks_sum': Sum(marks),
+        'marks_sq_sum': Sum(F(marks) * F(marks)),
+        'min_mark': Min(marks),
+        'max_mark': Max(marks),
+    }
+    for grade, low, high in ExamStatistics.GRADE_BANDS:
+        aggregates[f'grade_{grade.lower()}'] = Count('id', filter=band_filter(marks, low, high))
+    return aggregates
+
+
+def compute_statistics():
+    """Recompute every rollup from StudentExamResult, one grouped query per scope kind"""
+    computed = {}
+    for scope, dimensions in _SCOPE_KINDS:
+        result_fields = [_RESULT_DIMENSIONS[name] for name in dimensions]
+        if result_fields:
+            rows = StudentExamResult.objects.order_by().values(*result_fields).annotate(**_aggregates())
+        else:
+            rows = [StudentExamResult.objects.aggregate(**_aggregates())]
+        for row in rows:
+            if not row['submissions']:
+                continue
+            values = {'exam_id': None, 'department_id': None, 'semester': None}
+            values.update({name: row[field] for name, field in zip(dimensions, result_fields)})
+            key = scope(values['exam_id'], values['department_id'], values['semester'])
+            computed[key] = ExamStatistics(
+                scope=key,
+                min_mark=row['min_mark'],
+                max_mark=row['max_mark'],
+                **{name: values[name] for name in dimensions},
+                **{field: row[field] or 0 for field in COUNTER_FIELDS}
+            )
+    return computed
+
+
+def _mismatches(stored, computed):
+    mismatches = []
+    for scope in sorted(set(stored) | set(computed)):
+        old, new = stored.get(scope), computed.get(scope)
+        old_values = {f: getattr(old, f) for f in COUNTER_FIELDS + ('min_mark', 'max_mark')} if old else None
+        new_values = {f: getattr(new, f) for f in COUNTER_FIELDS + ('min_mark', 'max_mark')} if new else None
+        # A stored row that was emptied by deletions matches a missing one
+        if old_values and not old_values['submissions'] and new_values is None:
+            continue
+        if old_values != new_values:
+            mismatches.append((scope, old_values, new_values))
+    return mismatches
+
+
+def rebuild_statistics(check=False):
+    """
+    Compare the stored rollups with a full recomputation and, unless check is
+    set, replace them. Returns the (scope, stored, computed) mismatches.
+    Run it while grading is idle; concurrent increments would be overwritten.
+    """
+    computed = compute_statistics()
+    stored = {row.scope: row for row in ExamStatistics.objects.all()}
+    mismatches = _mismatches(stored, computed)
+    if not check:
+        with transaction.atomic():
+            ExamStatistics.objects.all().delete()
+            ExamStatistics.objects.bulk_create(computed.values())
+    return mismatches
+
+
+def exam_for(exam_id):
+    """The exam fields rollups need, or None if the exam is gone"""
+    return Exam.objects.filter(pk=exam_id).only(*EXAM_FIELDS).first()
+
+
+# Rollups waiting for the deletion in progress on this thread to commit
+_pending = threading.local()
+
+
+def refresh_after_delete(exams):
+    """
+    Recompute the rollups results of these exams count towards once the
+    current transaction commits. Results carry no delete signal, so Django
+    deletes them in bulk; whatever deletes them (an exam, a student, the
+    admin) calls this instead, and a deletion of many rows recomputes each
+    affected rollup once. Scopes left over from a rolled back deletion are
+    recomputed with the next one, which is harmless.
+    """
+    scopes = _pending.__dict__.setdefault('scopes', {})
+    for exam in exams:
+        scopes.update(scopes_for(exam))
+    if scopes:
+        transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    scopes, _pending.scopes = getattr(_pending, 'scopes', {}), {}
+    if scopes:
+        with transaction.atomic():
+            _recompute(scopes)
+
+
+def delete_results(results):
+    """Delete a queryset of results and recompute their exams' rollups once"""
+    with transaction.atomic():
+        refresh_after_delete(list(Exam.objects.filter(id__in=results.values('exam_id')).only(*EXAM_FIELDS)))
+        return results.delete()
@@ -1,15 +1,27 @@
 # In serializers.py
 from rest_framework import serializers
 from .models import Exam, Subject
+from .registry import subjects
 
 class SubjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = ['id', 'name']
 
+class RegistrySubjectField(serializers.PrimaryKeyRelatedField):
+    """Resolves subject ids from the in-process subject registry instead of a query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        subject = subjects.get(id=data)
+        if subject is None:
+            self.fail('does_not_exist', pk_value=data)
+        return subject
+
 class ExamSerializer(serializers.ModelSerializer):
     subject = SubjectSerializer(read_only=True)
-    subject_id = serializers.PrimaryKeyRelatedField(
+    subject_id = RegistrySubjectField(
         queryset=Subject.objects.all(), 
         source='subject', 
         write_only=True
@@ -0,0 +1,93 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from accounts.models import Student, User
+from exams.models import Department, Exam, StudentExamResult, Subject
+from exams.registry import departments, subjects
+from exams.rollups import EXAM_FIELDS, add_results, exam_for, refresh_after_delete, refresh_exam, remove_results
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of a result that the rollups depend on
+_TRACKED_FIELDS = ('exam_id', 'obtained_marks', 'status', 'submitted_at')
+
+# Fields of an exam that decide which rollups its results count towards and how
+_TRACKED_EXAM_FIELDS = ('department_id', 'semester', 'end_time', 'late_submission_end')
+
+
+def _snapshot(instance):
+    return {field: getattr(instance, field) for field in _TRACKED_FIELDS}
+
+
+@receiver(post_save, sender=StudentExamResult)
+def update_statistics_on_save(sender, instance, created, raw=False, **kwargs):
+    """Apply a saved result to ExamStatistics as a delta"""
+    if raw:
+        # loaddata; run rebuild_exam_stats afterwards
+        return
+    current = _snapshot(instance)
+    if not created:
+        loaded = getattr(instance, '_loaded_values', None)
+        previous = None
+        if loaded is not None and all(field in loaded for field in _TRACKED_FIELDS):
+            previous = {field: loaded[field] for field in _TRACKED_FIELDS}
+        if previous == current:
+            return
+        if previous is None:
+            logger.warning(f"Result {instance.pk} saved without its stored values; run rebuild_exam_stats")
+            return
+        old_exam = exam_for(previous['exam_id'])
+        if old_exam is not None:
+            remove_results(old_exam, [StudentExamResult(**previous)])
+    exam = exam_for(instance.exam_id)
+    if exam is not None:
+        add_results(exam, [instance])
+    instance._loaded_values = current
+
+
+# Deleted results have no receiver: one would stop Django from deleting them
+# in bulk. Deleting their exam or student recomputes the rollups instead, and
+# anything else deleting results goes through exams.rollups.delete_results.
+
+@receiver(pre_delete, sender=Exam)
+def update_statistics_on_exam_delete(sender, instance, **kwargs):
+    if StudentExamResult.objects.filter(exam_id=instance.pk).exists():
+        refresh_after_delete([instance])
+
+
+@receiver(pre_delete, sender=Student)
+def update_statistics_on_student_delete(sender, instance, origin=None, **kwargs):
+    students = [instance]
+    if isinstance(origin, QuerySet) and origin.model in (Student, User):
+        # A queryset delete sends this once per student; the first one covers them all
+        if getattr(origin, '_rollups_refreshed', False):
+            return
+        origin._rollups_refreshed = True
+        students = origin if origin.model is Student else Student.objects.filter(user__in=origin)
+    refresh_after_delete(
+        Exam.objects.filter(studentexamresult__student__in=students).only(*EXAM_FIELDS).distinct()
+    )
+
+
+@receiver(post_save, sender=Exam)
+def update_statistics_on_exam_change(sender, instance, created, raw=False, **kwargs):
+    """An edited exam may have moved department, semester or late window"""
+    if created or raw:
+        return
+    current = {field: getattr(instance, field) for field in _TRACKED_EXAM_FIELDS}
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    # Without the stored values there is no telling what moved
+    if any(field not in loaded or loaded[field] != current[field] for field in _TRACKED_EXAM_FIELDS):
+        refresh_exam(instance)
+    instance._loaded_values = {**loaded, **current}
+
+
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_departments(sender, **kwargs):
+    departments.bump()
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def invalidate_subjects(sender, **kwargs):
+    subjects.bump()
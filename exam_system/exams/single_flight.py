@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+# Seconds a process may hold a key's lock while it computes; a leader that
+# dies holding it blocks the key no longer than this
+LOCK_TIMEOUT = 30
+
+# Seconds between looks at the cache while another process computes
+POLL_INTERVAL = 0.02
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent loads of the same key.
+
+    The first caller for a key computes the value and stores it in the cache.
+    Other threads in the same process wait for that result. Across processes
+    the leader is whoever takes the key's lock, a cache entry created with
+    add(); the others poll the cache for the value it stores, so with a
+    shared cache a cold key is computed once instead of once per worker.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'waits': 0, 'computations': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        """Return a snapshot of the hit, wait and computation counters"""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def get(self, key, compute, timeout=DEFAULT_TIMEOUT):
+        """Return the cached value for key, computing it at most once if missing"""
+        cache_key = f'{self.namespace}:{key}'
+        value = cache.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+
+        with self._lock:
+            call = self._calls.get(cache_key)
+            leader = call is None
+            if leader:
+                call = self._calls[cache_key] = _Call()
+
+        if not leader:
+            self._count('waits')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            value = self._load(cache_key, compute, timeout)
+            call.value = value
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(cache_key, None)
+            call.done.set()
+
+    def _load(self, cache_key, compute, timeout):
+        lock_key = f'{cache_key}:lock'
+        token = uuid.uuid4().hex
+        while True:
+            if cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+                try:
+                    # Another process may have filled the key before we took the lock
+                    value = cache.get(cache_key, _MISSING)
+                    if value is _MISSING:
+                        value = compute()
+                        cache.set(cache_key, value, timeout=timeout)
+                        self._count('computations')
+                    else:
+                        self._count('waits')
+                    return value
+                finally:
+                    if cache.get(lock_key) == token:
+                        cache.delete(lock_key)
+            value = self._wait(cache_key, lock_key)
+            if value is not _MISSING:
+                self._count('waits')
+                return value
+            # The leader failed or its lock expired; take over
+
+    def _wait(self, cache_key, lock_key):
+        """The value another process is computing, or _MISSING once its lock is gone"""
+        while True:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(cache_key, _MISSING)
+            if value is not _MISSING or cache.get(lock_key) is None:
+                return value
+
+
+paper_flight = SingleFlight('exam_paper')
+answer_key_flight = SingleFlight('answer_key')
+
+
+def flight_stats():
+    """Counters for every single-flight group, keyed by namespace"""
+    return {flight.namespace: flight.stats() for flight in (paper_flight, answer_key_flight)}
@@ -1,3 +1,1123 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User, Student, Teacher
+from exam_system.metrics import store as metrics
+from exam_system.querycheck import assert_query_budget
+from .benchmarks import compare, load_baseline, save_baseline
+from .dataset import college_ids, generate_dataset
+from .export import EXPORT_COLUMNS, export_lines
+from .grading import AnswerKey, get_answer_key, grade_attempts, option_index, pending_attempts, requeue_failed_attempts
+from .item_analysis import analyse
+from .loadtest import Recorder, percentile, summarize
+from .models import AttemptAnswer, Department, Exam, ExamAttempt, ExamStatistics, Question, StudentExamResult, Subject
+from .paper_cache import PAPER_EXAM_QUESTIONS, get_paper, invalidate_paper, load_exam
+from .registry import Registry, departments, subjects
+from .results import ResultsQueryError, results_page
+from .single_flight import SingleFlight
+from .rollups import delete_results, rebuild_statistics
+
+# Wall-time allowance per request, generous enough for a loaded CI machine
+TIME_BUDGET = 0.5
+
+# Tests create accounts by the hundred; the project's hasher is slow by design
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# A cache of its own, as another worker process has without a shared cache
+OTHER_WORKER_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other-worker'}
+}
+
+
+def make_exam(questions, semester=1, passing_score=50, **fields):
+    """
+    An active exam of the cs department that is open now, with one question
+    per (options, correct_answer, marks) tuple, in id order
+    """
+    now = timezone.now()
+    fields = {
+        'title': 'Test exam', 'subject': Subject.objects.get_or_create(name='Physics')[0],
+        'department': Department.objects.get(code='cs'), 'semester': semester, 'duration': 30,
+        'passing_score': passing_score, 'start_time': now - timedelta(hours=1), 'end_time': now + timedelta(days=1),
+        'late_submission_end': now + timedelta(days=3), 'status': 'active', 'total_questions': len(questions),
+        'total_marks': sum(marks for _, _, marks in questions), **fields,
+    }
+    exam = Exam.objects.create(**fields)
+    exam.questions.set(Question.objects.bulk_create([
+        Question(text=f'Question {n + 1}', options=options, correct_answer=correct, marks=marks)
+        for n, (options, correct, marks) in enumerate(questions)
+    ]))
+    return exam
+
+
+def make_students(count, semester=1, first=1):
+    """
+    Students of the cs department, signed in with force_login rather than a
+    password; their profiles come from the User post_save signal
+    """
+    users = [User.objects.create_user(username=f'{semester}mp23cs{n:03d}')
+             for n in range(first, first + count)]
+    return list(Student.objects.filter(user__in=users).order_by('id'))
+
+
+def submit(exam, student, answers, end_time=None):
+    return ExamAttempt.objects.create(
+        student=student, exam=exam, answers=answers, status='submitted', end_time=end_time or timezone.now()
+    )
+
+
+# Registries are loaded before each test and not checked again during it,
+# so budgets do not depend on how long a test takes
+@override_settings(REFERENCE_DATA_CHECK_INTERVAL=3600, PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class QueryBudgetTestCase(TestCase):
+    """
+    Seeds generate_dataset() once per class and signs in a teacher, a student
+    who can sit that teacher's open exam, and an admin. Every request made
+    through self.call() must stay within its query count and TIME_BUDGET,
+    and must not repeat a query shape per row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = generate_dataset(students=2000, exams=20, year=23, seed=0)
+        now = timezone.now()
+        cls.open_exam = Exam.objects.filter(start_time__lte=now, end_time__gte=now).order_by('id').first()
+        cls.teacher = Teacher.objects.select_related('user').get(id=cls.open_exam.created_by_id)
+        cls.past_exam = Exam.objects.filter(
+            created_by=cls.teacher, late_submission_end__lt=now
+        ).annotate(results=Count('studentexamresult')).order_by('-results', 'id').first()
+        cls.student = Student.objects.select_related('user').filter(
+            department=cls.teacher.department, semester=cls.open_exam.semester
+        ).order_by('id').first()
+        cls.admin = User.objects.create_superuser(username='admin001', email='admin001@example.edu', password='password')
+
+    def setUp(self):
+        # Papers are cached by id, and ids are not reused between test classes
+        cache.clear()
+        for registry in (departments, subjects):
+            registry.invalidate()
+            registry.snapshot()
+        self.anonymous = Client()
+        self.as_teacher = self.client_for(self.teacher.user)
+        self.as_student = self.client_for(self.student.user)
+        self.as_admin = self.client_for(self.admin)
+
+    def client_for(self, user, **kwargs):
+        client = Client(**kwargs)
+        client.force_login(user)
+        return client
+
+    def call(self, client, method, path, queries, seconds=TIME_BUDGET, status=200, **kwargs):
+        """
+        Make one request within budget and check its status; status=None
+        skips the check for routes that are known to be broken
+        """
+        with assert_query_budget(queries, seconds):
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                # Streaming responses run their queries while the body is read
+                response.streaming_content = [b''.join(response.streaming_content)]
+        if status is not None:
+            self.assertEqual(response.status_code, status, getattr(response, 'content', b'')[:500])
+        return response
+
+    def call_json(self, client, method, path, data, queries, **kwargs):
+        return self.call(client, method, path, queries, data=json.dumps(data), content_type='application/json', **kwargs)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class DatasetTests(TestCase):
+    COMMAND_ARGS = ('--students', '80', '--exams', '10', '--questions', '4', '--year', '23', '--seed', '7',
+                    '--password', 'secret', '--sitting-share', '1')
+
+    def generate(self, *args):
+        """Run the command and return its rows without the generated ids, which differ between runs"""
+        call_command('generate_dataset', *args, stdout=StringIO())
+        return {
+            'users': list(User.objects.order_by('username').values_list('username', 'role')),
+            'students': list(Student.objects.order_by('user__username').values_list(
+                'user__username', 'department__code', 'semester')),
+            'exams': list(Exam.objects.order_by('title').values_list(
+                'title', 'subject__name', 'department__code', 'semester', 'created_by__user__username',
+                'duration', 'passing_score', 'total_marks', 'start_time')),
+            'questions': list(Question.objects.order_by('text').values_list('text', 'options', 'correct_answer', 'marks')),
+            'results': list(StudentExamResult.objects.order_by('exam__title', 'student__user__username').values_list(
+                'exam__title', 'student__user__username', 'obtained_marks', 'status', 'submitted_at')),
+        }
+
+    def test_command_is_reproducible(self):
+        with transaction.atomic():
+            first = self.generate(*self.COMMAND_ARGS)
+            transaction.set_rollback(True)
+        self.assertFalse(User.objects.exists())
+        self.assertEqual(self.generate(*self.COMMAND_ARGS), first)
+        self.assertNotEqual(self.generate('--students', '80', '--exams', '10', '--questions', '4', '--year', '22',
+                                          '--seed', '8')['questions'], first['questions'])
+
+    def test_command_sizes(self):
+        rows = self.generate(*self.COMMAND_ARGS)
+        self.assertEqual(len(rows['students']), 80)
+        # Ten exams need one teacher per department
+        self.assertEqual(Teacher.objects.count(), 5)
+        self.assertEqual(len(rows['exams']), 10)
+        self.assertEqual(len(rows['questions']), 40)
+        self.assertTrue(all(Exam.objects.get(title=exam[0]).questions.count() == 4 for exam in rows['exams']))
+        # The tenth exam is open today; the other nine ran, and every one of the
+        # two students in each department and semester sat them
+        self.assertEqual(len(rows['results']), 9 * 2)
+        self.assertEqual(ExamAttempt.objects.filter(status='submitted').count(), 9 * 2)
+        self.assertEqual(rebuild_statistics(check=True), [])
+
+    def test_command_ids(self):
+        rows = self.generate(*self.COMMAND_ARGS)
+        codes = '|'.join(code for code, _ in User.DEPARTMENT_CHOICES)
+        for username, role in rows['users']:
+            self.assertRegex(username, rf'^[0-8]mp23({codes})\d{{3}}$')
+            self.assertEqual(role, 'teacher' if username[0] == '0' else 'student')
+        for username, department, semester in rows['students']:
+            self.assertEqual((username[0], username[5:7]), (str(semester), department))
+        self.assertTrue(User.objects.get(username='0mp23cs000').check_password('secret'))
+        # IDs come from the sizes, so the same run again collides with the first
+        with self.assertRaisesMessage(CommandError, 'Generated IDs already exist'):
+            call_command('generate_dataset', *self.COMMAND_ARGS, stdout=StringIO())
+
+    def test_college_ids_continue_into_earlier_years(self):
+        ids = college_ids('1', 'cs', 23, 1002)
+        self.assertEqual(ids[:2], ['1mp23cs000', '1mp23cs001'])
+        self.assertEqual(ids[-3:], ['1mp23cs999', '1mp22cs000', '1mp22cs001'])
+
+    def test_generate_dataset(self):
+        report = generate_dataset(students=80, exams=10, year=23, seed=0)
+        self.assertEqual(report['departments'], 5)
+        self.assertEqual(Student.objects.count(), 80)
+        self.assertEqual(Exam.objects.count(), 10)
+        self.assertEqual(Exam.objects.get(id=Exam.objects.order_by('id').first().id).questions.count(), 10)
+        self.assertEqual(ExamAttempt.objects.filter(status='submitted').count(), report['results'])
+        self.assertTrue(User.objects.filter(username__regex=r'^0mp23cs000$', role='teacher').exists())
+        # Results are dated by their submission, so the incremental rollups need no rebuild
+        self.assertEqual(rebuild_statistics(check=True), [])
+
+
+class PaperCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.exam = make_exam([(['A', 'B'], 'a', 1)])
+        cls.exam.questions.update(text='Original')
+
+    def paper_in_other_worker(self):
+        with override_settings(CACHES=OTHER_WORKER_CACHES):
+            return json.loads(get_paper(load_exam(self.exam.id))[PAPER_EXAM_QUESTIONS])
+
+    def test_edit_reaches_other_workers(self):
+        with override_settings(CACHES=OTHER_WORKER_CACHES):
+            cache.clear()
+        self.assertEqual(self.paper_in_other_worker()['questions'][0]['text'], 'Original')
+
+        # This worker edits the paper; the other one still holds the old one in its cache
+        self.exam.questions.update(text='Edited')
+        invalidate_paper(self.exam)
+        self.assertEqual(self.exam.paper_version, 1)
+        self.assertEqual(self.paper_in_other_worker()['questions'][0]['text'], 'Edited')
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_processes_sharing_a_cache_compute_once(self):
+        # Each SingleFlight stands for one worker process; they share only the cache
+        workers = [SingleFlight('test') for _ in range(3)]
+        started, release, computed = threading.Event(), threading.Event(), []
+
+        def compute():
+            computed.append(1)
+            started.set()
+            release.wait(5)
+            return 'paper'
+
+        values = []
+        threads = [threading.Thread(target=lambda worker=worker: values.append(worker.get('key', compute)))
+                   for worker in workers]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(values, ['paper'] * 3)
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(sum(worker.stats()['waits'] for worker in workers), 2)
+
+    def test_a_failed_leader_hands_over(self):
+        def fail():
+            raise ValueError('database went away')
+
+        with self.assertRaises(ValueError):
+            SingleFlight('test').get('key', fail)
+        self.assertEqual(SingleFlight('test').get('key', lambda: 'paper'), 'paper')
+
+
+def score_by_question(exam, answers):
+    """Grade one submission a question at a time, as submit_exam did before AnswerKey"""
+    by_id = {}
+    for key, value in answers.items():
+        key = str(key).replace('question_', '', 1)
+        if key.isdigit():
+            by_id[int(key)] = value
+    obtained = total = 0
+    for question in exam.questions.order_by('id'):
+        total += question.marks
+        chosen = option_index(by_id.get(question.id), len(question.options))
+        if chosen != -1 and chosen == option_index(question.correct_answer, len(question.options)):
+            obtained += question.marks
+    return obtained, 'pass' if total and obtained * 100 >= exam.passing_score * total else 'fail'
+
+
+class AnswerKeyTests(TestCase):
+    def test_matches_scoring_question_by_question(self):
+        exam = make_exam([
+            (['True', 'False'], 't', 1),
+            (['True', 'False'], 'f', 2),
+            (['A', 'B', 'C'], 'c', 3),
+            (['A', 'B', 'C', 'D'], 'b', 1),
+            (['A', 'B', 'C', 'D', 'E'], 'e', 4),
+        ], passing_score=40)
+        key = AnswerKey.compile(exam)
+        ids = list(exam.questions.order_by('id').values_list('id', flat=True))
+        values = ['t', 'True', 'F', 'false', 'a', 'B', 'c', 'E', 'z', 0, 1, 2, 4, 7, -1, '3', ' b ', '', None, True]
+        rng = random.Random(3)
+        submissions = [
+            {},
+            {'question_999999': 'a', 'notes': 'b'},
+            {f'question_{ids[0]}': 't', str(ids[1]): 'f', ids[2]: 'c', f'question_{ids[3]}': 1, str(ids[4]): '4'},
+        ]
+        for _ in range(300):
+            answers = {}
+            for question_id in ids:
+                if rng.random() < 0.8:
+                    form = rng.choice((f'question_{question_id}', str(question_id), question_id))
+                    answers[form] = rng.choice(values)
+            if rng.random() < 0.2:
+                answers[rng.choice(('question_0', 'question_x', 'extra'))] = rng.choice(values)
+            submissions.append(answers)
+
+        obtained, passed, _ = key.score_many(submissions)
+        for answers, marks, ok in zip(submissions, obtained.tolist(), passed.tolist()):
+            self.assertEqual((marks, 'pass' if ok else 'fail'), score_by_question(exam, answers), answers)
+            score = key.score(answers)
+            self.assertEqual((score['obtained_marks'], score['status']), score_by_question(exam, answers))
+        self.assertEqual(key.score(submissions[2])['obtained_marks'], 11)
+        self.assertEqual(key.score({})['status'], 'fail')
+        self.assertEqual(key.total_marks, 11)
+
+
+class ItemAnalysisTests(TestCase):
+    def test_known_answers(self):
+        # A True/False question (a), a four option one (b) and a three option one (c, two marks)
+        key = AnswerKey(1, [1, 2, 3], correct=[0, 1, 2], marks=[1, 1, 2], option_counts=[2, 4, 3], passing_score=50)
+        responses = np.array([
+            [0, 1, 2], [0, 1, 2], [0, 1, 0], [0, 2, 2], [1, 1, 2],
+            [0, 0, 1], [1, -1, -1], [1, 1, -1], [0, -1, 0], [1, 0, 1],
+        ], dtype=np.int8)
+        # Totals 4 4 2 3 3 1 0 1 1 0; 27% of ten is three examinees per group,
+        # ties kept in examinee order: lower 6 9 5, upper 4 0 1
+        stats = analyse(responses, key)
+        self.assertEqual(stats['examinees'], 10)
+        np.testing.assert_allclose(stats['difficulty'], [0.6, 0.5, 0.4])
+        # Correlated with the rest score; against the total they would be 0.5083, 0.6225 and 0.9037
+        np.testing.assert_allclose(stats['point_biserial'], [0.1930, 0.3333, 0.4666], atol=1e-4)
+        np.testing.assert_allclose(stats['discrimination'], [1 / 3, 1, 1])
+        # Option d of the second question is never chosen
+        np.testing.assert_array_equal(stats['functional_distractors'], [1, 2, 2])
+        np.testing.assert_allclose(stats['distractor_efficiency'], [1, 2 / 3, 1])
+        np.testing.assert_allclose(stats['option_share'][1], [0.2, 0.5, 0.1, 0])
+        np.testing.assert_allclose(stats['option_upper'][0], [2 / 3, 1 / 3, 0, 0])
+        np.testing.assert_allclose(stats['option_lower'][2], [0, 2 / 3, 0, 0])
+
+
+class GradeAttemptsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.exam = make_exam([(['A', 'B', 'C', 'D'], 'b', 2), (['True', 'False'], 't', 1)])
+        cls.students = make_students(3)
+
+    def setUp(self):
+        # Answer keys are cached by exam id, which an earlier test class may have used
+        cache.clear()
+
+    def test_results_are_dated_by_submission(self):
+        submitted = timezone.now() - timedelta(minutes=30)
+        attempt = submit(self.exam, self.students[0], {f'question_{q.id}': 'b' for q in self.exam.questions.all()},
+                         end_time=submitted)
+        result, = grade_attempts(self.exam, [attempt])
+        self.assertEqual(StudentExamResult.objects.get(id=result.id).submitted_at, submitted)
+        self.assertEqual(result.obtained_marks, 2)
+
+    def test_grading_twice_counts_once(self):
+        questions = list(self.exam.questions.order_by('id'))
+        attempts = [
+            submit(self.exam, student, {f'question_{questions[0].id}': 'b', f'question_{questions[1].id}': 't'})
+            for student in self.students
+        ]
+        self.assertEqual(len(grade_attempts(self.exam, attempts)), 3)
+        # A second grader of the same attempts writes nothing
+        self.assertEqual(grade_attempts(self.exam, attempts), [])
+        self.assertEqual(StudentExamResult.objects.filter(exam=self.exam).count(), 3)
+        self.assertEqual(AttemptAnswer.objects.filter(exam=self.exam).count(), 6)
+        stats = ExamStatistics.objects.get(scope=f'exam:{self.exam.id}')
+        self.assertEqual((stats.submissions, stats.passed, stats.marks_sum), (3, 3, 9))
+        self.assertEqual(rebuild_statistics(check=True), [])
+
+    def test_worker_grades_other_exams_when_one_fails(self):
+        broken = make_exam([(['A', 'B'], 'a', 1)], title='Broken key')
+        for exam in (self.exam, broken):
+            for student in self.students:
+                submit(exam, student, {})
+
+        def answer_key(exam):
+            if exam.id == broken.id:
+                raise ValueError('Corrupt answer key')
+            return get_answer_key(exam)
+
+        with mock.patch('exams.grading.get_answer_key', side_effect=answer_key), \
+                self.assertLogs('exams.grading', 'ERROR') as logs:
+            call_command('grade_worker', '--once', stdout=StringIO())
+        self.assertIn(f'exam {broken.id}', logs.output[0])
+        self.assertEqual(StudentExamResult.objects.filter(exam=self.exam).count(), 3)
+        self.assertFalse(StudentExamResult.objects.filter(exam=broken).exists())
+        # The failed attempts stay ungraded but leave the queue, so the worker did not spin on them
+        failed = ExamAttempt.objects.filter(exam=broken)
+        self.assertFalse(failed.filter(graded_at__isnull=False).exists())
+        self.assertFalse(pending_attempts().exists())
+
+        self.assertEqual(requeue_failed_attempts(), 3)
+        call_command('grade_worker', '--once', stdout=StringIO())
+        self.assertEqual(StudentExamResult.objects.filter(exam=broken).count(), 3)
+        self.assertEqual(rebuild_statistics(check=True), [])
+
+
+class RollupTests(TestCase):
+    def assertRollupsMatchRebuild(self):
+        self.assertEqual(rebuild_statistics(check=True), [])
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        exam = make_exam([(['A', 'B'], 'a', 100)])
+        other = make_exam([(['A', 'B'], 'a', 100)])
+        students = make_students(4)
+        results = [
+            StudentExamResult.objects.create(student=student, exam=exam, obtained_marks=marks,
+                                             status='pass' if marks >= 50 else 'fail')
+            for student, marks in zip(students, (30, 55, 72, 90))
+        ]
+        StudentExamResult.objects.create(student=students[0], exam=other, obtained_marks=64, status='pass')
+        self.assertRollupsMatchRebuild()
+
+        result = StudentExamResult.objects.get(pk=results[0].pk)
+        result.obtained_marks, result.status = 88, 'pass'
+        result.save()
+        self.assertRollupsMatchRebuild()
+
+        exam = Exam.objects.get(pk=exam.pk)
+        exam.department, exam.semester = Department.objects.get(code='is'), 3
+        exam.end_time = timezone.now() - timedelta(hours=1)
+        exam.save()
+        self.assertEqual(ExamStatistics.objects.get(exam=exam).late_submissions, 4)
+        self.assertRollupsMatchRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_results(StudentExamResult.objects.filter(pk=results[3].pk))
+        self.assertRollupsMatchRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            students[0].delete()
+        self.assertRollupsMatchRebuild()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exam.delete()
+        self.assertRollupsMatchRebuild()
+        self.assertFalse(ExamStatistics.objects.filter(submissions__gt=0).exists())
+
+    def test_removed_marks_read_only_their_exams_results(self):
+        exam = make_exam([(['A', 'B'], 'a', 100)])
+        other = make_exam([(['A', 'B'], 'a', 100)], semester=2)
+        students = make_students(3)
+        for student, marks in zip(students, (10, 50, 90)):
+            StudentExamResult.objects.create(student=student, exam=exam, obtained_marks=marks, status='fail')
+        StudentExamResult.objects.create(student=students[0], exam=other, obtained_marks=20, status='fail')
+
+        # Neither the min nor the max of any rollup moves, so none is recomputed
+        middle = StudentExamResult.objects.get(exam=exam, obtained_marks=50)
+        middle.obtained_marks = 60
+        with CaptureQueriesContext(connection) as captured:
+            middle.save()
+        self.assertFalse([query['sql'] for query in captured
+                          if query['sql'].startswith('SELECT') and 'MIN(' in query['sql']])
+        self.assertRollupsMatchRebuild()
+
+        # The system-wide minimum goes, and the next one is another exam's
+        lowest = StudentExamResult.objects.get(exam=exam, obtained_marks=10)
+        lowest.obtained_marks = 95
+        with CaptureQueriesContext(connection) as captured:
+            lowest.save()
+        reads = [query['sql'] for query in captured
+                 if query['sql'].startswith('SELECT') and 'FROM "exams_studentexamresult"' in query['sql']]
+        self.assertEqual(len(reads), 1)
+        self.assertIn('"exams_studentexamresult"."exam_id" =', reads[0])
+        stats = ExamStatistics.objects.get(scope='all')
+        self.assertEqual((stats.min_mark, stats.max_mark), (20, 95))
+        self.assertRollupsMatchRebuild()
+
+    def test_edits_that_keep_the_rollups_skip_them(self):
+        exam = make_exam([(['A', 'B'], 'a', 1)])
+        student, = make_students(1)
+        StudentExamResult.objects.create(student=student, exam=exam, obtained_marks=1, status='pass')
+        exam = Exam.objects.get(pk=exam.pk)
+        exam.title, exam.duration = 'Renamed', 45
+        with self.assertNumQueries(1):
+            exam.save()
+
+
+class ResultsPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='0mp23cs900').teacher_profile
+        cls.exam = make_exam([(['A', 'B'], 'a', 1)], created_by=cls.teacher)
+        # Graded in batches, so most results share a submission time and many share marks
+        moments = [timezone.now() - timedelta(hours=hours) for hours in (3, 3, 3, 3, 2, 2, 1, 1, 1, 0, 0)]
+        cls.ids = [
+            StudentExamResult.objects.create(student=student, exam=cls.exam, obtained_marks=n % 3,
+                                             status='pass', submitted_at=moment).id
+            for n, (student, moment) in enumerate(zip(make_students(len(moments)), moments))
+        ]
+
+    def pages(self, sort, limit=2):
+        rows, cursor = results_page(StudentExamResult.objects.all(), {'sort': sort, 'limit': str(limit)})
+        pages = [rows]
+        while cursor:
+            rows, cursor = results_page(StudentExamResult.objects.all(),
+                                        {'sort': sort, 'limit': str(limit), 'cursor': cursor})
+            pages.append(rows)
+        return pages
+
+    def test_pages_are_stable_and_complete_across_ties(self):
+        for sort in ('-submitted_at', 'submitted_at', '-obtained_marks', 'obtained_marks', '-id', 'id'):
+            for limit in (1, 2, 3, 4):
+                rows = [row for page in self.pages(sort, limit) for row in page]
+                field, descending = sort.lstrip('-'), sort.startswith('-')
+                expected = sorted(rows, key=lambda row: (row[field], row['id']), reverse=descending)
+                self.assertEqual([row['id'] for row in rows], [row['id'] for row in expected], (sort, limit))
+                self.assertEqual(sorted(row['id'] for row in rows), sorted(self.ids), (sort, limit))
+
+    def test_tampered_cursors_are_rejected(self):
+        _, cursor = results_page(StudentExamResult.objects.all(), {'limit': '2'})
+        value, signature = cursor.rsplit(':', 1)
+        forged = [
+            cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'),
+            f'{value}:{signature[::-1]}',
+            value,
+            'not a cursor',
+        ]
+        for tampered in forged:
+            with self.assertRaises(ResultsQueryError, msg=tampered):
+                results_page(StudentExamResult.objects.all(), {'limit': '2', 'cursor': tampered})
+        with self.assertRaises(ResultsQueryError):
+            results_page(StudentExamResult.objects.all(), {'sort': 'id', 'cursor': cursor})
+
+        self.client.force_login(self.teacher.user)
+        for path in ('/api/exams/results/', '/exams/results/'):
+            response = self.client.get(path, {'cursor': forged[0]})
+            self.assertEqual(response.status_code, 400, path)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='0mp23cs900').teacher_profile
+        cls.exam = make_exam([(['A', 'B'], 'a', 2)], created_by=cls.teacher, title='Midterm, part "A"')
+        students = make_students(3)
+        names = [('Smith, Jr.', 'Line\nbreak'), ('Plain', 'Name'), ('"Quoted"', 'Comma, and\r\nCRLF')]
+        for student, (first_name, last_name) in zip(students, names):
+            User.objects.filter(id=student.user_id).update(first_name=first_name, last_name=last_name)
+        grade_attempts(cls.exam, [
+            submit(cls.exam, student, {f'question_{cls.exam.questions.get().id}': answer})
+            for student, answer in zip(students, 'aba')
+        ])
+        cls.names = {f'1mp23cs{n:03d}': name for n, name in enumerate(names, 1)}
+
+    def export(self, export_format):
+        return ''.join(export_lines(StudentExamResult.objects.all(), export_format))
+
+    def test_csv(self):
+        header, *rows = csv.reader(StringIO(self.export('csv')))
+        self.assertEqual(header, [name for name, _ in EXPORT_COLUMNS])
+        self.assertEqual(header[:4], ['result_id', 'student_id', 'first_name', 'last_name'])
+        self.assertEqual(len(rows), 3)
+        # Commas, quotes and line breaks in names survive a round trip
+        self.assertEqual({row[1]: (row[2], row[3]) for row in rows}, self.names)
+        row = dict(zip(header, rows[0]))
+        self.assertEqual((row['exam'], row['obtained_marks'], row['total_marks'], row['status']),
+                         ('Midterm, part "A"', '2', '2', 'pass'))
+
+    def test_jsonl(self):
+        lines = self.export('jsonl').split('\n')
+        # One object per line, each line ended by a newline; names with line breaks are escaped
+        self.assertEqual(lines.pop(), '')
+        self.assertEqual(len(lines), 3)
+        rows = [json.loads(line) for line in lines]
+        self.assertTrue(all(list(row) == [name for name, _ in EXPORT_COLUMNS] for row in rows))
+        self.assertEqual({row['student_id']: (row['first_name'], row['last_name']) for row in rows}, self.names)
+        self.assertEqual([(row['obtained_marks'], row['status']) for row in rows], [(2, 'pass'), (0, 'fail'), (2, 'pass')])
+
+    def test_unknown_format(self):
+        self.client.force_login(self.teacher.user)
+        response = self.client.get('/api/exams/results/export/?output=xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid output: xml', json.loads(response.content)['message'])
+        with self.assertRaisesMessage(CommandError, "invalid choice: 'xml'"):
+            call_command('export_results', '--format', 'xml', stdout=StringIO())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_results', '--format', 'jsonl', '--status', 'pass', stdout=out)
+        self.assertEqual([json.loads(line)['status'] for line in out.getvalue().splitlines()], ['pass', 'pass'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.csv')
+            out = StringIO()
+            call_command('export_results', '--output', path, stdout=out)
+            self.assertIn('Exported 3 results', out.getvalue())
+            with open(path, newline='', encoding='utf-8') as f:
+                self.assertEqual(len(list(csv.reader(f))), 4)
+
+
+class AutosaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.exam = make_exam([(['A', 'B', 'C'], 'a', 1)] * 3)
+        cls.student, = make_students(1)
+        cls.keys = [f'question_{question.id}' for question in cls.exam.questions.order_by('id')]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.student.user)
+        self.client.post(f'/exams/api/start_attempt/{self.exam.id}/')
+
+    def patch(self, answers):
+        response = self.client.patch(f'/api/exams/{self.exam.id}/autosave/', json.dumps({'answers': answers}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)
+
+    def submit(self, answers):
+        response = self.client.post(f'/api/exams/{self.exam.id}/submit/', json.dumps({'answers': answers}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return ExamAttempt.objects.get(exam=self.exam, student=self.student).answers
+
+    def stored(self):
+        return ExamAttempt.objects.get(exam=self.exam, student=self.student).answers
+
+    def test_submit_on_another_worker_keeps_autosaved_answers(self):
+        self.patch({self.keys[0]: 'a'})
+        self.patch({self.keys[1]: 'b'})
+        with override_settings(CACHES=OTHER_WORKER_CACHES):
+            cache.clear()
+            answers = self.submit({self.keys[2]: 'c'})
+        self.assertEqual(answers, {self.keys[0]: 'a', self.keys[1]: 'b', self.keys[2]: 'c'})
+
+    def test_patches_on_different_workers_are_merged(self):
+        # This worker's buffer predates the other worker's change
+        self.patch({self.keys[0]: 'a'})
+        with override_settings(CACHES=OTHER_WORKER_CACHES):
+            cache.clear()
+            self.patch({self.keys[1]: 'b'})
+        self.patch({self.keys[2]: 'c'})
+        self.assertEqual(self.stored(), {self.keys[0]: 'a', self.keys[1]: 'b', self.keys[2]: 'c'})
+
+    @override_settings(AUTOSAVE_FLUSH_INTERVAL=3600)
+    def test_patches_are_coalesced_until_submit(self):
+        self.assertTrue(self.patch({self.keys[0]: 'a'})['flushed'])
+        self.assertFalse(self.patch({self.keys[1]: 'b'})['flushed'])
+        self.assertFalse(self.patch({self.keys[0]: None, self.keys[2]: 'c'})['flushed'])
+        self.assertEqual(self.stored(), {self.keys[0]: 'a'})
+        # A reloaded page gets the buffered changes back
+        resumed = self.client.post(f'/exams/api/start_attempt/{self.exam.id}/')
+        self.assertEqual(json.loads(resumed.content)['answers'], {self.keys[1]: 'b', self.keys[2]: 'c'})
+        self.assertEqual(self.submit({}), {self.keys[1]: 'b', self.keys[2]: 'c'})
+
+    def test_no_autosave_after_submit(self):
+        self.submit({self.keys[0]: 'a'})
+        response = self.client.patch(f'/api/exams/{self.exam.id}/autosave/', json.dumps({'answers': {self.keys[1]: 'b'}}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored(), {self.keys[0]: 'a'})
+
+
+@override_settings(REFERENCE_DATA_CHECK_INTERVAL=0)
+class ReferenceDataTests(TestCase):
+    def test_edit_reaches_other_workers(self):
+        # Another worker's copy of the subject table
+        other = Registry('subject', Subject, ('id', 'name'))
+        self.assertIsNone(other.get(name='Astronomy'))
+        subject = Subject.objects.create(name='Astronomy')
+        self.assertEqual(other.get(name='Astronomy'), subject)
+        self.assertEqual(other.modified_at(), subjects.modified_at())
+
+    def test_validators_survive_a_restart(self):
+        client = Client()
+        client.force_login(User.objects.create_user(username='admin002'))
+        first = client.get('/api/exams/subjects/')
+        # A restarted or different worker starts without a snapshot
+        subjects._snapshot = None
+        second = client.get('/api/exams/subjects/')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first['Last-Modified'], second['Last-Modified'])
+        self.assertEqual(client.get('/api/exams/subjects/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        Subject.objects.create(name='Astronomy')
+        third = client.get('/api/exams/subjects/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+
+class BootstrapDepartmentsMigrationTests(TransactionTestCase):
+    """exams migration 0006, which seeds the departments and backfills profiles"""
+    before = [('exams', '0005_result_pagination_indexes'), ('accounts', '0003_alter_user_username')]
+    after = [('exams', '0006_bootstrap_departments')]
+    # The flush after the test would otherwise take the seeded departments with it
+    serialized_rollback = True
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forward_and_back(self):
+        apps = self.migrate(self.before)
+        Department = apps.get_model('exams', 'Department')
+        User = apps.get_model('accounts', 'User')
+        Department.objects.all().delete()
+        Department.objects.create(code='cs', name='Computer Science')
+        users = {username: User.objects.create(username=username, password='') for username in (
+            '1mp23cs001', '2mp23ml002', '3mp23xx003', '0mp23ds004',
+        )}
+        for username in ('1mp23cs001', '2mp23ml002', '3mp23xx003'):
+            apps.get_model('accounts', 'Student').objects.create(user=users[username], semester=1)
+        apps.get_model('accounts', 'Teacher').objects.create(user=users['0mp23ds004'])
+
+        for _ in range(2):
+            apps = self.migrate(self.after)
+            Department = apps.get_model('exams', 'Department')
+            self.assertEqual(sorted(Department.objects.values_list('code', flat=True)), ['cg', 'cs', 'ds', 'is', 'ml'])
+            # An existing department is kept as it is
+            self.assertEqual(Department.objects.get(code='cs').name, 'Computer Science')
+            self.assertEqual(dict(apps.get_model('accounts', 'Student').objects.values_list(
+                'user__username', 'department__code'
+            )), {'1mp23cs001': 'cs', '2mp23ml002': 'ml', '3mp23xx003': None})
+            self.assertEqual(apps.get_model('accounts', 'Teacher').objects.get().department.code, 'ds')
+            # Migrating back leaves the data in place, and running the migration again adds nothing
+            apps = self.migrate(self.before)
+            self.assertEqual(apps.get_model('exams', 'Department').objects.count(), 5)
+
+
+# A sample line of the Prometheus text format: name, optional labels, value
+METRIC_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*",?)*\})? (\S+)$')
+
+
+@override_settings(METRICS_TOKEN='scrape-token', METRICS_SAMPLE_RATE=1.0)
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def scrape(self, **kwargs):
+        return self.client.get('/metrics', **kwargs)
+
+    def samples(self):
+        """{name: {labels: value}} from an authorized scrape, checking every line on the way"""
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertTrue(text.endswith('\n'))
+        samples, types = {}, {}
+        for line in text.splitlines():
+            if line.startswith('# '):
+                kind, name, rest = line[2:].split(' ', 2)
+                self.assertIn(kind, ('HELP', 'TYPE'), line)
+                if kind == 'TYPE':
+                    self.assertIn(rest, ('counter', 'gauge', 'histogram'), line)
+                    types[name] = rest
+                continue
+            match = METRIC_SAMPLE.match(line)
+            self.assertIsNotNone(match, line)
+            name, labels, value = match.groups()
+            self.assertTrue(any(name == family or name.startswith(family + '_') for family in types), line)
+            samples.setdefault(name, {})[labels or ''] = float(value)
+        return samples
+
+    def requests_total(self, view):
+        return {
+            labels: value for labels, value in self.samples().get('http_requests_total', {}).items()
+            if f'view="{view}"' in labels
+        }
+
+    def test_needs_the_token_or_an_admin(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='scrape-token').status_code, 403)
+        self.client.force_login(make_students(1)[0].user)
+        self.assertEqual(self.scrape().status_code, 403)
+        self.client.force_login(User.objects.create_superuser(username='admin001', email='admin001@example.edu'))
+        self.assertEqual(self.scrape().status_code, 200)
+        with override_settings(METRICS_TOKEN=''):
+            self.client.logout()
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    def test_sampled_requests_are_counted(self):
+        for _ in range(2):
+            self.client.get('/accounts/login/')
+        self.assertEqual(self.requests_total('accounts:login'),
+                         {'{view="accounts:login",method="GET",status="200"}': 2})
+        self.client.get('/accounts/login/')
+        samples = self.samples()
+        labels = '{view="accounts:login",method="GET"}'
+        self.assertEqual(samples['http_request_duration_seconds_count'][labels], 3)
+        self.assertEqual(samples['http_request_queries_count'][labels], 3)
+        self.assertEqual(samples['http_response_size_bytes_count'][labels], 3)
+        # Buckets are cumulative and the last one holds every request
+        buckets = [value for key, value in samples['http_request_duration_seconds_bucket'].items()
+                   if key.startswith('{view="accounts:login"')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 3)
+
+    def test_sample_rate(self):
+        with override_settings(METRICS_SAMPLE_RATE=0.5), mock.patch('exam_system.metrics.random.random') as draw:
+            draw.return_value = 0.49
+            self.client.get('/accounts/login/')
+            draw.return_value = 0.5
+            self.client.get('/accounts/login/')
+            self.assertEqual(self.samples()['metrics_sample_rate'], {'': 0.5})
+        self.assertEqual(sum(self.requests_total('accounts:login').values()), 1)
+        with override_settings(METRICS_SAMPLE_RATE=0):
+            self.client.get('/accounts/login/')
+        self.assertEqual(sum(self.requests_total('accounts:login').values()), 1)
+
+    def test_label_values_are_escaped(self):
+        metrics.record((('view', 'a"b\\c\nd'), ('method', 'GET')), 200, 0.1, 1, 0.01, None)
+        self.assertEqual(self.samples()['http_requests_total'],
+                         {'{view="a\\"b\\\\c\\nd",method="GET",status="200"}': 1})
+
+
+class LoadTestSummaryTests(TestCase):
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        for q in (0, 1, 50, 99, 100):
+            self.assertEqual(percentile([0.3], q), 0.3)
+        tens = list(range(1, 11))
+        self.assertEqual([percentile(tens, q) for q in (0, 10, 11, 50, 51, 90, 95, 100)], [1, 1, 2, 5, 6, 9, 10, 10])
+        hundred = list(range(1, 101))
+        self.assertEqual([percentile(hundred, q) for q in (7, 29, 50, 95, 99, 100)], [7, 29, 50, 95, 99, 100])
+        self.assertEqual([percentile([1, 2, 3, 4], q) for q in (25, 50, 75, 76)], [1, 2, 3, 4])
+
+    def test_summarize(self):
+        recorder = Recorder()
+        for step, started, seconds, status in (
+            ('login', 0.0, 0.2, 200), ('login', 0.5, 0.1, 302), ('login', 1.0, 0.4, 500), ('login', 1.5, 0.5, 200),
+            ('start', 2.0, 0.3, 403), ('start', 2.0, 0.1, 200),
+            ('submit', 3.0, 0.2, 200), ('submit', 3.5, 0.5, 200), ('submit', 3.0, 0.1, 429),
+        ):
+            recorder.record(step, started, seconds, status)
+        recorder.abort('questions')
+        recorder.abort('questions')
+        summary = summarize(recorder, 4.0)
+        steps = {row['step']: row for row in summary['steps']}
+        # Steps nobody reached are left out; aborted ones are kept in STEPS order
+        self.assertEqual(list(steps), ['login', 'start', 'questions', 'submit'])
+
+        login = steps['login']
+        self.assertEqual((login['count'], login['errors'], login['error_rate']), (4, 1, 0.25))
+        self.assertEqual(login['error_statuses'], {'500': 1})
+        self.assertEqual(login['throughput'], 4 / 2.0)
+        self.assertEqual((login['p50'], login['p95'], login['max']), (0.2, 0.5, 0.5))
+        self.assertEqual((steps['start']['error_rate'], steps['start']['error_statuses']), (0.5, {'403': 1}))
+        self.assertEqual(steps['submit']['error_statuses'], {'429': 1})
+        self.assertAlmostEqual(steps['submit']['error_rate'], 1 / 3)
+
+        questions = steps['questions']
+        self.assertEqual((questions['count'], questions['errors'], questions['error_rate'], questions['aborted']),
+                         (0, 0, 0.0, 2))
+        self.assertEqual((questions['throughput'], questions['p50'], questions['max']), (None, None, None))
+
+        self.assertEqual((summary['count'], summary['completed_sessions'], summary['throughput']), (9, 2, 9 / 4.0))
+        self.assertIsNone(summarize(recorder, 0)['throughput'])
+        self.assertEqual(summarize(Recorder(), 1.0)['steps'], [])
+
+
+class BenchmarkBaselineTests(TestCase):
+    def timing(self, median):
+        return {'median': median, 'min': median, 'number': 1, 'repeat': 5}
+
+    def verdicts(self, current, baseline, **kwargs):
+        return {(size, name): verdict for size, name, _, _, _, verdict in compare(current, baseline, **kwargs)}
+
+    def test_threshold_edges(self):
+        baseline = {'small': {name: self.timing(0.2) for name in 'abcdefg'}}
+        current = {'small': {
+            'a': self.timing(0.22), 'b': self.timing(0.18), 'c': self.timing(0.2201), 'd': self.timing(0.1799),
+            'e': self.timing(0.2), 'f': self.timing(0.3), 'g': self.timing(0.1),
+        }}
+        self.assertEqual(self.verdicts(current, baseline), {
+            ('small', 'a'): 'unchanged', ('small', 'b'): 'unchanged', ('small', 'c'): 'slower',
+            ('small', 'd'): 'faster', ('small', 'e'): 'unchanged', ('small', 'f'): 'slower', ('small', 'g'): 'faster',
+        })
+        self.assertEqual(self.verdicts(current, baseline, threshold=0.5)[('small', 'f')], 'unchanged')
+        (_, _, previous, median, ratio, _), = compare({'small': {'f': self.timing(0.3)}}, baseline)
+        self.assertEqual((previous, median), (0.2, 0.3))
+        self.assertAlmostEqual(ratio, 1.5)
+
+    def test_missing_baseline_entries(self):
+        baseline = {'small': {'paper.build': self.timing(0.1), 'old': self.timing(0.1)}, 'large': {}}
+        current = {
+            'small': {'paper.build': self.timing(0.1), 'grading.score': self.timing(0.1)},
+            'medium': {'paper.build': self.timing(0.1)},
+        }
+        rows = compare(current, baseline)
+        # Only what ran is reported; timings without a baseline are new
+        self.assertEqual([(size, name, verdict) for size, name, _, _, _, verdict in rows], [
+            ('small', 'paper.build', 'unchanged'), ('small', 'grading.score', 'new'), ('medium', 'paper.build', 'new'),
+        ])
+        self.assertEqual(rows[1][2::2], (None, None))
+        self.assertEqual(self.verdicts(current, {}), {key: 'new' for key in self.verdicts(current, baseline)})
+        # A zero baseline median has no ratio
+        self.assertEqual(compare({'small': {'a': self.timing(0.1)}}, {'small': {'a': self.timing(0)}})[0][4:],
+                         (None, 'unchanged'))
+
+    def test_save_keeps_what_was_not_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, '.benchmarks', 'baseline.json')
+            self.assertIsNone(load_baseline(path))
+            save_baseline(path, {'small': {'a': self.timing(1), 'b': self.timing(2)}, 'medium': {'a': self.timing(3)}})
+            previous = load_baseline(path)
+            self.assertIn('database', previous['environment'])
+
+            save_baseline(path, {'small': {'a': self.timing(4)}, 'large': {'a': self.timing(5)}}, previous=previous)
+            saved = load_baseline(path)['results']
+        self.assertEqual({size: {name: timing['median'] for name, timing in timings.items()}
+                          for size, timings in saved.items()},
+                         {'small': {'a': 4, 'b': 2}, 'medium': {'a': 3}, 'large': {'a': 5}})
+        # The loaded baseline is not changed by the merge
+        self.assertEqual(previous['results']['small']['a']['median'], 1)
+
+
+class TeacherApiBudgetTests(QueryBudgetTestCase):
+    """Routes of exams/urls_api.py used by teachers, under /api/exams/"""
+
+    def test_list_subjects(self):
+        response = self.call(self.as_teacher, 'get', '/api/exams/subjects/', queries=3)
+        self.assertEqual(len(json.loads(response.content)['data']), Subject.objects.count())
+        # Revalidation only authenticates
+        self.call(self.as_teacher, 'get', '/api/exams/subjects/', queries=2, status=304,
+                  HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_create_exam(self):
+        # ExamSerializer lists a field the model does not have, so creation fails
+        # with a 500; the budget still holds
+        self.call_json(self.as_teacher, 'post', '/api/exams/create/', {
+            'title': 'Budget test', 'subject_id': self.past_exam.subject_id, 'semester': 1, 'duration': 30,
+            'totalQuestions': 2, 'deadline': (timezone.now() + timedelta(days=2)).isoformat(),
+        }, queries=3, status=None)
+
+    def test_list_exams(self):
+        response = self.call(self.as_teacher, 'get', '/api/exams/list/', queries=4)
+        self.assertEqual(len(json.loads(response.content)['data']), Exam.objects.filter(created_by=self.teacher).count())
+
+    def test_list_results(self):
+        own = StudentExamResult.objects.filter(exam__created_by=self.teacher)
+        response = self.call(self.as_teacher, 'get', '/api/exams/results/', queries=4)
+        rows = json.loads(response.content)['data']
+        self.assertTrue(rows)
+        self.assertEqual(own.filter(id__in=[row['id'] for row in rows]).count(), len(rows))
+        response = self.call(self.as_teacher, 'get', '/api/exams/results/?status=pass&limit=200', queries=4)
+        rows = json.loads(response.content)['data']
+        self.assertEqual(len(rows), min(200, own.filter(status='pass').count()))
+        self.assertEqual({row['status'] for row in rows}, {'pass'})
+
+    def test_export_results(self):
+        results = StudentExamResult.objects.filter(exam__created_by=self.teacher).count()
+        response = self.call(self.as_teacher, 'get', '/api/exams/results/export/', queries=4)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), results + 1)
+        response = self.call(self.as_teacher, 'get', '/api/exams/results/export/?output=jsonl', queries=4)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), results)
+
+    def test_get_exam(self):
+        response = self.call(self.as_teacher, 'get', f'/api/exams/{self.past_exam.id}/', queries=6)
+        data = json.loads(response.content)['data']
+        self.assertEqual(data['title'], self.past_exam.title)
+        self.assertEqual(len(data['questions']), self.past_exam.questions.count())
+
+    def test_update_exam(self):
+        # Neither department, semester nor the late window changes, so the rollups are left alone
+        self.call_json(self.as_teacher, 'put', f'/api/exams/{self.past_exam.id}/', {
+            'title': 'Renamed', 'duration': 45, 'subject_id': self.past_exam.subject_id,
+        }, queries=7)
+        self.past_exam.refresh_from_db()
+        self.assertEqual((self.past_exam.title, self.past_exam.duration), ('Renamed', 45))
+
+    def test_delete_exam(self):
+        self.call(self.as_teacher, 'delete', f'/api/exams/{self.open_exam.id}/', queries=12)
+        self.assertFalse(Exam.objects.filter(id=self.open_exam.id).exists())
+
+    def test_add_questions(self):
+        questions = [
+            {'text': f'Question {n}', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 'b', 'marks': 2}
+            for n in range(25)
+        ]
+        self.call_json(self.as_teacher, 'post', f'/api/exams/{self.open_exam.id}/add-questions/',
+                       {'questions': questions}, queries=12)
+        self.assertEqual(self.open_exam.questions.count(), 25)
+
+    def test_attendance(self):
+        response = self.call(self.as_teacher, 'get', f'/api/exams/{self.past_exam.id}/attendance/', queries=3)
+        data = json.loads(response.content)['data']
+        registered = Student.objects.filter(department=self.past_exam.department_id, semester=self.past_exam.semester)
+        self.assertEqual(data['totalRegistered'], registered.count())
+        self.assertEqual(data['present'], ExamAttempt.objects.filter(exam=self.past_exam).count())
+        self.assertEqual(data['present'] + data['absent'], data['totalRegistered'])
+
+    def test_question_analysis(self):
+        response = self.call(self.as_teacher, 'get', f'/api/exams/{self.past_exam.id}/question-analysis/', queries=7)
+        data = json.loads(response.content)['data']
+        self.assertEqual(data['totalSubmissions'], StudentExamResult.objects.filter(exam=self.past_exam).count())
+        self.assertEqual(len(data['questionAnalysis']), self.past_exam.questions.count())
+        for question in data['questionAnalysis']:
+            self.assertEqual(question['totalAnswers'] + question['unanswered'], data['totalSubmissions'])
+
+    def test_performance_report(self):
+        response = self.call(self.as_teacher, 'get', '/api/exams/performance-report/', queries=3)
+        data = json.loads(response.content)['data']
+        self.assertEqual(sum(data['gradeDistribution'].values()), StudentExamResult.objects.count())
+        self.call(self.as_teacher, 'get', '/api/exams/performance-report/?group_by=department,semester', queries=3)
+
+    def test_attendance_summary(self):
+        self.call(self.as_teacher, 'get', '/api/exams/attendance-report/', queries=3)
+
+    def test_generate_report(self):
+        self.call(self.as_teacher, 'get', '/api/exams/reports/performance/', queries=3)
+        self.call(self.as_teacher, 'get', f'/api/exams/reports/attendance/?exam_id={self.past_exam.id}', queries=3)
+        self.call(self.as_teacher, 'get', f'/api/exams/reports/question-analysis/?exam_id={self.past_exam.id}',
+                  queries=7)
+
+
+class StudentApiBudgetTests(QueryBudgetTestCase):
+    """Routes used while sitting an exam, under /api/exams/, /exams/api/ and /api/student/"""
+
+    def answers(self):
+        return {f'question_{question.id}': 'a' for question in self.open_exam.questions.all()}
+
+    def assertPaper(self, questions):
+        self.assertEqual([question['id'] for question in questions],
+                         sorted(self.open_exam.questions.values_list('id', flat=True)))
+        # The answer key never reaches the student
+        self.assertFalse(any('correct_answer' in question for question in questions))
+
+    def test_exam_questions(self):
+        response = self.call(self.as_student, 'get', f'/api/exams/{self.open_exam.id}/questions/', queries=5)
+        self.assertPaper(json.loads(response.content)['questions'])
+
+    def test_take_exam(self):
+        first = self.call(self.as_student, 'get', f'/api/exams/{self.open_exam.id}/take/', queries=6)
+        # The paper is cached after the first load; the exam row is always read for its version
+        second = self.call(self.as_student, 'get', f'/exams/api/exams/{self.open_exam.id}/take/', queries=5)
+        self.assertPaper(json.loads(first.content)['data']['questions'])
+        self.assertEqual(first.content, second.content)
+
+    def test_start_attempt(self):
+        first = self.call(self.as_student, 'post', f'/exams/api/start_attempt/{self.open_exam.id}/', queries=9)
+        # Resuming does not create anything
+        second = self.call(self.as_student, 'post', f'/exams/api/start_attempt/{self.open_exam.id}/', queries=6)
+        attempt = ExamAttempt.objects.get(exam=self.open_exam, student=self.student)
+        self.assertEqual(attempt.status, 'in_progress')
+        self.assertEqual(json.loads(first.content)['attempt_id'], attempt.id)
+        self.assertEqual(json.loads(second.content)['attempt_id'], attempt.id)
+
+    def test_autosave(self):
+        self.call(self.as_student, 'post', f'/exams/api/start_attempt/{self.open_exam.id}/', queries=9)
+        answers = list(self.answers().items())
+        for n, prefix in enumerate(('/api/exams', '/exams/api/exams')):
+            self.call_json(self.as_student, 'patch', f'{prefix}/{self.open_exam.id}/autosave/',
+                           {'answers': dict(answers[n::2])}, queries=7)
+        self.assertEqual(ExamAttempt.objects.get(exam=self.open_exam, student=self.student).answers, self.answers())
+
+    def test_submit_exam(self):
+        self.call(self.as_student, 'post', f'/exams/api/start_attempt/{self.open_exam.id}/', queries=9)
+        self.call_json(self.as_student, 'post', f'/api/exams/{self.open_exam.id}/submit/',
+                       {'answers': self.answers()}, queries=8)
+        attempt = ExamAttempt.objects.get(exam=self.open_exam, student=self.student)
+        self.assertEqual((attempt.status, attempt.answers), ('submitted', self.answers()))
+        # A second submit is refused without writing
+        self.call_json(self.as_student, 'post', f'/exams/api/exams/{self.open_exam.id}/submit/',
+                       {'answers': self.answers()}, queries=6, status=400)
+
+    def test_submit_without_exam(self):
+        # The route passes no exam id to submit_exam, so it always fails
+        client = self.client_for(self.student.user, raise_request_exception=False)
+        self.call_json(client, 'post', '/api/exams/submit/', {'answers': self.answers()}, queries=2, status=None)
+
+    def test_available_exams(self):
+        response = self.call(self.as_student, 'get', '/api/exams/available/', queries=5)
+        self.assertIn(self.open_exam.id, [exam['id'] for exam in json.loads(response.content)['data']])
+
+    def test_student_exams(self):
+        response = self.call(self.as_student, 'get', '/api/student/exams', queries=5)
+        exams = Exam.objects.filter(department=self.student.department, semester=self.student.semester)
+        self.assertIn(self.open_exam.id, [exam['id'] for exam in json.loads(response.content)])
+        self.assertFalse({exam['id'] for exam in json.loads(response.content)} - set(exams.values_list('id', flat=True)))
+
+    def test_student_results(self):
+        response = self.call(self.as_student, 'get', '/api/student/results', queries=5)
+        self.assertEqual(sorted(result['id'] for result in json.loads(response.content)['data']),
+                         sorted(StudentExamResult.objects.filter(student=self.student).values_list('id', flat=True)))
+        self.call(self.as_teacher, 'get', '/api/student/results', queries=4)
+
+
+class ExamPageBudgetTests(QueryBudgetTestCase):
+    """Pages of exams/urls.py, under /exams/"""
+
+    def test_question_editor(self):
+        self.call(self.as_teacher, 'get', f'/exams/create/{self.past_exam.id}/', queries=5)
+
+    def test_take_exam_page(self):
+        self.call(self.as_student, 'get', f'/exams/take/{self.open_exam.id}/', queries=8)
+
+    def test_view_results(self):
+        # exams/view_results.html does not exist yet
+        client = self.client_for(self.teacher.user, raise_request_exception=False)
+        self.call(client, 'get', '/exams/results/', queries=5, status=None)
+
+    def test_manage_exam(self):
+        self.call(self.as_teacher, 'get', f'/exams/manage/{self.past_exam.id}/', queries=4)
+
+    def test_metrics(self):
+        self.call(self.as_admin, 'get', '/metrics', queries=2)
+        self.call(self.anonymous, 'get', '/metrics', queries=0, status=403)
@@ -16,5 +16,6 @@ view_patterns = [
 urlpatterns = [
     path('api/exams/<int:exam_id>/take/', views.take_exam, name='take_exam_api'),
     path('api/exams/<int:exam_id>/submit/', views.submit_exam, name='submit_exam_api'),
+    path('api/exams/<int:exam_id>/autosave/', views.autosave_answers, name='autosave_answers_api'),
     path('api/start_attempt/<int:exam_id>/', start_exam_attempt, name='start_exam_attempt'),
 ]
\ No newline at end of file
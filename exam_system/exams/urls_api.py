@@ -6,15 +6,20 @@ api_patterns = [
     path('create/', views.create_exam, name='create_exam'),  # Create new exam
     path('subjects/', views.list_subjects, name='list_subjects'),  # Will be accessible at /api/exams/subjects/
     path('list/', views.list_exams, name='list_exams'),
+    path('results/', views.list_results, name='list_results'),
+    path('results/export/', views.export_results, name='export_results'),
     path('<int:exam_id>/questions/', views.get_exam_questions, name='get_exam_questions'),  # GET only
     path('<int:exam_id>/', views.get_exam, name='get_exam'),
     path('<int:exam_id>/add-questions/', views.add_questions, name='add_questions'),  # POST only
     path('<int:exam_id>/attendance/', views.get_attendance_report, name='get_attendance_report'),
     path('<int:exam_id>/question-analysis/', views.get_question_analysis, name='get_question_analysis'),
     path('performance-report/', views.get_performance_report, name='get_performance_report'),
+    path('attendance-report/', views.get_attendance_summary, name='get_attendance_summary'),
+    path('reports/<str:report_type>/', views.generate_report, name='generate_exam_report'),
     # Student-specific API endpoints
     path('<int:exam_id>/take/', views.take_exam, name='take_exam_api'),
     path('<int:exam_id>/submit/', views.submit_exam, name='submit_exam_api'),
+    path('<int:exam_id>/autosave/', views.autosave_answers, name='autosave_answers_api'),
     path('submit/', views.submit_exam, name='submit_exam'),
     path('available/', views.get_available_exams, name='get_available_exams'),
 ]
@@ -1,16 +1,25 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
-from .models import Exam, Question, StudentExamResult, ExamAttempt, Subject, Department
+from .models import Exam, Question, StudentExamResult, ExamAttempt
 from accounts.models import User, Student, Teacher
 from datetime import datetime, timedelta
+import hashlib
 import json
+import logging
 from .serializers import ExamSerializer
+from .reports import ReportError, parse_group_by, performance_summary, performance_by, attendance_for_exam, attendance_by, question_analysis
+from .item_analysis import item_statistics
+from .results import ResultsQueryError, filter_results, results_page, format_result
+from .export import EXPORT_FORMATS, export_lines
+from .autosave import AutosaveError, save_answers, saved_answers, discard as discard_autosave, locked as autosave_locked
+from .registry import departments, subjects
+from .paper_cache import load_exam, paper_response, invalidate_paper, PAPER_TAKE_EXAM, PAPER_EXAM_QUESTIONS
 import random
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -21,6 +30,8 @@ from django.db.models import Avg, Max, Min, Count
 from django.db.models.functions import Cast
 from django.db.models import FloatField
 
+logger = logging.getLogger(__name__)
+
 @login_required
 def exam_list(request):
     user = request.user
@@ -37,7 +48,7 @@ def exam_list(request):
         exams = Exam.objects.all()
 
 
-    context = {'exams': exams, 'departments': Department.objects.all()}
+    context = {'exams': exams, 'departments': departments.all()}
     return render(request, 'exams/exam_list.html', context)
 
 @api_view(['GET', 'POST'])
@@ -56,7 +67,7 @@ def create_exam(request, exam_id=None):
         if exam_id:
             try:
                 exam = Exam.objects.get(id=exam_id, created_by=teacher)
-                return render(request, 'exams/create_exam.html', {'exam': exam, 'departments': Department.objects.all()})
+                return render(request, 'exams/create_exam.html', {'exam': exam, 'departments': departments.all()})
             except Exam.DoesNotExist:
                 return Response({'success': False, 'message': 'Exam not found'}, status=404)
         else:
@@ -78,11 +89,10 @@ def create_exam(request, exam_id=None):
 
             # Ensure subject exists
             subject_id = data.get('subject')
-            try:
-                subject = Subject.objects.get(id=subject_id)
+            if subjects.get(id=subject_id) is not None:
                 # Add subject_id to data for the serializer
                 data['subject_id'] = subject_id
-            except Subject.DoesNotExist:
+            else:
                 return Response({
                     'success': False,
                     'message': f'Subject with ID {subject_id} does not exist'
@@ -122,6 +132,7 @@ def create_exam(request, exam_id=None):
                             setattr(exam, attr, value)
                     
                     exam.save()
+                    invalidate_paper(exam)
                     
                     return Response({
                         'success': True,
@@ -200,13 +211,9 @@ def add_questions_view(request, exam_id):
 @permission_classes([IsAuthenticated])
 def add_questions(request, exam_id):
     """API endpoint for adding questions to an exam"""
-    print(f"Received request to add questions for exam {exam_id}")
-    print(f"Request method: {request.method}")
-    print(f"Request headers: {request.headers}")
-    print(f"Request data: {request.data}")
+    logger.debug('Adding questions to exam %s', exam_id)
     
     if not hasattr(request.user, 'teacher_profile'):
-        print("User is not a teacher")
         return Response({'success': False, 'message': 'Not a teacher'}, status=403)
     
     try:
@@ -215,21 +222,16 @@ def add_questions(request, exam_id):
         
         # Validate questions data
         if 'questions' not in data:
-            print("No questions provided in request data")
             return Response({'success': False, 'message': 'No questions provided'}, status=400)
         
         try:
             # Create question objects from the data
             question_objects = []
             for q_data in data['questions']:
-                print(f"Processing question data: {q_data}")
-                
                 # Check for required fields
                 if 'text' not in q_data:
-                    print("Question text is missing")
                     return Response({'success': False, 'message': 'Question text is required'}, status=400)
                 if 'options' not in q_data:
-                    print("Question options are missing")
                     return Response({'success': False, 'message': 'Question options are required'}, status=400)
                 
                 # Handle both correct_answer and correctAnswer keys
@@ -244,15 +246,16 @@ def add_questions(request, exam_id):
                 # Set default marks to 1 if not specified
                 marks = q_data.get('marks', 1)
                 
-                question = Question.objects.create(
+                question_objects.append(Question(
                     text=q_data['text'],
                     options=q_data['options'],
                     correct_answer=correct_answer,
                     marks=marks,
                     created_by=request.user.teacher_profile
-                )
-                question_objects.append(question)
-                print(f"Created question with ID: {question.id}")
+                ))
+            
+            # One INSERT for the whole paper rather than one per question
+            Question.objects.bulk_create(question_objects)
             
             # Use set() method for many-to-many relationship
             exam.questions.set(question_objects)
@@ -260,10 +263,11 @@ def add_questions(request, exam_id):
             # Update total marks based on sum of question marks
             exam.total_marks = sum(q.marks for q in question_objects)
             exam.save()
+            invalidate_paper(exam)
             
             # Count questions for the response
             question_count = len(question_objects)
-            print(f"Successfully added {question_count} questions to exam {exam_id}")
+            logger.debug('Added %d questions to exam %s', question_count, exam_id)
             
             return Response({
                 'success': True,
@@ -274,18 +278,15 @@ def add_questions(request, exam_id):
                 }
             })
         except Exception as e:
-            print(f"Error creating questions: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception('Error adding questions to exam %s', exam_id)
             return Response({
                 'success': False,
                 'message': f'Error adding questions: {str(e)}'
             }, status=500)
     except Exam.DoesNotExist:
-        print(f"Exam {exam_id} not found")
         return Response({'success': False, 'message': 'Exam not found'}, status=404)
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception('Error adding questions to exam %s', exam_id)
         return Response({'success': False, 'message': str(e)}, status=500)
 
 @api_view(['GET'])
@@ -303,7 +304,7 @@ def take_exam(request, exam_id):
             }, status=status.HTTP_403_FORBIDDEN)
 
         student = request.user.student_profile
-        exam = Exam.objects.get(id=exam_id)
+        exam = load_exam(exam_id)
         
         # Check if student has already taken the exam
         if ExamAttempt.objects.filter(exam=exam, student=student).exists():
@@ -327,37 +328,14 @@ def take_exam(request, exam_id):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Check if student is eligible for this exam
-        if exam.department != student.department or exam.semester != student.semester:
+        if exam.department_id != student.department_id or exam.semester != student.semester:
             return Response({
                 'success': False,
                 'message': 'You are not eligible to take this exam'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Get questions for the exam
-        questions = exam.questions.all().order_by('id')
-        
-        # Prepare response data
-        exam_data = {
-            'success': True,
-            'data': {
-                'id': exam.id,
-                'title': exam.title,
-                'duration': exam.duration,
-                'deadline': exam.end_time,  # Using end_time as deadline
-                'total_marks': exam.total_marks,
-                'questions': [
-                    {
-                        'id': q.id,
-                        'text': q.text,
-                        'options': q.options,
-                        'marks': q.marks
-                    }
-                    for q in questions
-                ]
-            }
-        }
-        
-        return Response(exam_data)
+        # Serve the pre-encoded paper shared by every student taking this exam
+        return paper_response(exam, PAPER_TAKE_EXAM)
         
     except Exam.DoesNotExist:
         return Response({
@@ -377,59 +355,60 @@ def submit_exam(request, exam_id):
     """
     Submit exam answers
     """
+    if not hasattr(request.user, 'student_profile'):
+        return Response({
+            'message': 'Only students can submit exams'
+        }, status=status.HTTP_403_FORBIDDEN)
+
     try:
-        exam = Exam.objects.get(id=exam_id)
-        
-        # Check if student has already taken the exam
-        if ExamAttempt.objects.filter(exam=exam, student=request.user).exists():
-            return Response({
-                'message': 'You have already taken this exam'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        student = request.user.student_profile
+        exam = load_exam(exam_id)
         
         # Check if exam is active
-        if not exam.is_active:
+        if exam.status != 'active':
             return Response({
                 'message': 'This exam is not active'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if exam deadline has passed
-        if exam.deadline < timezone.now():
+        # Check if exam deadline (including the late submission window) has passed
+        now = timezone.now()
+        deadline = exam.late_submission_end or exam.end_time
+        if deadline and deadline < now:
             return Response({
                 'message': 'The deadline for this exam has passed'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get answers from request
-        answers = request.data.get('answers', {})
-        if not answers:
-            return Response({
-                'message': 'No answers provided'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get questions for the exam
-        questions = Question.objects.filter(exam=exam).order_by('id')
-        
-        # Calculate score
-        total_questions = questions.count()
-        correct_answers = 0
-        
-        for question in questions:
-            student_answer = answers.get(str(question.id - 1))  # Convert to 0-based index
-            if student_answer is not None and int(student_answer) == question.correct_answer:
-                correct_answers += 1
-        
-        score = (correct_answers / total_questions) * 100
-        
-        # Create exam attempt
-        attempt = ExamAttempt.objects.create(
-            exam=exam,
-            student=request.user,
-            score=score,
-            answers=answers
-        )
+        # Record the answers on the attempt started by start_exam_attempt (or a new one),
+        # on top of any autosaved ones. The buffer is held so an autosave cannot land
+        # in between, and the conditional update makes a double submit a no-op; grading
+        # is done by the grade_worker command.
+        with autosave_locked(exam.id, student.id):
+            attempt = ExamAttempt.objects.filter(student=student, exam=exam).first()
+            answers = {
+                **saved_answers(exam.id, student.id, attempt.answers if attempt else None),
+                **(request.data.get('answers') or {})
+            }
+            if not answers:
+                return Response({
+                    'message': 'No answers provided'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if attempt is None:
+                attempt, _ = ExamAttempt.objects.get_or_create(student=student, exam=exam)
+            submitted = ExamAttempt.objects.filter(id=attempt.id).exclude(status='submitted').update(
+                answers=answers,
+                status='submitted',
+                end_time=now,
+                is_late_submission=bool(exam.end_time and exam.late_submission_end and exam.is_late_submission(now))
+            )
+            if not submitted:
+                return Response({
+                    'message': 'You have already taken this exam'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            discard_autosave(exam.id, student.id)
         
         return Response({
             'message': 'Exam submitted successfully',
-            'score': score,
+            'status': 'pending',
             'attempt_id': attempt.id
         })
         
@@ -437,6 +416,10 @@ def submit_exam(request, exam_id):
         return Response({
             'message': 'Exam not found'
         }, status=status.HTTP_404_NOT_FOUND)
+    except AutosaveError as e:
+        return Response({
+            'message': str(e)
+        }, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({
             'message': str(e)
@@ -448,11 +431,14 @@ def view_results(request):
         raise PermissionDenied
     
     teacher = request.user.teacher_profile
-    exams = Exam.objects.filter(created_by=teacher)
-    results = StudentExamResult.objects.filter(exam__in=exams)
+    try:
+        results, next_cursor = results_page(StudentExamResult.objects.filter(exam__created_by=teacher), request.GET)
+    except ResultsQueryError as e:
+        return HttpResponseBadRequest(str(e))
     
     return render(request, 'exams/view_results.html', {
-        'results': results
+        'results': [format_result(row) for row in results],
+        'next_cursor': next_cursor
     })
 
 @login_required
@@ -462,19 +448,11 @@ def api_student_exams(request):
     student = request.user.student_profile
     now = timezone.now()
     
-    # Debug info
-    print(f"[DEBUG] Student ID: {request.user.username}")
-    print(f"[DEBUG] Student Department: {student.department.name if student.department else 'None'}")
-    print(f"[DEBUG] Student Semester: {student.semester}")
-    
     # First, get all exams for the department and semester without time filter
     all_dept_exams = Exam.objects.filter(
         department=student.department,
         semester=student.semester
-    )
-    print(f"[DEBUG] Found {all_dept_exams.count()} exams for this department and semester")
-    for exam in all_dept_exams:
-        print(f"[DEBUG] Exam: {exam.id} - {exam.title} - Start: {exam.start_time} - End: {exam.end_time}")
+    ).with_listing_data()
     
     # Get exams with relaxed time filter - commenting out time restrictions temporarily
     # exams = Exam.objects.filter(
@@ -485,9 +463,9 @@ def api_student_exams(request):
     # )
     
     # TEMPORARY: Get all exams for this department/semester regardless of time
-    exams = all_dept_exams
-    
-    print(f"[DEBUG] Returning {exams.count()} exams after all filters")
+    exams = list(all_dept_exams)
+    logger.debug('Student %s (department %s, semester %s): %d exams',
+                 request.user.username, student.department_id, student.semester, len(exams))
     
     exam_list = [
         {
@@ -495,9 +473,9 @@ def api_student_exams(request):
             'title': exam.title,
             'subject': exam.subject.name,
             'department': exam.department.name,
-            'department_id': exam.department.id,
+            'department_id': exam.department_id,
             'duration': exam.duration,
-            'totalQuestions': getattr(exam, 'total_questions', 0),
+            'totalQuestions': exam.question_count,
             'deadline': exam.end_time.isoformat() if exam.end_time else '',
             'start_time': exam.start_time.isoformat() if exam.start_time else '',
             'end_time': exam.end_time.isoformat() if exam.end_time else '',
@@ -523,43 +501,31 @@ def api_student_results(request):
     ]
     return JsonResponse(data, safe=False)
 
+def _subject_listing(snapshot):
+    """The list_subjects body for a registry snapshot, with a strong ETag of its bytes"""
+    body = json.dumps({
+        'success': True,
+        'data': [{'id': subject.id, 'name': subject.name} for subject in snapshot.items]
+    }, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(
+    etag_func=lambda request: subjects.derived('listing', _subject_listing)[1],
+    last_modified_func=lambda request: subjects.modified_at()
+)
 def list_subjects(request):
-    try:
-        # Predefined list of all possible subjects
-        subjects = [
-            {"id": 1, "name": "Mathematics 1"},
-            {"id": 2, "name": "Mathematics 2"},
-            {"id": 3, "name": "Mathematics 3"},
-            {"id": 4, "name": "Physics"},
-            {"id": 5, "name": "Chemistry"},
-            {"id": 6, "name": "Python"},
-            {"id": 7, "name": "C"},
-            {"id": 8, "name": "Digital Design and Computer Organization"},
-            {"id": 9, "name": "Operating System"},
-            {"id": 10, "name": "Data Structure and Algorithms"},
-            {"id": 11, "name": "Analysis and Design of Algorithms"},
-            {"id": 12, "name": "Database Management System"},
-            {"id": 13, "name": "Data Science"},
-            {"id": 14, "name": "Java"},
-            {"id": 15, "name": "English"},
-            {"id": 16, "name": "Computer Graphics"},
-            {"id": 17, "name": "Artificial Intelligence"},
-            {"id": 18, "name": "Machine Learning"},
-            {"id": 19, "name": "Cyber Security"},
-            {"id": 20, "name": "Internet of Things"}
-        ]
-
-        return Response({
-            'success': True,
-            'data': subjects
-        })
-    except Exception as e:
-        return Response({
-            'success': False,
-            'message': str(e)
-        }, status=500)
+    """
+    The Subject table, encoded once per registry version. Clients revalidate
+    with If-None-Match or If-Modified-Since and get a 304 until it changes.
+    The ETag hashes the body and Last-Modified is the registry's stored
+    modified_at, so every worker sends the same validators, across restarts.
+    """
+    body, _ = subjects.derived('listing', _subject_listing)
+    response = HttpResponse(body, content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -569,19 +535,19 @@ def list_exams(request):
         return Response({'success': False, 'message': 'Not a teacher'}, status=403)
     
     teacher = request.user.teacher_profile
-    exams = Exam.objects.filter(created_by=teacher).order_by('-created_at')
+    exams = Exam.objects.filter(created_by=teacher).with_listing_data().order_by('-created_at')
     
     # Format the response data manually to include all required fields
     exams_data = [{
         'id': exam.id,
         'title': exam.title,
         'subject': exam.subject.name,
-        'subject_id': exam.subject.id,
+        'subject_id': exam.subject_id,
         'department': exam.department.name,
         'department_id': exam.department.id,
         'semester': exam.semester,
         'duration': exam.duration,
-        'totalQuestions': exam.questions.count() if hasattr(exam, 'questions') else 0,
+        'totalQuestions': exam.question_count,
         'deadline': exam.end_time.isoformat() if exam.end_time else None,
         'status': exam.status
     } for exam in exams]
@@ -591,62 +557,112 @@ def list_exams(request):
         'data': exams_data
     })
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_results(request):
+    """
+    Results of the teacher's exams, one page at a time.
+    Filters: ?exam=, ?status=pass|fail, ?from=, ?to=, ?student=<username prefix>.
+    Sorting: ?sort=submitted_at|obtained_marks|id (prefix '-' for descending).
+    Pass the returned nextCursor as ?cursor= to get the following page.
+    """
+    if not hasattr(request.user, 'teacher_profile'):
+        return Response({'success': False, 'message': 'Not a teacher'}, status=403)
+
+    try:
+        teacher = request.user.teacher_profile
+        results, next_cursor = results_page(
+            StudentExamResult.objects.filter(exam__created_by=teacher), request.GET
+        )
+        return Response({
+            'success': True,
+            'data': [format_result(row) for row in results],
+            'nextCursor': next_cursor,
+            'hasMore': next_cursor is not None
+        })
+    except ResultsQueryError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_results(request):
+    """
+    Stream every result of the teacher's exams as ?output=csv (default) or jsonl.
+    Takes the same filters as list_results, e.g. ?semester=3.
+    """
+    if not hasattr(request.user, 'teacher_profile'):
+        return Response({'success': False, 'message': 'Not a teacher'}, status=403)
+
+    export_format = request.GET.get('output', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'success': False,
+            'message': f"Invalid output: {export_format}. Use {' or '.join(EXPORT_FORMATS)}"
+        }, status=400)
+    try:
+        results = filter_results(
+            StudentExamResult.objects.filter(exam__created_by=request.user.teacher_profile), request.GET
+        )
+    except ResultsQueryError as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+
+    content_type, extension, _ = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(export_lines(results, export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="exam-results.{extension}"'
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_performance_report(request):
+    """
+    Overall performance report, or one row per group with
+    ?group_by=exam,department,semester (any combination)
+    """
     try:
-        # Get all students
-        total_students = Student.objects.count()
-        
-        # Get all exam results
-        results = StudentExamResult.objects.all()
-        total_submissions = results.count()
-        
-        if total_submissions == 0:
+        group_by = parse_group_by(request.GET.get('group_by'))
+        if group_by:
             return Response({
                 'success': True,
                 'data': {
-                    'totalStudents': total_students,
-                    'passRate': 0,
-                    'averageMark': 0,
-                    'highestMark': 0,
-                    'lowestMark': 0,
-                    'gradeDistribution': {
-                        'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0
-                    }
+                    'groupBy': group_by,
+                    'groups': performance_by(group_by)
                 }
             })
 
-        # Calculate pass rate
-        passed_students = results.filter(status='pass').count()
-        pass_rate = round((passed_students / total_submissions) * 100, 2)
-
-        # Calculate marks statistics
-        marks_stats = results.aggregate(
-            avg_mark=Avg('obtained_marks'),
-            max_mark=Max('obtained_marks'),
-            min_mark=Min('obtained_marks')
-        )
+        return Response({
+            'success': True,
+            'data': performance_summary()
+        })
+    except ReportError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=500)
 
-        # Calculate grade distribution
-        grade_distribution = {
-            'A': results.filter(obtained_marks__gte=85).count(),
-            'B': results.filter(obtained_marks__gte=70, obtained_marks__lt=85).count(),
-            'C': results.filter(obtained_marks__gte=55, obtained_marks__lt=70).count(),
-            'D': results.filter(obtained_marks__gte=35, obtained_marks__lt=55).count(),
-            'F': results.filter(obtained_marks__lt=35).count()
-        }
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_attendance_report(request, exam_id):
+    try:
+        report = attendance_for_exam(exam_id)
+        if report is None:
+            return Response({'success': False, 'message': 'Exam not found'}, status=404)
 
         return Response({
             'success': True,
-            'data': {
-                'totalStudents': total_students,
-                'passRate': pass_rate,
-                'averageMark': round(marks_stats['avg_mark'], 2),
-                'highestMark': marks_stats['max_mark'],
-                'lowestMark': marks_stats['min_mark'],
-                'gradeDistribution': grade_distribution
-            }
+            'data': report
         })
     except Exception as e:
         return Response({
@@ -656,41 +672,22 @@ def get_performance_report(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_attendance_report(request, exam_id):
+def get_attendance_summary(request):
+    """Attendance across all exams, grouped by ?group_by=exam,department,semester (default exam)"""
     try:
-        exam = get_object_or_404(Exam, id=exam_id)
-        
-        # Get all students eligible for this exam
-        eligible_students = Student.objects.filter(
-            department=exam.department,
-            semester=exam.semester
-        )
-        total_registered = eligible_students.count()
-        
-        # Get all submissions for this exam
-        submissions = StudentExamResult.objects.filter(exam=exam)
-        present = submissions.count()
-        absent = total_registered - present
-        
-        # Calculate attendance rate
-        attendance_rate = round((present / total_registered) * 100, 2) if total_registered > 0 else 0
-        
-        # Count late submissions
-        late_submissions = submissions.filter(
-            submitted_at__gt=exam.end_time,
-            submitted_at__lte=exam.late_submission_end
-        ).count()
-        
+        group_by = parse_group_by(request.GET.get('group_by', 'exam'))
         return Response({
             'success': True,
             'data': {
-                'totalRegistered': total_registered,
-                'present': present,
-                'absent': absent,
-                'attendanceRate': attendance_rate,
-                'lateSubmissions': late_submissions
+                'groupBy': group_by,
+                'groups': attendance_by(group_by)
             }
         })
+    except ReportError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=400)
     except Exception as e:
         return Response({
             'success': False,
@@ -701,67 +698,18 @@ def get_attendance_report(request, exam_id):
 @permission_classes([IsAuthenticated])
 def get_question_analysis(request, exam_id):
     try:
-        exam = get_object_or_404(Exam, id=exam_id)
-        
-        # Get all submissions for this exam
-        submissions = StudentExamResult.objects.filter(exam=exam)
-        total_submissions = submissions.count()
-        
-        if total_submissions == 0:
-            return Response({
-                'success': True,
-                'data': {
-                    'totalQuestions': len(exam.questions),
-                    'questionAnalysis': [],
-                    'message': 'No submissions yet'
-                }
-            })
-
-        # Analyze each question
-        question_analysis = []
-        for question in exam.questions:
-            # Get all answers for this question
-            answers = []
-            for submission in submissions:
-                if hasattr(submission, 'answers') and submission.answers:
-                    answers.append(submission.answers.get(str(question['id']), ''))
-            
-            # Calculate statistics
-            total_answers = len(answers)
-            correct_answers = answers.count(question['correct_answer'])
-            accuracy = round((correct_answers / total_answers) * 100, 2) if total_answers > 0 else 0
-            
-            # Count answer distribution
-            answer_distribution = {}
-            for answer in answers:
-                answer_distribution[answer] = answer_distribution.get(answer, 0) + 1
-            
-            # Sort by frequency
-            common_wrong_answers = sorted(
-                [(ans, count) for ans, count in answer_distribution.items() if ans != question['correct_answer']],
-                key=lambda x: x[1],
-                reverse=True
-            )[:3]  # Top 3 wrong answers
-            
-            question_analysis.append({
-                'questionId': question['id'],
-                'questionText': question['text'],
-                'totalAnswers': total_answers,
-                'correctAnswers': correct_answers,
-                'accuracy': accuracy,
-                'commonWrongAnswers': [
-                    {'answer': ans, 'count': count} 
-                    for ans, count in common_wrong_answers
-                ],
-                'correctAnswer': question['correct_answer']
-            })
+        exam = Exam.objects.get(id=exam_id)
+        data = question_analysis(exam)
+        if not data['totalSubmissions']:
+            data['message'] = 'No submissions yet'
+        else:
+            items = item_statistics(exam)
+            for question in data['questionAnalysis']:
+                question['itemStatistics'] = items.get(question['questionId'])
 
         return Response({
             'success': True,
-            'data': {
-                'totalQuestions': len(exam.questions),
-                'questionAnalysis': question_analysis
-            }
+            'data': data
         })
     except Exam.DoesNotExist:
         return Response({"success": False, "message": "Exam not found"}, status=404)
@@ -774,9 +722,10 @@ def get_question_analysis(request, exam_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generate_report(request, report_type):
+    # The report views are API views themselves, so they are handed the underlying HttpRequest
     try:
         if report_type == 'performance':
-            return get_performance_report(request)
+            return get_performance_report(request._request)
         elif report_type == 'attendance':
             exam_id = request.GET.get('exam_id')
             if not exam_id:
@@ -784,7 +733,7 @@ def generate_report(request, report_type):
                     'success': False,
                     'message': 'Exam ID is required for attendance report'
                 }, status=400)
-            return get_attendance_report(request, exam_id)
+            return get_attendance_report(request._request, exam_id)
         elif report_type == 'question-analysis':
             exam_id = request.GET.get('exam_id')
             if not exam_id:
@@ -792,7 +741,7 @@ def generate_report(request, report_type):
                     'success': False,
                     'message': 'Exam ID is required for question analysis'
                 }, status=400)
-            return get_question_analysis(request, exam_id)
+            return get_question_analysis(request._request, exam_id)
         else:
             return Response({
                 'success': False,
@@ -814,9 +763,9 @@ def get_available_exams(request):
         student = request.user.student_profile
         exams = Exam.objects.filter(
             semester=student.semester,
-            subject__department=student.department,
+            department=student.department,
             status='active'
-        ).exclude(
+        ).with_listing_data().exclude(
             id__in=ExamAttempt.objects.filter(
                 student=student
             ).values_list('exam_id', flat=True)
@@ -826,9 +775,9 @@ def get_available_exams(request):
             'title': exam.title,
             'subject': exam.subject.name,
             'department': exam.department.name,
-            'department_id': exam.department.id,
+            'department_id': exam.department_id,
             'duration': exam.duration,
-            'total_questions': len(exam.questions),
+            'total_questions': exam.question_count,
             'deadline': exam.end_time.isoformat(),
             'remaining_time': (exam.end_time - timezone.now()).total_seconds() // 60  # in minutes
         } for exam in exams]
@@ -853,42 +802,30 @@ def api_student_results(request):
         # For teachers: get results of all students for their exams
         teacher = request.user.teacher_profile
         
-        # Get all exams created by this teacher
-        exams = Exam.objects.filter(created_by=teacher)
-        
-        # Get all results for these exams
-        results = StudentExamResult.objects.filter(exam__in=exams)
-        
-        results_data = [
-            {
-                'id': result.id,
-                'student': result.student.user.username,
-                'student_id': result.student.id,
-                'exam': result.exam.title,
-                'exam_id': result.exam.id,
-                'subject': result.exam.subject.name,
-                'score': result.obtained_marks,
-                'status': result.status,
-                'date': result.submitted_at.isoformat()
-            }
-            for result in results
-        ]
+        # One page of results for this teacher's exams; follow nextCursor for more
+        try:
+            results, next_cursor = results_page(
+                StudentExamResult.objects.filter(exam__created_by=teacher), request.GET
+            )
+        except ResultsQueryError as e:
+            return Response({'success': False, 'message': str(e)}, status=400)
         
         return Response({
             'success': True,
-            'data': results_data
+            'data': [format_result(row) for row in results],
+            'nextCursor': next_cursor
         })
         
     elif hasattr(request.user, 'student_profile'):
         # For students: get only their own results
         student = request.user.student_profile
-        results = StudentExamResult.objects.filter(student=student)
+        results = StudentExamResult.objects.filter(student=student).select_related('exam__subject')
         
         results_data = [
             {
                 'id': result.id,
                 'exam': result.exam.title,
-                'exam_id': result.exam.id,
+                'exam_id': result.exam_id,
                 'subject': result.exam.subject.name,
                 'score': result.obtained_marks,
                 'status': result.status,
@@ -952,10 +889,10 @@ def get_exam(request, exam_id):
             if 'semester' in data:
                 exam.semester = data['semester']
             if 'subject_id' in data:
-                try:
-                    subject = Subject.objects.get(id=data['subject_id'])
+                subject = subjects.get(id=data['subject_id'])
+                if subject is not None:
                     exam.subject = subject
-                except Subject.DoesNotExist:
+                else:
                     return Response({
                         'success': False,
                         'message': f"Subject with ID {data['subject_id']} does not exist"
@@ -977,6 +914,7 @@ def get_exam(request, exam_id):
                 exam.total_marks = total_marks
             
             exam.save()
+            invalidate_paper(exam)
             
             return Response({
                 'success': True,
@@ -1037,36 +975,13 @@ def get_exam_questions(request, exam_id):
             return Response({'success': False, 'message': 'Not a student'}, status=403)
             
         student = request.user.student_profile
-        exam = Exam.objects.get(pk=exam_id)
+        exam = load_exam(exam_id)
         
         # Check if student is allowed to take this exam
-        if exam.department != student.department or exam.semester != student.semester:
+        if exam.department_id != student.department_id or exam.semester != student.semester:
             return Response({'success': False, 'message': 'You are not allowed to take this exam'}, status=403)
         
-        # Get all questions for this exam
-        questions = exam.questions.all()
-        question_list = []
-        for q in questions:
-            question_list.append({
-                "id": q.id,
-                "text": q.text,
-                "options": q.options,
-                "marks": q.marks
-            })
-            
-        return Response({
-            "success": True,
-            "exam": {
-                "id": exam.id,
-                "title": exam.title,
-                "duration": exam.duration,
-                "subject": exam.subject.name,
-                "total_questions": exam.total_questions,
-                "total_marks": exam.total_marks,
-                "passing_score": exam.passing_score
-            },
-            "questions": question_list
-        })
+        return paper_response(exam, PAPER_EXAM_QUESTIONS)
     except Exam.DoesNotExist:
         return Response({"success": False, "message": "Exam not found"}, status=404)
     except Exception as e:
@@ -1111,7 +1026,7 @@ def start_exam_attempt(request, exam_id):
         return Response({'success': False, 'message': 'Only students can start exams'}, status=403)
     student = user.student_profile
     try:
-        exam = Exam.objects.get(id=exam_id)
+        exam = load_exam(exam_id)
     except Exam.DoesNotExist:
         return Response({'success': False, 'message': 'Exam not found'}, status=404)
     # Get or create ExamAttempt
@@ -1132,4 +1047,29 @@ def start_exam_attempt(request, exam_id):
         'duration': exam.duration,
         'exam_id': exam.id,
         'attempt_id': attempt.id,
-    })
\ No newline at end of file
+        # Answers saved so far, so a reloaded page can restore them
+        'answers': saved_answers(exam.id, student.id, attempt.answers),
+    })
+
+@api_view(['PATCH', 'POST'])
+@permission_classes([IsAuthenticated])
+def autosave_answers(request, exam_id):
+    """
+    Save answers while an exam is in progress.
+    Only the answers changed since the last call need to be sent; writes to the
+    attempt are coalesced (see exams.autosave).
+    """
+    if not hasattr(request.user, 'student_profile'):
+        return Response({'success': False, 'message': 'Only students can save answers'}, status=403)
+    changes = request.data.get('answers')
+    if not isinstance(changes, dict) or not changes:
+        return Response({'success': False, 'message': 'No answers provided'}, status=400)
+    try:
+        saved, flushed = save_answers(exam_id, request.user.student_profile.id, changes)
+    except AutosaveError as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+    return Response({
+        'success': True,
+        'saved': saved,
+        'flushed': flushed,
+    })
@@ -5,6 +5,8 @@ $(document).ready(function() {
 
     // Exam data structure
     let answers = {};
+    let pendingAnswers = {};  // Changed since the last autosave
+    let autosaveTimeout;
     let timerInterval;
     let examId = $("#examContent").data("exam-id") || window.EXAM_ID || null;
     let examData = {
@@ -32,6 +34,7 @@ $(document).ready(function() {
             success: function(data) {
                 if (data.success) {
                     examData.timeRemaining = data.remaining_time;
+                    examData.savedAnswers = data.answers || {};
                     localStorage.setItem(startedKey, 'true');
                     $("#instructionsSection").fadeOut(300, function() {
                         $("#examContent").fadeIn(300);
@@ -55,6 +58,7 @@ $(document).ready(function() {
             success: function(data) {
                 if (data.success) {
                     examData.timeRemaining = data.remaining_time;
+                    examData.savedAnswers = data.answers || {};
                     $("#instructionsSection").hide();
                     $("#examContent").show();
                     initializeExam();
@@ -78,7 +82,32 @@ $(document).ready(function() {
             const questionId = $(this).attr('name');
             const selectedOption = $(this).val();
             answers[questionId] = selectedOption;
+            pendingAnswers[questionId] = selectedOption;
             saveProgress();
+            scheduleAutosave();
+        });
+    }
+
+    // Send only the answers that changed, at most once every few seconds
+    function scheduleAutosave() {
+        clearTimeout(autosaveTimeout);
+        autosaveTimeout = setTimeout(autosave, 2000);
+    }
+
+    function autosave() {
+        if (!examId || $.isEmptyObject(pendingAnswers)) return;
+        const changes = pendingAnswers;
+        pendingAnswers = {};
+        $.ajax({
+            url: `/exams/api/exams/${examId}/autosave/`,
+            type: 'PATCH',
+            contentType: 'application/json',
+            data: JSON.stringify({ answers: changes }),
+            headers: { 'X-CSRFToken': getCookie('csrftoken') },
+            error: function() {
+                // Keep the changes for the next attempt
+                pendingAnswers = Object.assign(changes, pendingAnswers);
+            }
         });
     }
 
@@ -115,8 +144,9 @@ $(document).ready(function() {
 
     function loadProgress() {
         const savedAnswers = localStorage.getItem(`exam_answers`);
-        if (savedAnswers) {
-            answers = JSON.parse(savedAnswers);
+        // Answers saved on the server survive a browser crash; local ones are newer
+        answers = Object.assign({}, examData.savedAnswers || {}, savedAnswers ? JSON.parse(savedAnswers) : {});
+        if (!$.isEmptyObject(answers)) {
             // Set the checked state for saved answers
             for (const [name, value] of Object.entries(answers)) {
                 $(`input[name="${name}"][value="${value}"]`).prop('checked', true);
@@ -402,28 +402,120 @@ $(document).ready(function() {
         }
     }
 
+    // Results are fetched a page at a time; the next page loads when the
+    // end of the table scrolls into view (or "Load more" is clicked).
+    let resultsCursor = null;
+    let resultsLoading = false;
+    let resultsObserver = null;
+
     function loadStudentResults() {
+        $("#dynamicContentContainer").html(`
+            <div class="results-container">
+                <h2>Student Results</h2>
+                <form class="results-filters">
+                    <input type="text" name="student" placeholder="Student ID starts with">
+                    <select name="status">
+                        <option value="">All statuses</option>
+                        <option value="pass">Pass</option>
+                        <option value="fail">Fail</option>
+                    </select>
+                    <input type="date" name="from" title="Submitted from">
+                    <input type="date" name="to" title="Submitted to">
+                    <select name="sort">
+                        <option value="-submitted_at">Newest first</option>
+                        <option value="submitted_at">Oldest first</option>
+                        <option value="-obtained_marks">Highest score</option>
+                        <option value="obtained_marks">Lowest score</option>
+                    </select>
+                    <button type="submit" class="action-btn">Apply</button>
+                    <button type="button" class="action-btn export-results">Export CSV</button>
+                </form>
+                <table class="results-table">
+                    <thead>
+                        <tr><th>Student</th><th>Exam</th><th>Score</th><th>Date</th></tr>
+                    </thead>
+                    <tbody></tbody>
+                </table>
+                <button class="action-btn load-more-results" style="display: none;">Load more</button>
+            </div>
+        `).slideDown(300);
+
+        $(".results-filters").on("submit", function(e) {
+            e.preventDefault();
+            resetResults();
+        });
+        $(".load-more-results").click(fetchResultsPage);
+        $(".export-results").click(function() {
+            // The export streams every matching row, so it is a plain download
+            const params = $(".results-filters").serializeArray().filter(field => field.value && field.name !== 'sort');
+            window.location.href = '/api/exams/results/export/?' + $.param(params);
+        });
+
+        if (resultsObserver) {
+            resultsObserver.disconnect();
+        }
+        if ('IntersectionObserver' in window) {
+            resultsObserver = new IntersectionObserver(function(entries) {
+                if (entries[0].isIntersecting && resultsCursor) {
+                    fetchResultsPage();
+                }
+            });
+            resultsObserver.observe($(".load-more-results")[0]);
+        }
+
+        resetResults();
+    }
+
+    function resetResults() {
+        resultsCursor = null;
+        $(".results-table tbody").empty();
+        fetchResultsPage();
+    }
+
+    function fetchResultsPage() {
+        if (resultsLoading) {
+            return;
+        }
+        resultsLoading = true;
+
+        const params = {};
+        $(".results-filters").serializeArray().forEach(field => {
+            if (field.value) {
+                params[field.name] = field.value;
+            }
+        });
+        if (resultsCursor) {
+            params.cursor = resultsCursor;
+        }
+
         $.ajax({
-            url: '/api/exams/results/',  // Fixed URL path
+            url: '/api/exams/results/',
             method: 'GET',
+            data: params,
             headers: {
                 'X-CSRFToken': getCookie('csrftoken')
             },
             success: function(response) {
                 if (response.success) {
-                    displayResults(response.data);
+                    displayResults(response.data, !params.cursor);
+                    resultsCursor = response.nextCursor;
+                    $(".load-more-results").toggle(Boolean(resultsCursor));
                 } else {
                     showToast('Failed to load results: ' + response.message, 'error');
                 }
             },
             error: function(xhr, status, error) {
-                showToast('Error loading results: ' + error, 'error');
+                const message = xhr.responseJSON && xhr.responseJSON.message ? xhr.responseJSON.message : error;
+                showToast('Error loading results: ' + message, 'error');
+            },
+            complete: function() {
+                resultsLoading = false;
             }
         });
     }
 
-    function displayResults(results) {
-        if (!results || results.length === 0) {
+    function displayResults(results, firstPage) {
+        if (firstPage && (!results || results.length === 0)) {
             $(".results-table tbody").html('<tr><td colspan="4" class="no-results">No results found.</td></tr>');
             return;
         }
@@ -435,12 +527,12 @@ $(document).ready(function() {
                     <td>${result.student}</td>
                     <td>${result.exam}</td>
                     <td>${result.score}</td>
-                    <td>${result.date}</td>
+                    <td>${formatDate(result.date)}</td>
                 </tr>
             `;
         });
         
-        $(".results-table tbody").html(tableHTML);
+        $(".results-table tbody").append(tableHTML);
     }
 
     function loadReportGenerator() {